@@ -1,22 +1,93 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
 import uvicorn
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 from pydantic import BaseModel
 import logging
+import os
+import time
+import asyncio
 
 # GenieACS integration imports
-from app.services.genieacs_client import get_genieacs_client
+from app.services.genieacs_client import (
+    close_genieacs_client,
+    genieacs_shards_status,
+    get_genieacs_client
+)
+from app.services.genieacs_mongo import get_genieacs_mongo
+from app.services.inventory_sync import get_inventory_sync
+from app.services.event_stream import get_event_broker
+from app.services.shared_cache import get_shared_cache
+from app.services.kpi_history import get_kpi_history, parse_bucket, resolve_time_range
+from app.services.metrics import (
+    HTTP_REQUEST_DURATION,
+    monitor_event_loop_lag,
+    observe_transform,
+    record_cache,
+    render_metrics,
+    route_label
+)
+from app.services.tracing import (
+    TracedJSONResponse,
+    current_trace,
+    degraded_headers,
+    end_trace,
+    log_trace,
+    mark_degraded,
+    span,
+    start_trace
+)
+from app.services.resilience import deadline_scope
+from app.services.profiler import MAX_PROFILE_SECONDS, get_profiler
+from app.services.wifi_jobs import QueueFullError, get_wifi_job_queue
+from app.services.bulk_wifi import get_bulk_wifi_scheduler
+from app.services.startup import get_startup_warmup
+from app.services.alert_store import get_alert_store
+from app.services.onu_inventory import get_onu_inventory
+from app.services.anomaly_detector import get_anomaly_detector
+from app.services.columnar import (
+    FORMAT_JSON,
+    ColumnarTable,
+    columnar_response,
+    get_columnar_inventory,
+    response_format
+)
+from app.services.topology import ROOT_ID as TOPOLOGY_ROOT, get_topology
+from app.services.device_search import get_device_search
+from app.services.auth import AuthenticationError, get_jwt_authenticator, role_from_claims
+from app.services.inventory_export import (
+    CPE_EXPORT_FIELDS,
+    EXPORT_FORMATS,
+    ONU_EXPORT_FIELDS,
+    cpe_records,
+    onu_records,
+    record_filter,
+    select_fields,
+    serialize
+)
+from app.services.mock_data import (
+    DEMO_DATA_ENABLED,
+    mock_alerts,
+    mock_cpes,
+    mock_dashboard_metrics,
+    mock_olts,
+    mock_onus
+)
+from app.services.refresh_coordinator import (
+    REFRESH_IP_PARAMETERS,
+    REFRESH_SUMMON,
+    REFRESH_WIFI_PASSWORDS,
+    get_refresh_coordinator
+)
 from app.services.genieacs_transformers import (
     transform_genieacs_to_cpe,
-    transform_genieacs_to_onu,
-    transform_genieacs_fault_to_alert,
     calculate_dashboard_metrics,
+    calculate_wifi_stats,
     extract_wifi_config_from_device,
-    create_wifi_parameter_updates,
     format_wifi_configs_for_frontend
 )
 
@@ -24,6 +95,12 @@ from app.services.genieacs_transformers import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Orçamento de tempo padrão de cada requisição da API (segundos)
+API_REQUEST_DEADLINE = float(os.getenv("API_REQUEST_DEADLINE", "10"))
+
+# Tempo (segundos) para o CPE responder a um refresh antes de lermos o resultado
+REFRESH_SETTLE_SECONDS = float(os.getenv("REFRESH_SETTLE_SECONDS", "2"))
+
 # Pydantic models
 class Device(BaseModel):
     id: str
@@ -51,6 +128,20 @@ class OLT(Device):
     location: str
     pon_ports: int = 16
     active_onus: int = 0
+    total_onus: int = 0
+
+# Colunas das respostas compactas (MessagePack/Arrow), na ordem dos modelos
+CPE_FIELDS = list(CPE.model_fields)
+ONU_FIELDS = list(ONU.model_fields)
+
+class PonPortStats(BaseModel):
+    pon_port: str
+    onus: int
+    online: int
+    offline: int
+    occupancy_percent: float
+    avg_rx_power: Optional[float] = None
+    low_rx_onus: int = 0
 
 class Alert(BaseModel):
     id: str
@@ -60,6 +151,13 @@ class Alert(BaseModel):
     description: str
     acknowledged: bool = False
     created_at: datetime
+    code: Optional[str] = None
+    count: int = 1
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    active: bool = True
+    acknowledged_at: Optional[datetime] = None
+    acknowledged_by: Optional[str] = None
 
 class User(BaseModel):
     id: str
@@ -90,65 +188,21 @@ class WiFiConfigUpdate(BaseModel):
     hidden: Optional[bool] = None
     enabled: Optional[bool] = None
 
-# Mock data
-mock_cpes = [
-    CPE(
-        id=f"cpe-{i:03d}",
-        serial_number=f"CPE{i:06d}",
-        model="Intelbras IWR 3000N" if i % 2 == 0 else "TP-Link Archer C6",
-        status="online" if i % 3 != 0 else "offline",
-        ip_address=f"192.168.1.{i+100}",
-        wifi_enabled=True,
-        wifi_ssid=f"RJChronos_{i:03d}",
-        signal_strength=-45.5 + (i % 20),
-        customer_name=f"Cliente {i:03d}",
-        last_seen=datetime.now(),
-        created_at=datetime.now()
-    ) for i in range(1, 51)
-]
-
-mock_onus = [
-    ONU(
-        id=f"onu-{i:03d}",
-        serial_number=f"ONU{i:06d}",
-        model="Huawei HG8310M" if i % 2 == 0 else "ZTE F601",
-        status="online" if i % 4 != 0 else "offline",
-        olt_id=f"olt-{(i-1)//4 + 1:03d}",
-        pon_port=f"1/{(i-1)%4 + 1}",
-        rx_power=-18.5 + (i % 10),
-        tx_power=2.5 + (i % 5),
-        distance=1.2 + (i % 10) * 0.1,
-        last_seen=datetime.now(),
-        created_at=datetime.now()
-    ) for i in range(1, 21)
-]
-
-mock_olts = [
-    OLT(
-        id=f"olt-{i:03d}",
-        serial_number=f"OLT{i:06d}",
-        model="Huawei MA5608T" if i % 2 == 0 else "ZTE C320",
-        status="online",
-        location=f"Central {i}",
-        pon_ports=16,
-        active_onus=len([onu for onu in mock_onus if onu.olt_id == f"olt-{i:03d}"]),
-        last_seen=datetime.now(),
-        created_at=datetime.now()
-    ) for i in range(1, 6)
-]
-
-mock_alerts = [
-    Alert(
-        id=f"alert-{i:03d}",
-        device_id=f"cpe-{i:03d}" if i % 2 == 0 else f"onu-{i:03d}",
-        severity="critical" if i % 5 == 0 else "warning" if i % 3 == 0 else "info",
-        title=f"Alerta {i:03d}",
-        description=f"Descrição do alerta {i:03d}",
-        acknowledged=i % 4 == 0,
-        created_at=datetime.now()
-    ) for i in range(1, 16)
-]
+class BulkWiFiSelector(BaseModel):
+    device_ids: Optional[List[str]] = None
+    profile_id: Optional[str] = None
+    manufacturer: Optional[str] = None
+    model: Optional[str] = None
+    olt_id: Optional[str] = None
+    online_only: bool = False
+
+class BulkWiFiApply(BaseModel):
+    profile: WiFiConfigUpdate
+    selector: BulkWiFiSelector
+    band: str = "2.4GHz"
+    dry_run: bool = False
 
+# Usuário fixo quando a autenticação JWT não está configurada
 mock_user = User(
     id="user-001",
     email="admin@rjchronos.com",
@@ -161,7 +215,68 @@ mock_user = User(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 RJChronos Backend starting up...")
+
+    shared_cache = get_shared_cache()
+    inventory_sync = get_inventory_sync()
+    event_broker = get_event_broker()
+    # Sem o sync não há eleição: cada worker versiona os próprios eventos
+    event_broker.attach_shared_cache(shared_cache, lambda: inventory_sync.is_leader or not inventory_sync.running)
+    inventory_sync.add_listener(event_broker.publish_cycle)
+    await shared_cache.start()
+    await get_alert_store().start()
+    if not get_jwt_authenticator().enabled:
+        logger.warning("⚠️ Autenticação JWT desativada (sem JWT_SECRET/JWT_JWKS_URL): usando o usuário de desenvolvimento")
+
+    # Índice de ONUs: atualizado antes do histórico para que os KPIs já saiam por OLT
+    onu_inventory = get_onu_inventory()
+    await onu_inventory.start()
+    inventory_sync.add_listener(onu_inventory.record_cycle)
+    # Anomalias viram alertas antes da topologia contar os alertas ativos
+    anomaly_detector = get_anomaly_detector()
+    if await anomaly_detector.start():
+        inventory_sync.add_listener(anomaly_detector.record_cycle)
+    inventory_sync.add_listener(get_topology().record_cycle)
+    inventory_sync.add_listener(get_device_search().record_cycle)
+    get_bulk_wifi_scheduler().olt_resolver = onu_inventory.olt_of
+
+    kpi_history = get_kpi_history()
+    kpi_history.scope_resolver = onu_inventory.scope_of
+    if os.getenv("KPI_HISTORY_ENABLED", "true").lower() == "true":
+        try:
+            await kpi_history.start()
+            inventory_sync.add_listener(kpi_history.record_cycle)
+        except Exception as e:
+            logger.error(f"Histórico de KPIs indisponível: {e}")
+
+    # Aquecimento: conexões com o GenieACS e primeiro snapshot antes de /health/ready
+    client = await get_genieacs_client()
+    warmup_steps = {"genieacs_pool": client.warm_up()}
+    if os.getenv("INVENTORY_SYNC_ENABLED", "true").lower() == "true":
+        # Leitura direta do MongoDB do GenieACS (opcional); só o sync a usa
+        get_genieacs_mongo().start()
+        inventory_sync.start()
+        get_device_search().start(shared_cache)
+        warmup_steps["inventory"] = inventory_sync.wait_populated()
+
+    startup_warmup = get_startup_warmup()
+    startup_warmup.start(warmup_steps)
+
+    wifi_job_queue = get_wifi_job_queue()
+    wifi_job_queue.start()
+
+    loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
+
     yield
+
+    await startup_warmup.stop()
+    loop_lag_task.cancel()
+    await get_bulk_wifi_scheduler().stop()
+    await wifi_job_queue.stop()
+    await inventory_sync.stop()
+    await kpi_history.stop()
+    await close_genieacs_client()
+    get_genieacs_mongo().close()
+    await shared_cache.close()
     logger.info("🛑 RJChronos Backend shutting down...")
 
 # FastAPI app
@@ -169,7 +284,8 @@ app = FastAPI(
     title="RJChronos API",
     description="Sistema de Gestão e Monitoramento de Rede",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=TracedJSONResponse
 )
 
 # CORS middleware
@@ -179,151 +295,578 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Data-Stale", "X-Data-Age", "Warning", "Retry-After"],
 )
 
+# Observability middleware (Prometheus + Server-Timing)
+def request_deadline(request: Request) -> float:
+    """
+    Orçamento de tempo da requisição: API_REQUEST_DEADLINE, reduzido pelo header
+    X-Request-Timeout-Ms quando o cliente desiste antes
+    """
+    deadline = API_REQUEST_DEADLINE
+    client_timeout = request.headers.get("X-Request-Timeout-Ms")
+    if client_timeout:
+        try:
+            deadline = min(deadline, max(0.0, float(client_timeout) / 1000))
+        except ValueError:
+            pass
+    return deadline
+
+@app.middleware("http")
+async def observability_middleware(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    trace_token = start_trace()
+    trace = current_trace()
+    try:
+        with deadline_scope(request_deadline(request)):
+            response = await call_next(request)
+        status = response.status_code
+        response.headers["Server-Timing"] = trace.server_timing()
+        response.headers.update(degraded_headers(trace))
+        return response
+    finally:
+        route = route_label(request.scope)
+        HTTP_REQUEST_DURATION.labels(
+            request.method, route, str(status)
+        ).observe(time.perf_counter() - start)
+        log_trace(trace, request.method, route, status)
+        end_trace(trace_token)
+
 # Security
 security = HTTPBearer(auto_error=False)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    # Mock authentication - in production, validate JWT token
-    return mock_user
+def user_from_claims(claims: dict) -> User:
+    """
+    Usuário a partir dos claims do token (montado uma vez por token e guardado
+    no cache do verificador junto com os claims)
+    """
+    issued_at = claims.get("iat")
+    return User(
+        id=str(claims.get("sub") or claims.get("email")),
+        email=claims.get("email") or str(claims.get("sub")),
+        first_name=claims.get("given_name"),
+        last_name=claims.get("family_name"),
+        role=role_from_claims(claims, get_jwt_authenticator().role_claim),
+        created_at=datetime.fromtimestamp(issued_at) if isinstance(issued_at, (int, float)) else datetime.now()
+    )
+
+def bearer_token(credentials: Optional[HTTPAuthorizationCredentials]) -> Optional[str]:
+    if credentials is None or credentials.scheme.lower() != "bearer":
+        return None
+    return credentials.credentials
+
+async def authenticate_token(token: Optional[str]) -> User:
+    """
+    Usuário do token JWT (ou o usuário fixo de desenvolvimento sem JWT configurado)
+    
+    Raises:
+        HTTPException: 401 com token ausente ou inválido
+    """
+    authenticator = get_jwt_authenticator()
+    if not authenticator.enabled:
+        # Sem JWT_SECRET/JWT_JWKS_URL: usuário fixo de desenvolvimento
+        return mock_user
+    if not token:
+        raise HTTPException(status_code=401, detail="Não autenticado", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return await authenticator.authenticate(token, user_from_claims)
+    except AuthenticationError as e:
+        raise HTTPException(
+            status_code=401,
+            detail=f"Token inválido: {e}",
+            headers={"WWW-Authenticate": 'Bearer error="invalid_token"'}
+        )
+
+async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)):
+    return await authenticate_token(bearer_token(credentials))
+
+async def get_stream_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+                          access_token: Optional[str] = Query(None)):
+    """
+    Autenticação do stream SSE: o EventSource do navegador não envia headers,
+    então o token também é aceito no parâmetro access_token (RFC 6750, 2.3)
+    """
+    return await authenticate_token(bearer_token(credentials) or access_token)
+
+async def require_admin(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Acesso restrito a administradores")
+    return current_user
+
+# Rotas /api: todas exigem usuário autenticado (com JWT configurado), exceto o
+# stream SSE, que tem autenticação própria (token também na query string)
+api = APIRouter(dependencies=[Depends(get_current_user)])
+
+# Inventory loaders
+def stale_snapshot() -> Optional[dict]:
+    """
+    Último snapshot do sync, mesmo antigo, marcando a resposta como degradada
+    """
+    snapshot = get_inventory_sync().get_snapshot(allow_stale=True)
+    if snapshot is not None:
+        age = (datetime.now() - snapshot["timestamp"]).total_seconds()
+        mark_degraded("genieacs_unavailable", age)
+        logger.warning(f"⚠️ GenieACS indisponível, servindo snapshot de {age:.0f}s atrás")
+    return snapshot
+
+async def load_cpe_data() -> List[dict]:
+    """
+    CPEs transformados: snapshot do sync (compartilhado entre workers) ou GenieACS
+    """
+    snapshot = get_inventory_sync().get_snapshot()
+    record_cache("inventory_snapshot", snapshot is not None)
+    if snapshot is not None:
+        return list(snapshot["devices"].values())
+    
+    client = await get_genieacs_client()
+    try:
+        raw_devices = await client.get_devices(raise_errors=True)
+    except Exception:
+        snapshot = stale_snapshot()
+        if snapshot is None:
+            raise
+        return list(snapshot["devices"].values())
+    
+    devices = []
+    with observe_transform("cpe_batch"):
+        for device_data in raw_devices:
+            # Transformar dados GenieACS em estrutura CPE
+            cpe_data = transform_genieacs_to_cpe(device_data)
+            if cpe_data:
+                devices.append(cpe_data)
+    return devices
+
+async def load_cpe_table() -> ColumnarTable:
+    """
+    CPEs em colunas: a tabela do snapshot do sync é montada uma vez por ciclo e
+    reaproveitada (com as codificações) até o próximo
+    """
+    snapshot = get_inventory_sync().get_snapshot()
+    if snapshot is not None:
+        record_cache("inventory_snapshot", True)
+        devices = snapshot["devices"]
+        return get_columnar_inventory().table(
+            "cpes", (id(devices), snapshot["timestamp"]),
+            lambda: ColumnarTable.from_records(devices.values(), CPE_FIELDS)
+        )
+    return ColumnarTable.from_records(await load_cpe_data(), CPE_FIELDS)
+
+def history_table(payload: dict, rows_key: str, fields: List[str] = None) -> ColumnarTable:
+    """
+    Resposta de histórico em colunas: as linhas viram a tabela e os demais campos
+    vão como metadados
+    """
+    rows = payload[rows_key]
+    metadata = {key: value for key, value in payload.items() if key != rows_key}
+    if fields is not None:
+        return ColumnarTable.from_rows(rows, fields, metadata)
+    return ColumnarTable.from_records(rows, list(rows[0]) if rows else [], metadata)
+
+async def load_alert_store():
+    """
+    Store de alertas atualizado: snapshot do sync ou GenieACS, com o último
+    snapshot (mesmo antigo) como reserva
+    """
+    alert_store = get_alert_store()
+    try:
+        await alert_store.refresh()
+    except Exception:
+        snapshot = stale_snapshot()
+        if snapshot is None:
+            raise
+        await alert_store.apply_faults(snapshot["faults"])
+    return alert_store
 
 # Routes
 @app.get("/")
 async def root():
     return {"message": "RJChronos API v1.0.0", "status": "online"}
 
-@app.get("/api/auth/user", response_model=User)
+@app.get("/health", include_in_schema=False)
+async def health():
+    """
+    Liveness: o processo está respondendo
+    """
+    return {"status": "ok"}
+
+@app.get("/health/ready", include_in_schema=False)
+async def health_ready():
+    """
+    Readiness: aquecimento concluído (503 durante o startup e o shutdown), com a
+    saúde de cada instância do GenieACS
+    """
+    status = get_startup_warmup().to_dict()
+    status["genieacs_shards"] = genieacs_shards_status()
+    return TracedJSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Métricas no formato de exposição do Prometheus
+    """
+    content, content_type = render_metrics()
+    return Response(content=content, headers={"Content-Type": content_type})
+
+@api.get("/api/auth/user", response_model=User)
 async def get_user(current_user: User = Depends(get_current_user)):
     return current_user
 
-@app.get("/api/devices/cpes", response_model=List[CPE])
-async def get_cpes():
+@api.get("/api/devices/cpes", response_model=List[CPE])
+async def get_cpes(fmt: str = Depends(response_format)):
     """
     Retorna lista de CPEs obtida do GenieACS
+
+    Com Accept: application/msgpack ou application/vnd.apache.arrow.stream, a
+    lista sai em colunas, sem montar um modelo por CPE
     """
     try:
-        # Usar cliente GenieACS para buscar dispositivos
-        client = await get_genieacs_client()
-        raw_devices = await client.get_devices()
+        if fmt != FORMAT_JSON:
+            table = await load_cpe_table()
+            if len(table) or not DEMO_DATA_ENABLED:
+                return columnar_response(table, fmt)
         
-        cpes = []
-        for device_data in raw_devices:
-            # Transformar dados GenieACS em estrutura CPE
-            cpe_data = transform_genieacs_to_cpe(device_data)
-            if cpe_data:
-                cpes.append(CPE(**cpe_data))
+        cpes = [CPE(**cpe_data) for cpe_data in await load_cpe_data()]
         
         logger.info(f"Retornando {len(cpes)} CPEs do GenieACS")
         
-        # Fallback para dados mock se nenhum dispositivo encontrado
-        if not cpes:
+        # Fallback para dados mock (modo demonstração) se nenhum dispositivo encontrado
+        if not cpes and DEMO_DATA_ENABLED:
             logger.warning("Nenhum dispositivo encontrado no GenieACS, usando dados mock")
-            return mock_cpes[:10]  # Apenas 10 para demonstrar diferença
+            mark_degraded("mock_data")
+            return mock_cpes()[:10]  # Apenas 10 para demonstrar diferença
             
         return cpes
             
     except Exception as e:
         logger.error(f"Erro ao buscar CPEs do GenieACS: {e}")
+        if not DEMO_DATA_ENABLED:
+            raise HTTPException(status_code=503, detail="GenieACS indisponível")
         # Fallback para dados mock em caso de erro
-        return mock_cpes
+        mark_degraded("mock_data")
+        return mock_cpes()
+
+@api.get("/api/devices/search")
+async def search_devices(q: str = Query(..., min_length=1, max_length=100),
+                         limit: int = Query(20, ge=1, le=100)):
+    """
+    Busca de dispositivos (typeahead) por serial, ID, IP, SSID, cliente e modelo
+    
+    Args:
+        q: Texto da busca (prefixo ou trecho; várias palavras precisam aparecer todas)
+        limit: Máximo de resultados
+    """
+    device_search = get_device_search()
+    try:
+        await device_search.refresh()
+    except Exception as e:
+        logger.error(f"Erro ao carregar dispositivos para a busca: {e}")
+        raise HTTPException(status_code=503, detail="GenieACS indisponível")
+    
+    with span("search"):
+        results = device_search.search(q, limit)
+    return {"query": q, "results": results}
+
+async def refresh_onu_inventory():
+    """
+    Atualiza o índice de ONUs (com fallback para o último snapshot do sync)
+
+    Returns:
+        Inventário de ONUs ou None se o GenieACS está indisponível sem dados
+    """
+    onu_inventory = get_onu_inventory()
+    try:
+        await onu_inventory.refresh()
+    except Exception as e:
+        logger.error(f"Erro ao buscar ONUs do GenieACS: {e}")
+        return None
+    return onu_inventory
 
-@app.get("/api/devices/onus", response_model=List[ONU])
-async def get_onus():
-    return mock_onus
+@api.get("/api/devices/onus", response_model=List[ONU])
+async def get_onus(
+    olt_id: Optional[str] = None,
+    pon_port: Optional[str] = None,
+    status: Optional[str] = None,
+    fmt: str = Depends(response_format)
+):
+    """
+    Retorna as ONUs, opcionalmente de uma OLT/porta PON
+    
+    Args:
+        olt_id: Filtra por OLT ("unassigned" para ONUs sem OLT conhecida)
+        pon_port: Filtra por porta PON da OLT (ex: "0/1/3")
+        status: Filtra por status ("online"/"offline")
+    """
+    onu_inventory = await refresh_onu_inventory()
+    if onu_inventory is not None and len(onu_inventory):
+        if fmt == FORMAT_JSON:
+            return onu_inventory.query(olt_id=olt_id, pon_port=pon_port, status=status)
+        if olt_id is None and pon_port is None and status is None:
+            table = get_columnar_inventory().table(
+                "onus", onu_inventory.version,
+                lambda: ColumnarTable.from_records(onu_inventory.records().values(), ONU_FIELDS)
+            )
+        else:
+            table = ColumnarTable.from_records(
+                onu_inventory.query(olt_id=olt_id, pon_port=pon_port, status=status), ONU_FIELDS
+            )
+        return columnar_response(table, fmt)
+    if DEMO_DATA_ENABLED:
+        mark_degraded("mock_data")
+        return mock_onus()
+    if onu_inventory is None:
+        raise HTTPException(status_code=503, detail="GenieACS indisponível")
+    return []
 
-@app.get("/api/devices/olts", response_model=List[OLT])
+@api.get("/api/devices/olts", response_model=List[OLT])
 async def get_olts():
-    return mock_olts
+    """
+    Retorna as OLTs (catálogo + OLTs vistas nas ONUs) com ONUs ativas por OLT
+    """
+    onu_inventory = await refresh_onu_inventory()
+    if onu_inventory is not None and len(onu_inventory):
+        return onu_inventory.olts()
+    if DEMO_DATA_ENABLED:
+        mark_degraded("mock_data")
+        return mock_olts()
+    if onu_inventory is None:
+        raise HTTPException(status_code=503, detail="GenieACS indisponível")
+    return onu_inventory.olts()
 
-@app.get("/api/alerts", response_model=List[Alert])
-async def get_alerts():
+@api.get("/api/devices/olts/{olt_id}/pon-ports", response_model=List[PonPortStats])
+async def get_olt_pon_ports(olt_id: str):
     """
-    Retorna lista de alertas baseada em faults do GenieACS
+    Ocupação e estatísticas ópticas (RX médio, ONUs com sinal baixo) por porta PON
     """
+    onu_inventory = await refresh_onu_inventory()
+    if onu_inventory is None:
+        raise HTTPException(status_code=503, detail="GenieACS indisponível")
+    ports = onu_inventory.pon_ports(olt_id)
+    if ports is None:
+        raise HTTPException(status_code=404, detail="OLT não encontrada")
+    return ports
+
+async def render_topology(node_id: str, depth: int, limit: int):
+    topology = get_topology()
     try:
-        client = await get_genieacs_client()
-        # Buscar faults do GenieACS
-        raw_faults = await client.get_faults()
-        
-        alerts = []
-        for fault_data in raw_faults:
-            # Transformar fault em alerta
-            alert_data = transform_genieacs_fault_to_alert(fault_data)
-            if alert_data:
-                alerts.append(Alert(**alert_data))
+        with span("topology_refresh"):
+            await topology.refresh()
+    except Exception as e:
+        logger.error(f"Erro ao montar topologia: {e}")
+        raise HTTPException(status_code=503, detail="GenieACS indisponível")
+    node = topology.render(node_id, depth=depth, limit=limit)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Nó não encontrado")
+    return node
+
+@api.get("/api/topology")
+async def get_network_topology(
+    depth: int = Query(1, ge=0, le=4),
+    limit: int = Query(200, ge=1, le=1000)
+):
+    """
+    Topologia da rede a partir da raiz: por padrão só o resumo de cada OLT
+    
+    Args:
+        depth: Níveis abaixo da raiz (1 = OLTs, 2 = portas PON, 3 = ONUs, 4 = CPEs)
+        limit: Máximo de filhos por nó (os de pior saúde primeiro)
+    """
+    return await render_topology(TOPOLOGY_ROOT, depth, limit)
+
+@api.get("/api/topology/nodes/{node_id:path}")
+async def get_topology_node(
+    node_id: str,
+    depth: int = Query(1, ge=0, le=4),
+    limit: int = Query(200, ge=1, le=1000)
+):
+    """
+    Subárvore de um nó da topologia (expandida sob demanda pelo frontend)
+    
+    Args:
+        node_id: "olt:<id>", "pon:<olt>:<porta>", "onu:<id>" ou "cpe:<id>"
+        depth: Níveis de filhos incluídos
+        limit: Máximo de filhos por nó (os de pior saúde primeiro)
+    """
+    return await render_topology(node_id, depth, limit)
+
+@api.get("/api/insights/anomalies")
+async def get_anomaly_insights(limit: int = Query(20, ge=1, le=500)):
+    """
+    Anomalias atuais dos KPIs dos dispositivos no formato dos insights do dashboard
+    
+    Args:
+        limit: Quantidade máxima (maior desvio primeiro)
+    """
+    anomaly_detector = get_anomaly_detector()
+    anomalies = sorted(anomaly_detector.anomalies, key=lambda a: a["score"], reverse=True)[:limit]
+    return {
+        "enabled": anomaly_detector.available,
+        "insights": [
+            {
+                **a,
+                "id": f"{a['device_id']}:{a['metric']}",
+                "type": "anomaly",
+                "title": a["title"],
+                "description": f"{a['device_id']}: {a['description']}",
+                "confidence": a["confidence"],
+                "createdAt": a["detected_at"]
+            }
+            for a in anomalies
+        ]
+    }
+
+@api.get("/api/alerts", response_model=List[Alert])
+async def get_alerts(
+    device_id: Optional[str] = None,
+    severity: Optional[str] = None,
+    acknowledged: Optional[bool] = None,
+    include_resolved: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=5000)
+):
+    """
+    Retorna alertas derivados dos faults do GenieACS (um por dispositivo + código)
+    
+    Args:
+        device_id: Filtra por dispositivo
+        severity: Filtra por severidade ("critical", "warning", "info")
+        acknowledged: Filtra por reconhecimento
+        include_resolved: Inclui alertas cujos faults já foram resolvidos
+        limit: Quantidade máxima (mais recentes primeiro)
+    """
+    try:
+        alert_store = await load_alert_store()
+        alerts = alert_store.query(
+            device_id=device_id,
+            severity=severity,
+            acknowledged=acknowledged,
+            include_resolved=include_resolved,
+            limit=limit
+        )
         
-        logger.info(f"Retornando {len(alerts)} alertas do GenieACS")
+        logger.info(f"Retornando {len(alerts)} de {len(alert_store)} alertas")
         
-        # Se não há faults, retornar poucos alertas mock para demonstração
-        if not alerts:
-            return mock_alerts[:3]  # Apenas 3 alertas mock para demonstração
+        # Se não há alertas, retornar poucos alertas mock para demonstração
+        if not len(alert_store) and DEMO_DATA_ENABLED:
+            mark_degraded("mock_data")
+            return mock_alerts()[:3]  # Apenas 3 alertas mock para demonstração
             
         return alerts
             
     except Exception as e:
         logger.error(f"Erro ao buscar alertas do GenieACS: {e}")
-        return mock_alerts[:3]
+        if not DEMO_DATA_ENABLED:
+            raise HTTPException(status_code=503, detail="GenieACS indisponível")
+        mark_degraded("mock_data")
+        return mock_alerts()[:3]
+
+@api.patch("/api/alerts/{alert_id}/acknowledge", response_model=Alert)
+async def acknowledge_alert(alert_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Reconhece um alerta (vale até os faults do alerta serem resolvidos)
+    """
+    alert = await get_alert_store().acknowledge(alert_id, current_user.email)
+    if alert is None:
+        raise HTTPException(status_code=404, detail="Alerta não encontrado")
+    return alert
 
-@app.get("/api/dashboard/metrics")
+def count_critical_alerts(alert_store) -> int:
+    """Alertas críticos ativos e não reconhecidos (mesmo critério de /api/alerts)"""
+    return alert_store.count(severity="critical", acknowledged=False)
+
+@api.get("/api/dashboard/metrics")
 async def get_dashboard_metrics():
     """
     Retorna métricas do dashboard baseadas em dados reais do GenieACS
     """
     try:
-        client = await get_genieacs_client()
-        # Buscar dispositivos reais
-        raw_devices = await client.get_devices()
-        
-        # Transformar em estruturas padronizadas
-        devices = []
-        for device_data in raw_devices:
-            cpe_data = transform_genieacs_to_cpe(device_data)
-            if cpe_data:
-                devices.append(cpe_data)
+        # Buscar dispositivos reais já transformados e alertas em paralelo
+        devices, alert_store = await asyncio.gather(load_cpe_data(), load_alert_store())
         
         # Calcular métricas baseadas nos dispositivos reais
         metrics = calculate_dashboard_metrics(devices)
-        
-        # Buscar alertas críticos
-        raw_faults = await client.get_faults()
-        critical_alerts = len([f for f in raw_faults if f.get("code") in ["9001", "8001", "8003"]])
-        metrics["critical_alerts"] = critical_alerts
+        metrics["critical_alerts"] = count_critical_alerts(alert_store)
         
         logger.info(f"Métricas calculadas para {len(devices)} dispositivos do GenieACS")
         
-        # Fallback para métricas mock se não há dispositivos
-        if not devices:
+        # Fallback para métricas mock (modo demonstração) se não há dispositivos
+        if not devices and DEMO_DATA_ENABLED:
             logger.warning("Nenhum dispositivo encontrado, usando métricas mock")
-            return {
-                "total_devices": len(mock_cpes) + len(mock_onus) + len(mock_olts),
-                "online_devices": len([d for d in mock_cpes + mock_onus + mock_olts if d.status == "online"]),
-                "offline_devices": len([d for d in mock_cpes + mock_onus + mock_olts if d.status == "offline"]),
-                "critical_alerts": len([a for a in mock_alerts if a.severity == "critical"]),
-                "uptime_percentage": 95.0,
-                "avg_signal_strength": -42.5,
-                "avg_latency": 15.2,
-                "sla_compliance": 99.8
-            }
+            mark_degraded("mock_data")
+            return mock_dashboard_metrics()
         
         return metrics
             
     except Exception as e:
         logger.error(f"Erro ao calcular métricas do GenieACS: {e}")
+        if not DEMO_DATA_ENABLED:
+            raise HTTPException(status_code=503, detail="GenieACS indisponível")
         # Fallback para métricas mock em caso de erro
-        return {
-            "total_devices": len(mock_cpes) + len(mock_onus) + len(mock_olts),
-            "online_devices": len([d for d in mock_cpes + mock_onus + mock_olts if d.status == "online"]),
-            "offline_devices": len([d for d in mock_cpes + mock_onus + mock_olts if d.status == "offline"]),
-            "critical_alerts": len([a for a in mock_alerts if a.severity == "critical"]),
-            "uptime_percentage": 95.0,
-            "avg_signal_strength": -42.5,
-            "avg_latency": 15.2,
-            "sla_compliance": 99.8
-        }
+        mark_degraded("mock_data")
+        return mock_dashboard_metrics()
+
+@api.get("/api/dashboard/bootstrap")
+async def get_dashboard_bootstrap(
+    device_limit: int = Query(50, ge=1, le=500),
+    alert_limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Dados iniciais do dashboard em uma única resposta: métricas, primeira página
+    de dispositivos, alertas recentes e estatísticas WiFi
+    
+    Dispositivos e alertas são lidos em paralelo e o mesmo conjunto de CPEs
+    alimenta todas as seções. Os alertas vêm do store (colapsados e com estado de
+    reconhecimento, como em /api/alerts). Se só os alertas falharem, a resposta
+    sai sem eles e com o erro listado em "errors".
+    
+    Args:
+        device_limit: Tamanho da primeira página de dispositivos
+        alert_limit: Quantidade de alertas recentes
+    """
+    devices, alert_store = await asyncio.gather(load_cpe_data(), load_alert_store(), return_exceptions=True)
+    errors = {}
+    
+    if isinstance(devices, Exception):
+        logger.error(f"Erro ao buscar dispositivos para o dashboard: {devices}")
+        if not DEMO_DATA_ENABLED:
+            raise HTTPException(status_code=503, detail="GenieACS indisponível")
+        devices = []
+    
+    if isinstance(alert_store, Exception):
+        logger.error(f"Erro ao buscar alertas para o dashboard: {alert_store}")
+        errors["alerts"] = "Faults do GenieACS indisponíveis"
+        alert_store = None
+    
+    if not devices and DEMO_DATA_ENABLED:
+        mark_degraded("mock_data")
+        devices = mock_cpes()
+        metrics = mock_dashboard_metrics()
+    else:
+        metrics = calculate_dashboard_metrics(devices)
+        metrics["critical_alerts"] = None if alert_store is None else count_critical_alerts(alert_store)
+    
+    alerts = alert_store.query(limit=alert_limit) if alert_store is not None else []
+    
+    with observe_transform("wifi_stats"):
+        wifi_stats = calculate_wifi_stats(devices)
+    
+    return {
+        "metrics": metrics,
+        "devices": {
+            "items": [CPE(**cpe_data) for cpe_data in devices[:device_limit]],
+            "total": len(devices),
+            "limit": device_limit
+        },
+        "alerts": {
+            "items": [Alert(**alert_data) for alert_data in alerts],
+            "total": alert_store.count() if alert_store is not None else 0
+        },
+        "wifi_stats": wifi_stats,
+        "errors": errors
+    }
 
 # WiFi Configuration Endpoints
-@app.get("/api/wifi/configs")
+@api.get("/api/wifi/configs")
 async def get_wifi_configs():
     """
     Retorna configurações WiFi de todos os dispositivos
@@ -333,12 +876,13 @@ async def get_wifi_configs():
         raw_devices = await client.get_devices()
         
         wifi_configs = []
-        for device_data in raw_devices:
-            wifi_config = extract_wifi_config_from_device(device_data)
-            if wifi_config:
-                wifi_configs.append(wifi_config)
-        
-        formatted_data = format_wifi_configs_for_frontend(wifi_configs)
+        with observe_transform("wifi_config_batch"):
+            for device_data in raw_devices:
+                wifi_config = extract_wifi_config_from_device(device_data)
+                if wifi_config:
+                    wifi_configs.append(wifi_config)
+            
+            formatted_data = format_wifi_configs_for_frontend(wifi_configs)
         
         logger.info(f"Retornando configurações WiFi de {len(wifi_configs)} dispositivos")
         return formatted_data
@@ -359,7 +903,7 @@ async def get_wifi_configs():
             }
         }
 
-@app.get("/api/wifi/configs/{device_id}")
+@api.get("/api/wifi/configs/{device_id}")
 async def get_device_wifi_config(device_id: str, band: str = "2.4GHz"):
     """
     Retorna configuração WiFi de um dispositivo específico
@@ -371,13 +915,17 @@ async def get_device_wifi_config(device_id: str, band: str = "2.4GHz"):
     try:
         client = await get_genieacs_client()
         
-        # PRIMEIRO: Força refresh dos parâmetros de senha WiFi
+        # PRIMEIRO: Força refresh dos parâmetros de senha WiFi (ou reaproveita um recente)
         logger.info(f"🔄 FORÇANDO REFRESH de senhas WiFi para {device_id} (banda {band})")
-        await client.refresh_wifi_passwords(device_id)
+        refresh = await get_refresh_coordinator().refresh(
+            device_id, REFRESH_WIFI_PASSWORDS, lambda: client.refresh_wifi_passwords(device_id)
+        )
         
-        # Aguarda um pouco para o dispositivo processar o refresh
-        import asyncio
-        await asyncio.sleep(2)
+        # Aguarda o dispositivo processar o refresh (só o que falta desde o envio)
+        settle = REFRESH_SETTLE_SECONDS - refresh.age
+        if refresh.success and settle > 0:
+            with span("sleep"):
+                await asyncio.sleep(settle)
         
         # AGORA: Busca os dados atualizados
         device_data = await client.get_device_by_id(device_id)
@@ -385,7 +933,8 @@ async def get_device_wifi_config(device_id: str, band: str = "2.4GHz"):
         if not device_data:
             raise HTTPException(status_code=404, detail="Dispositivo não encontrado")
         
-        wifi_config = extract_wifi_config_from_device(device_data, band)
+        with observe_transform("wifi_config"):
+            wifi_config = extract_wifi_config_from_device(device_data, band)
         
         if not wifi_config:
             raise HTTPException(status_code=404, detail="Configuração WiFi não encontrada")
@@ -398,10 +947,14 @@ async def get_device_wifi_config(device_id: str, band: str = "2.4GHz"):
         logger.error(f"Erro ao buscar configuração WiFi do dispositivo {device_id}: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
-@app.put("/api/wifi/configs/{device_id}")
+@api.put("/api/wifi/configs/{device_id}", status_code=202)
 async def update_device_wifi_config(device_id: str, updates: WiFiConfigUpdate, band: str = "2.4GHz"):
     """
-    Atualiza configuração WiFi de um dispositivo
+    Enfileira a atualização da configuração WiFi de um dispositivo
+    
+    A aplicação no CPE acontece em background; o resultado é consultado em
+    /api/wifi/jobs/{job_id} ou recebido pelo stream de eventos
+    (wifi_job.completed / wifi_job.failed).
     
     Args:
         device_id: ID do dispositivo
@@ -419,46 +972,25 @@ async def update_device_wifi_config(device_id: str, updates: WiFiConfigUpdate, b
         # Converter updates para dict, removendo valores None
         update_dict = {k: v for k, v in updates.dict().items() if v is not None}
         
-        logger.info(f"🎯 UPDATE WiFi REQUEST para dispositivo {device_id} (banda: {band}):")
-        logger.info(f"   Updates raw: {updates.dict()}")
-        logger.info(f"   Updates filtrados (sem None): {update_dict}")
+        logger.info(f"🎯 UPDATE WiFi REQUEST para dispositivo {device_id} (banda: {band}): {update_dict}")
         
         if not update_dict:
             raise HTTPException(status_code=400, detail="Nenhuma atualização fornecida")
         
-        # Criar tasks de atualização
-        tasks = create_wifi_parameter_updates(device_id, update_dict, band)
-        
-        if not tasks:
-            raise HTTPException(status_code=400, detail="Nenhuma task válida gerada")
-        
-        # Executar cada task via GenieACS
-        success_count = 0
-        for task in tasks:
-            try:
-                # Aplicar task no dispositivo
-                if task["name"] == "setParameterValues":
-                    for param_name, param_value in task["parameterValues"]:
-                        success = await client.set_parameter(device_id, param_name, param_value)
-                        if success:
-                            success_count += 1
-                        else:
-                            logger.warning(f"Falha ao definir {param_name} = {param_value}")
-            except Exception as task_error:
-                logger.error(f"Erro ao executar task: {task_error}")
-        
-        if success_count == 0:
-            raise HTTPException(status_code=500, detail="Falha ao aplicar configurações")
-        
-        # Retornar configuração atualizada
-        logger.info(f"Aplicadas {success_count}/{len(tasks)} configurações WiFi no dispositivo {device_id}")
+        try:
+            job = await get_wifi_job_queue().submit(device_id, update_dict, band)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
         
         return {
             "success": True,
-            "message": f"Configurações WiFi atualizadas ({success_count}/{len(tasks)} sucessos)",
-            "applied_updates": update_dict,
-            "tasks_executed": success_count,
-            "total_tasks": len(tasks)
+            "message": "Atualização WiFi enfileirada",
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/api/wifi/jobs/{job.id}",
+            "applied_updates": update_dict
         }
         
     except HTTPException:
@@ -467,7 +999,74 @@ async def update_device_wifi_config(device_id: str, updates: WiFiConfigUpdate, b
         logger.error(f"Erro ao atualizar configuração WiFi do dispositivo {device_id}: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
-@app.post("/api/wifi/refresh/{device_id}")
+@api.get("/api/wifi/jobs/{job_id}")
+async def get_wifi_job(job_id: str):
+    """
+    Status de um job de atualização WiFi
+    
+    Returns:
+        Job com status "queued", "running", "completed", "partial" ou "failed"
+        e o resultado de cada parâmetro
+    """
+    job = await get_wifi_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+@api.post("/api/wifi/bulk", status_code=202)
+async def apply_wifi_profile_bulk(request: BulkWiFiApply):
+    """
+    Aplica um perfil WiFi a todos os dispositivos que atendem ao seletor
+    
+    Cada dispositivo recebe apenas os parâmetros que diferem do perfil; a execução
+    acontece em background com limites de concorrência global e por OLT.
+    
+    Args:
+        request: Perfil, seletor de dispositivos, banda e dry_run (só planeja)
+    """
+    profile = {k: v for k, v in request.profile.dict().items() if v is not None and k != "band"}
+    if not profile:
+        raise HTTPException(status_code=400, detail="Perfil sem campos para aplicar")
+    
+    selector = request.selector.dict(exclude_none=True)
+    if not any(v for k, v in selector.items() if k != "online_only"):
+        raise HTTPException(status_code=400, detail="Seletor de dispositivos vazio")
+    
+    # Seletor por OLT e limite por OLT dependem do índice de ONUs
+    await refresh_onu_inventory()
+    operation = get_bulk_wifi_scheduler().submit(profile, request.band, selector, request.dry_run)
+    return {
+        "success": True,
+        "operation_id": operation.id,
+        "status": operation.status,
+        "status_url": f"/api/wifi/bulk/{operation.id}"
+    }
+
+@api.get("/api/wifi/bulk/{operation_id}")
+async def get_wifi_bulk_operation(operation_id: str, include_devices: bool = False):
+    """
+    Progresso de um push WiFi em massa
+    
+    Args:
+        operation_id: ID da operação
+        include_devices: Inclui o plano e o resultado de cada dispositivo
+    """
+    operation = await get_bulk_wifi_scheduler().get(operation_id, include_devices)
+    if operation is None:
+        raise HTTPException(status_code=404, detail="Operação não encontrada")
+    return operation
+
+@api.post("/api/wifi/bulk/{operation_id}/cancel")
+async def cancel_wifi_bulk_operation(operation_id: str):
+    """
+    Interrompe um push WiFi em massa (dispositivos em andamento terminam)
+    """
+    operation = get_bulk_wifi_scheduler().cancel(operation_id)
+    if operation is None:
+        raise HTTPException(status_code=404, detail="Operação não encontrada neste servidor")
+    return operation.to_dict()
+
+@api.post("/api/wifi/refresh/{device_id}")
 async def refresh_device_wifi_config(device_id: str):
     """
     Força refresh das configurações WiFi de um dispositivo
@@ -481,15 +1080,18 @@ async def refresh_device_wifi_config(device_id: str):
             raise HTTPException(status_code=404, detail="Dispositivo não encontrado")
         
         # Executar summon imediato (como botão Summon do GenieACS UI)
-        success = await client.summon_device(device_id)
+        refresh = await get_refresh_coordinator().refresh(
+            device_id, REFRESH_SUMMON, lambda: client.summon_device(device_id)
+        )
         
-        if not success:
+        if not refresh.success:
             raise HTTPException(status_code=500, detail="Falha ao executar refresh")
         
         return {
             "success": True,
             "message": "Refresh de configurações WiFi solicitado",
-            "device_id": device_id
+            "device_id": device_id,
+            "refresh": refresh.to_dict()
         }
         
     except HTTPException:
@@ -498,7 +1100,7 @@ async def refresh_device_wifi_config(device_id: str):
         logger.error(f"Erro ao fazer refresh do dispositivo {device_id}: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
-@app.post("/api/wifi/refresh-ip/{device_id}")
+@api.post("/api/wifi/refresh-ip/{device_id}")
 async def refresh_device_ip_parameters(device_id: str):
     """
     Força refresh dos parâmetros de IP de um dispositivo
@@ -512,15 +1114,18 @@ async def refresh_device_ip_parameters(device_id: str):
             raise HTTPException(status_code=404, detail="Dispositivo não encontrado")
         
         # Executar refresh dos parâmetros IP
-        success = await client.refresh_ip_parameters(device_id)
+        refresh = await get_refresh_coordinator().refresh(
+            device_id, REFRESH_IP_PARAMETERS, lambda: client.refresh_ip_parameters(device_id)
+        )
         
-        if not success:
+        if not refresh.success:
             raise HTTPException(status_code=500, detail="Falha ao executar refresh de IP")
         
         return {
             "success": True,
             "message": "Refresh de parâmetros IP solicitado",
-            "device_id": device_id
+            "device_id": device_id,
+            "refresh": refresh.to_dict()
         }
         
     except HTTPException:
@@ -530,3 +1135,243 @@ async def refresh_device_ip_parameters(device_id: str):
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
+
+
+# Real-time Stream Endpoints
+@app.get("/api/stream/events", dependencies=[Depends(get_stream_user)])
+async def stream_events(request: Request, since: Optional[int] = None):
+    """
+    Stream SSE com deltas de status de dispositivos, faults e métricas
+    
+    Args:
+        since: Última versão recebida; o header Last-Event-ID tem o mesmo efeito
+            e é enviado automaticamente pelo EventSource ao reconectar
+    
+    Com JWT configurado, o token vai no header Authorization ou, para o
+    EventSource do navegador, em ?access_token=...
+    """
+    if since is None:
+        last_event_id = request.headers.get("last-event-id")
+        if last_event_id and last_event_id.isdigit():
+            since = int(last_event_id)
+    
+    event_broker = get_event_broker()
+    return StreamingResponse(
+        event_broker.sse_stream(since),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+# Export Endpoints
+def export_response(chunks, fmt: str, kind: str) -> StreamingResponse:
+    filename = f"{kind}-{datetime.now():%Y%m%d-%H%M%S}.{fmt}"
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api.get("/api/export/cpes")
+async def export_cpes(fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+                      fields: Optional[str] = None, status: Optional[str] = None,
+                      model: Optional[str] = None):
+    """
+    Exporta os CPEs em CSV ou NDJSON, enviados em blocos à medida que são lidos
+    
+    Args:
+        fmt: "csv" ou "ndjson"
+        fields: Campos separados por vírgula (padrão: todos)
+        status: Filtra por status ("online"/"offline")
+        model: Filtra por modelo
+    """
+    try:
+        selected = select_fields(fields, CPE_EXPORT_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        records = await cpe_records()
+    except Exception as e:
+        logger.error(f"Erro ao exportar CPEs: {e}")
+        raise HTTPException(status_code=503, detail="GenieACS indisponível")
+    
+    matches = record_filter({"status": status, "model": model})
+    return export_response(serialize(records, selected, fmt, matches), fmt, "cpes")
+
+@api.get("/api/export/onus")
+async def export_onus(fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+                      fields: Optional[str] = None, olt_id: Optional[str] = None,
+                      pon_port: Optional[str] = None, status: Optional[str] = None,
+                      model: Optional[str] = None):
+    """
+    Exporta as ONUs em CSV ou NDJSON, enviadas em blocos à medida que são lidas
+    
+    Args:
+        fmt: "csv" ou "ndjson"
+        fields: Campos separados por vírgula (padrão: todos)
+        olt_id: Filtra por OLT
+        pon_port: Filtra por porta PON da OLT
+        status: Filtra por status ("online"/"offline")
+        model: Filtra por modelo
+    """
+    try:
+        selected = select_fields(fields, ONU_EXPORT_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        records = await onu_records(olt_id=olt_id, pon_port=pon_port, status=status)
+    except Exception as e:
+        logger.error(f"Erro ao exportar ONUs: {e}")
+        raise HTTPException(status_code=503, detail="GenieACS indisponível")
+    
+    return export_response(serialize(records, selected, fmt, record_filter({"model": model})), fmt, "onus")
+
+
+# KPI History Endpoints
+async def query_kpi_history(start: Optional[datetime], end: Optional[datetime], bucket: str,
+                            device_id: str = None) -> dict:
+    kpi_history = get_kpi_history()
+    if not kpi_history.ready:
+        raise HTTPException(status_code=503, detail="Histórico de KPIs indisponível")
+    
+    try:
+        start, end = resolve_time_range(start, end)
+        bucket_seconds = parse_bucket(bucket)
+        buckets = await kpi_history.query(start, end, bucket_seconds, device_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "device_id": device_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "bucket_seconds": bucket_seconds,
+        "buckets": buckets
+    }
+
+@api.get("/api/history/fleet")
+async def get_fleet_history(start: Optional[datetime] = None, end: Optional[datetime] = None, bucket: str = "1h",
+                            fmt: str = Depends(response_format)):
+    """
+    Histórico agregado da frota (uptime, RSSI e potência óptica) por bucket de tempo
+    
+    Args:
+        start: Início do intervalo (padrão: 24h antes de end)
+        end: Fim do intervalo (padrão: agora)
+        bucket: Tamanho do bucket ("5m", "1h", "1d" ou segundos)
+    """
+    history = await query_kpi_history(start, end, bucket)
+    if fmt != FORMAT_JSON:
+        return columnar_response(history_table(history, "buckets"), fmt)
+    return history
+
+@api.get("/api/history/chart")
+async def get_history_chart(metric: str = "uptime", scope: str = "fleet", start: Optional[datetime] = None,
+                            end: Optional[datetime] = None, points: int = 500, method: str = "lttb",
+                            fmt: str = Depends(response_format)):
+    """
+    Série temporal reduzida no servidor para os gráficos do frontend
+    
+    Args:
+        metric: "uptime", "rssi", "rx_power" ou "tx_power"
+        scope: "fleet", "olt:<id>" ou "device:<id>"
+        start: Início do intervalo (padrão: 24h antes de end)
+        end: Fim do intervalo (padrão: agora)
+        points: Número máximo de pontos retornados
+        method: "lttb" ou "minmax" (buckets com mínimo, média e máximo)
+    """
+    kpi_history = get_kpi_history()
+    if not kpi_history.ready:
+        raise HTTPException(status_code=503, detail="Histórico de KPIs indisponível")
+    
+    try:
+        start, end = resolve_time_range(start, end)
+        chart = await kpi_history.chart(metric, scope, start, end, points, method)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    chart.update({"start": start.isoformat(), "end": end.isoformat()})
+    if fmt != FORMAT_JSON:
+        fields = ["ts", "value"] if method == "lttb" else ["ts", "min", "avg", "max"]
+        return columnar_response(history_table(chart, "points", fields), fmt)
+    return chart
+
+@api.get("/api/history/devices/{device_id}")
+async def get_device_history(device_id: str, start: Optional[datetime] = None,
+                             end: Optional[datetime] = None, bucket: str = "5m",
+                             fmt: str = Depends(response_format)):
+    """
+    Histórico de KPIs de um dispositivo por bucket de tempo
+    
+    Args:
+        device_id: ID do dispositivo
+        start: Início do intervalo (padrão: 24h antes de end)
+        end: Fim do intervalo (padrão: agora)
+        bucket: Tamanho do bucket ("5m", "1h", "1d" ou segundos)
+    """
+    history = await query_kpi_history(start, end, bucket, device_id)
+    if fmt != FORMAT_JSON:
+        return columnar_response(history_table(history, "buckets"), fmt)
+    return history
+
+@api.get("/api/history/devices/{device_id}/ip-changes")
+async def get_device_ip_changes(device_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """
+    Mudanças de endereço IP registradas para um dispositivo
+    """
+    kpi_history = get_kpi_history()
+    if not kpi_history.ready:
+        raise HTTPException(status_code=503, detail="Histórico de KPIs indisponível")
+    
+    try:
+        start, end = resolve_time_range(start, end, timedelta(days=30))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "device_id": device_id,
+        "changes": await kpi_history.ip_changes(device_id, start, end)
+    }
+
+
+# Admin Endpoints
+@api.get("/api/admin/profile")
+async def profile_process(seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS),
+                          interval_ms: float = Query(5, ge=1, le=100),
+                          all_threads: bool = False,
+                          current_user: User = Depends(require_admin)):
+    """
+    Executa o profiler por amostragem no processo em execução e retorna o perfil
+    no formato collapsed (pronto para flamegraph.pl, speedscope ou inferno)
+    
+    Args:
+        seconds: Duração da amostragem
+        interval_ms: Intervalo entre amostras em milissegundos
+        all_threads: Amostra todas as threads, não só a do event loop
+    """
+    # Sem autenticação real todos são o admin de desenvolvimento: só com liberação explícita
+    if not get_jwt_authenticator().enabled and os.getenv("PROFILER_ALLOW_WITHOUT_AUTH", "false").lower() != "true":
+        raise HTTPException(status_code=403, detail="Profiler exige autenticação JWT configurada")
+    
+    profiler = get_profiler()
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="Já existe um perfil em execução")
+    
+    logger.info(f"🔬 Perfil de {seconds}s solicitado por {current_user.email}")
+    try:
+        profile = await profiler.profile(seconds, interval_ms / 1000, all_threads)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return Response(
+        content=profile,
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="profile-{os.getpid()}.collapsed"'}
+    )
+
+app.include_router(api)
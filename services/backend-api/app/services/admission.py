@@ -0,0 +1,176 @@
+"""
+Admission Control
+Token bucket com prioridades para as tasks com connection request enviadas ao GenieACS:
+limita a taxa de sessões CWMP disparadas e rejeita (429) quando a fila enche ou a
+espera ultrapassa o limite, em vez de deixar a requisição estourar o timeout
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.services.metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_REQUESTS, ADMISSION_WAIT
+from app.services.resilience import deadline_remaining
+
+# Prioridades (menor = mais prioritário)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk"}
+
+_current_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "connection_request_priority", default=PRIORITY_INTERACTIVE
+)
+
+
+@contextmanager
+def admission_priority(priority: int) -> Iterator[None]:
+    """
+    Define a prioridade dos connection requests disparados dentro do bloco
+
+    Args:
+        priority: PRIORITY_INTERACTIVE ou PRIORITY_BULK
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class AdmissionRejected(HTTPException):
+    """Connection request descartado pelo controle de admissão (HTTP 429)"""
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, int(retry_after + 0.5)))}
+        )
+
+
+class ConnectionRequestAdmission:
+    """
+    Token bucket com fila por prioridade
+
+    Os tokens são repostos à taxa `rate` por segundo até `burst`. Sem token livre, o
+    chamador entra na fila da sua prioridade; a fila interativa é sempre atendida
+    antes da de bulk. Filas cheias ou espera acima de `max_wait` resultam em
+    AdmissionRejected.
+    """
+
+    def __init__(self, rate: float = None, burst: float = None,
+                 max_queue: Dict[int, int] = None, max_wait: Dict[int, float] = None):
+        self.rate = rate or float(os.getenv("GENIEACS_CR_RATE", "10"))
+        self.burst = burst or float(os.getenv("GENIEACS_CR_BURST", "20"))
+        self.max_queue = max_queue or {
+            PRIORITY_INTERACTIVE: int(os.getenv("GENIEACS_CR_QUEUE_INTERACTIVE", "100")),
+            PRIORITY_BULK: int(os.getenv("GENIEACS_CR_QUEUE_BULK", "1000"))
+        }
+        self.max_wait = max_wait or {
+            PRIORITY_INTERACTIVE: float(os.getenv("GENIEACS_CR_MAX_WAIT_INTERACTIVE", "5")),
+            PRIORITY_BULK: float(os.getenv("GENIEACS_CR_MAX_WAIT_BULK", "120"))
+        }
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+        self._seq = itertools.count()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._depth: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self._pump_task: Optional[asyncio.Task] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def queue_depth(self, priority: int) -> int:
+        return self._depth[priority]
+
+    async def acquire(self, priority: int = None) -> None:
+        """
+        Aguarda um token para disparar um connection request
+
+        Args:
+            priority: Prioridade (padrão: a do contexto, interativa se não definida)
+
+        Raises:
+            AdmissionRejected: Fila cheia ou espera acima do limite
+        """
+        if priority is None:
+            priority = _current_priority.get()
+        label = PRIORITY_NAMES[priority]
+
+        self._refill()
+        if self.tokens >= 1 and not self._waiters:
+            self.tokens -= 1
+            ADMISSION_REQUESTS.labels(label, "admitted").inc()
+            ADMISSION_WAIT.labels(label).observe(0)
+            return
+
+        if self._depth[priority] >= self.max_queue[priority]:
+            ADMISSION_REQUESTS.labels(label, "rejected_queue_full").inc()
+            raise AdmissionRejected(
+                "GenieACS sobrecarregado: fila de connection requests cheia",
+                self._depth[priority] / self.rate
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._depth[priority] += 1
+        ADMISSION_QUEUE_DEPTH.labels(label).set(self._depth[priority])
+        self._ensure_pump()
+
+        # A espera também não passa do deadline da requisição da API
+        max_wait = self.max_wait[priority]
+        remaining = deadline_remaining()
+        if remaining is not None:
+            max_wait = max(0.0, min(max_wait, remaining))
+
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                ADMISSION_REQUESTS.labels(label, "rejected_timeout").inc()
+                raise AdmissionRejected(
+                    "GenieACS sobrecarregado: tempo de espera por connection request excedido",
+                    max_wait
+                )
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            raise
+        finally:
+            if future.cancelled():
+                self._depth[priority] -= 1
+                ADMISSION_QUEUE_DEPTH.labels(label).set(self._depth[priority])
+
+        ADMISSION_REQUESTS.labels(label, "admitted").inc()
+        ADMISSION_WAIT.labels(label).observe(time.monotonic() - start)
+
+    def _ensure_pump(self) -> None:
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+
+    async def _pump(self) -> None:
+        # Libera os tokens para a fila, em ordem de prioridade, à medida que são repostos
+        while self._waiters:
+            self._refill()
+            while self.tokens >= 1 and self._waiters:
+                priority, _, future = heapq.heappop(self._waiters)
+                if future.cancelled():
+                    continue
+                self.tokens -= 1
+                self._depth[priority] -= 1
+                ADMISSION_QUEUE_DEPTH.labels(PRIORITY_NAMES[priority]).set(self._depth[priority])
+                future.set_result(None)
+            if self._waiters:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
@@ -0,0 +1,437 @@
+"""
+Alert Store
+Alertas derivados dos faults do GenieACS mantidos em memória e atualizados de forma
+incremental: faults repetidos do mesmo dispositivo e código viram um único alerta
+com contagem, e os índices por dispositivo, severidade e reconhecimento respondem
+as consultas sem varrer todos os alertas
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.services.genieacs_client import get_genieacs_client
+from app.services.genieacs_transformers import transform_genieacs_fault_to_alert
+from app.services.inventory_sync import get_inventory_sync
+from app.services.metrics import observe_transform
+from app.services.shared_cache import SharedCache, get_shared_cache
+from app.services.tracing import mark_degraded
+
+logger = logging.getLogger(__name__)
+
+# Hash do cache compartilhado com os reconhecimentos (campo alert_id -> {"at", "by"})
+ACKS_NAME = "alert-acks"
+
+
+def alert_id_for(device_id: str, code: str) -> str:
+    """ID estável do alerta de um dispositivo + código de fault"""
+    digest = hashlib.sha1(f"{device_id}|{code}".encode()).hexdigest()[:16]
+    return f"alert-{digest}"
+
+
+def _as_utc(value: str) -> datetime:
+    moment = datetime.fromisoformat(value)
+    return moment.astimezone(timezone.utc)
+
+
+class AlertStore:
+    """
+    Alertas colapsados por dispositivo + código de fault
+
+    A fonte é o snapshot do sync de inventário quando disponível (só os faults com
+    timestamp novo são transformados) ou, sem ele, consultas incrementais ao
+    GenieACS por `timestamp` mais a lista de IDs para detectar faults resolvidos.
+    Um alerta fica ativo enquanto algum fault dele existir no GenieACS; resolvido,
+    é mantido por `retention` segundos. Os reconhecimentos ficam no cache
+    compartilhado e valem até o alerta ser resolvido.
+    """
+
+    def __init__(self, refresh_interval: float = None, retention: float = None,
+                 shared_cache: SharedCache = None):
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else float(os.getenv("ALERT_REFRESH_INTERVAL", "5"))
+        )
+        self.retention = retention or float(os.getenv("ALERT_RETENTION", "604800"))
+        self.shared_cache = shared_cache
+
+        self._alerts: Dict[str, Dict[str, Any]] = {}
+        # Índices
+        self._by_device: Dict[str, Set[str]] = {}
+        self._by_severity: Dict[str, Set[str]] = {}
+        self._unacknowledged: Set[str] = set()
+        self._active: Set[str] = set()
+        # Faults vistos: timestamp da última versão ingerida e alerta de destino
+        self._fault_timestamps: Dict[str, str] = {}
+        self._fault_alert: Dict[str, str] = {}
+        self._alert_faults: Dict[str, Set[str]] = {}
+
+        self._acks: Dict[str, Dict[str, Any]] = {}
+        # Alertas gerados pelo detector de anomalias (fora do ciclo de faults)
+        self._anomaly_alerts: Set[str] = set()
+        # Incrementada quando algum alerta muda (consumidores derivados, ex: topologia)
+        self.version = 0
+        self._watermark: Optional[str] = None
+        self._last_source: Optional[Dict[str, Any]] = None
+        self._last_refresh: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    # Ingestão
+
+    def _ingest_fault(self, fault: Dict[str, Any]) -> bool:
+        fault_id = fault.get("_id")
+        timestamp = fault.get("timestamp") or ""
+        if not fault_id or self._fault_timestamps.get(fault_id) == timestamp:
+            return False
+
+        alert_data = transform_genieacs_fault_to_alert(fault)
+        if not alert_data:
+            return False
+        first_sight = fault_id not in self._fault_timestamps
+        self._fault_timestamps[fault_id] = timestamp
+        if timestamp and (self._watermark is None or timestamp > self._watermark):
+            self._watermark = timestamp
+
+        device_id = alert_data["device_id"]
+        code = str(alert_data["_genieacs_metadata"]["fault_code"])
+        alert_id = alert_id_for(device_id, code)
+        # Na primeira vez o fault pode já ter sido repetido pelo GenieACS (retries)
+        occurrences = 1 + int(fault.get("retries") or 0) if first_sight else 1
+        self._upsert_alert(alert_id, device_id, code, alert_data["severity"], alert_data["title"],
+                           alert_data["description"], _as_utc(alert_data["created_at"]), occurrences)
+
+        self._fault_alert[fault_id] = alert_id
+        self._alert_faults.setdefault(alert_id, set()).add(fault_id)
+        return True
+
+    def _upsert_alert(self, alert_id: str, device_id: str, code: str, severity: str, title: str,
+                      description: str, seen_at: datetime, occurrences: int) -> Dict[str, Any]:
+        alert = self._alerts.get(alert_id)
+        if alert is None:
+            alert = self._alerts[alert_id] = {
+                "id": alert_id,
+                "device_id": device_id,
+                "code": code,
+                "severity": severity,
+                "title": title,
+                "description": description,
+                "count": occurrences,
+                "first_seen": seen_at,
+                "last_seen": seen_at,
+                "created_at": seen_at,
+                "acknowledged": False,
+                "acknowledged_at": None,
+                "acknowledged_by": None,
+                "active": True,
+                "resolved_at": None
+            }
+            self._by_device.setdefault(device_id, set()).add(alert_id)
+            self._by_severity.setdefault(severity, set()).add(alert_id)
+            self._unacknowledged.add(alert_id)
+            self._active.add(alert_id)
+            ack = self._acks.get(alert_id)
+            if ack is not None:
+                self._set_acknowledged(alert, ack)
+            return alert
+
+        alert["count"] += occurrences
+        alert["first_seen"] = min(alert["first_seen"], seen_at)
+        alert["last_seen"] = max(alert["last_seen"], seen_at)
+        alert["title"] = title
+        alert["description"] = description
+        if alert["severity"] != severity:
+            self._by_severity[alert["severity"]].discard(alert_id)
+            self._by_severity.setdefault(severity, set()).add(alert_id)
+            alert["severity"] = severity
+        if not alert["active"]:
+            # Voltou depois de resolvido: é um novo problema, sem reconhecimento
+            alert["active"] = True
+            alert["resolved_at"] = None
+            alert["first_seen"] = alert["created_at"] = seen_at
+            alert["count"] = occurrences
+            self._active.add(alert_id)
+        return alert
+
+    def _mark_resolved(self, alert_id: str, now: datetime) -> None:
+        alert = self._alerts[alert_id]
+        alert["active"] = False
+        alert["resolved_at"] = now
+        self._active.discard(alert_id)
+        if alert["acknowledged"]:
+            self._set_acknowledged(alert, None)
+
+    def _resolve_faults(self, fault_ids: Set[str]) -> List[str]:
+        """Remove faults que não existem mais no GenieACS; retorna alertas resolvidos"""
+        resolved = []
+        now = datetime.now(timezone.utc)
+        for fault_id in fault_ids:
+            self._fault_timestamps.pop(fault_id, None)
+            alert_id = self._fault_alert.pop(fault_id, None)
+            if alert_id is None:
+                continue
+            faults = self._alert_faults.get(alert_id)
+            if faults is None:
+                continue
+            faults.discard(fault_id)
+            if not faults:
+                del self._alert_faults[alert_id]
+                self._mark_resolved(alert_id, now)
+                resolved.append(alert_id)
+        return resolved
+
+    def _prune(self) -> None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention)
+        for alert_id in [a for a in self._alerts if a not in self._active]:
+            alert = self._alerts[alert_id]
+            if alert["resolved_at"] is not None and alert["resolved_at"] < cutoff:
+                del self._alerts[alert_id]
+                self._by_device[alert["device_id"]].discard(alert_id)
+                self._by_severity[alert["severity"]].discard(alert_id)
+                self._unacknowledged.discard(alert_id)
+
+    async def apply_faults(self, faults: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Sincroniza o store com o conjunto completo de faults (ex: snapshot do sync)
+
+        Args:
+            faults: Faults raw indexados por _id
+        """
+        with observe_transform("alert_ingest"):
+            changed = sum(1 for fault in faults.values() if self._ingest_fault(fault))
+            resolved = self._resolve_faults(self._fault_timestamps.keys() - faults.keys())
+            self._prune()
+        if changed or resolved:
+            self.version += 1
+            logger.info(f"🚨 Alertas: {changed} faults novos/atualizados, {len(resolved)} alertas resolvidos")
+        if resolved:
+            await self._drop_acks(resolved)
+
+    async def apply_anomalies(self, anomalies: List[Dict[str, Any]]) -> None:
+        """
+        Sincroniza os alertas de anomalia com as anomalias do ciclo atual
+
+        Cada anomalia ativa (dispositivo + métrica) é um alerta com código
+        "anomaly.<métrica>"; a anomalia que deixa de aparecer resolve o alerta.
+
+        Args:
+            anomalies: Anomalias do detector (device_id, metric, severity, title,
+                description, detected_at)
+        """
+        current = set()
+        for anomaly in anomalies:
+            code = f"anomaly.{anomaly['metric']}"
+            alert_id = alert_id_for(anomaly["device_id"], code)
+            current.add(alert_id)
+            # Cada ciclo em que a anomalia persiste conta como uma ocorrência
+            self._upsert_alert(alert_id, anomaly["device_id"], code, anomaly["severity"], anomaly["title"],
+                               anomaly["description"], _as_utc(anomaly["detected_at"]), 1)
+
+        now = datetime.now(timezone.utc)
+        resolved = [a for a in self._anomaly_alerts - current if a in self._active]
+        for alert_id in resolved:
+            self._mark_resolved(alert_id, now)
+        self._anomaly_alerts = current
+        if current or resolved:
+            self.version += 1
+        if resolved:
+            await self._drop_acks(resolved)
+
+    async def _poll(self) -> None:
+        # Sem snapshot: só os faults com timestamp novo + IDs para detectar resolvidos
+        # ($gte: faults com o mesmo timestamp da marca que chegaram depois não se perdem;
+        # os já ingeridos são ignorados pela comparação de timestamp)
+        client = await get_genieacs_client()
+        query = {"timestamp": {"$gte": self._watermark}} if self._watermark else None
+        changed_faults, current_ids = await asyncio.gather(
+            client.get_faults(query=query, raise_errors=True, use_cache=False),
+            client.get_faults(projection=["_id"], raise_errors=True, use_cache=False)
+        )
+        current = {f["_id"] for f in current_ids if f.get("_id")}
+        with observe_transform("alert_ingest"):
+            changed = sum(1 for fault in changed_faults if self._ingest_fault(fault))
+            resolved = self._resolve_faults(self._fault_timestamps.keys() - current)
+            self._prune()
+        if changed or resolved:
+            self.version += 1
+            logger.info(f"🚨 Alertas: {changed} faults novos/atualizados, {len(resolved)} alertas resolvidos")
+        if resolved:
+            await self._drop_acks(resolved)
+
+    async def refresh(self) -> None:
+        """
+        Atualiza o store antes de uma consulta
+
+        Raises:
+            Exception: Falha ao consultar o GenieACS sem nenhum dado carregado
+        """
+        snapshot = get_inventory_sync().get_snapshot()
+        if snapshot is not None:
+            # O mesmo snapshot já aplicado não precisa ser percorrido de novo
+            if snapshot["faults"] is not self._last_source:
+                await self.apply_faults(snapshot["faults"])
+                self._last_source = snapshot["faults"]
+                self._last_refresh = time.monotonic()
+            return
+
+        async with self._refresh_lock:
+            if self._last_refresh is not None and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return
+            try:
+                await self._poll()
+                self._last_source = None
+                self._last_refresh = time.monotonic()
+            except Exception as e:
+                if self._last_refresh is None:
+                    raise
+                logger.warning(f"⚠️ Falha ao atualizar alertas, servindo os já carregados: {e}")
+                mark_degraded("genieacs_unavailable", time.monotonic() - self._last_refresh)
+
+    # Consulta
+
+    def query(self, device_id: str = None, severity: str = None, acknowledged: bool = None,
+              include_resolved: bool = False, limit: int = None) -> List[Dict[str, Any]]:
+        """
+        Lista alertas pelos índices (interseção começando pelo menor conjunto)
+
+        Args:
+            device_id: Filtra por dispositivo
+            severity: Filtra por severidade
+            acknowledged: True/False filtra por reconhecimento; None não filtra
+            include_resolved: Inclui alertas resolvidos (ainda na retenção)
+            limit: Quantidade máxima (os mais recentes primeiro)
+        """
+        ids = self._select(device_id, severity, acknowledged, include_resolved)
+        alerts = sorted((self._alerts[i] for i in ids), key=lambda a: a["last_seen"], reverse=True)
+        return alerts[:limit] if limit else alerts
+
+    def count(self, device_id: str = None, severity: str = None, acknowledged: bool = None,
+              include_resolved: bool = False) -> int:
+        """Quantidade de alertas com os mesmos filtros de query(), sem ordenar"""
+        return len(self._select(device_id, severity, acknowledged, include_resolved))
+
+    def _select(self, device_id: Optional[str], severity: Optional[str], acknowledged: Optional[bool],
+                include_resolved: bool) -> Set[str]:
+        candidates: List[Set[str]] = []
+        if device_id is not None:
+            candidates.append(self._by_device.get(device_id, set()))
+        if severity is not None:
+            candidates.append(self._by_severity.get(severity, set()))
+        if acknowledged is False:
+            candidates.append(self._unacknowledged)
+        if not include_resolved:
+            candidates.append(self._active)
+
+        if candidates:
+            candidates.sort(key=len)
+            ids = set(candidates[0]).intersection(*candidates[1:])
+        else:
+            ids = set(self._alerts)
+        if acknowledged is True:
+            ids -= self._unacknowledged
+        return ids
+
+    def get(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        return self._alerts.get(alert_id)
+
+    def active_counts(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Alertas ativos por dispositivo
+
+        Returns:
+            {device_id: (total, críticos)}
+        """
+        counts: Dict[str, Tuple[int, int]] = {}
+        for alert_id in self._active:
+            alert = self._alerts[alert_id]
+            total, critical = counts.get(alert["device_id"], (0, 0))
+            counts[alert["device_id"]] = (total + 1, critical + (alert["severity"] == "critical"))
+        return counts
+
+    # Reconhecimentos
+
+    def _set_acknowledged(self, alert: Dict[str, Any], ack: Optional[Dict[str, Any]]) -> None:
+        alert["acknowledged"] = ack is not None
+        alert["acknowledged_at"] = ack["at"] if ack else None
+        alert["acknowledged_by"] = ack["by"] if ack else None
+        if ack is None:
+            self._unacknowledged.add(alert["id"])
+        else:
+            self._unacknowledged.discard(alert["id"])
+
+    async def acknowledge(self, alert_id: str, user: str) -> Optional[Dict[str, Any]]:
+        """
+        Reconhece um alerta (persistido e replicado para os demais workers)
+
+        Args:
+            alert_id: ID do alerta
+            user: Quem reconheceu
+
+        Returns:
+            Alerta atualizado ou None se não existir
+        """
+        alert = self._alerts.get(alert_id)
+        if alert is None:
+            return None
+        ack = {"at": datetime.now(timezone.utc).isoformat(), "by": user}
+        self._acks[alert_id] = ack
+        self._set_acknowledged(alert, ack)
+        await self._save_acks(set_acks={alert_id: ack})
+        logger.info(f"✔️ Alerta {alert_id} reconhecido por {user}")
+        return alert
+
+    async def _drop_acks(self, alert_ids: List[str]) -> None:
+        dropped = [a for a in alert_ids if self._acks.pop(a, None) is not None]
+        if dropped:
+            await self._save_acks(drop=dropped)
+
+    async def _save_acks(self, set_acks: Dict[str, Dict[str, Any]] = None, drop: List[str] = None) -> None:
+        if self.shared_cache is None:
+            return
+        try:
+            # Um campo por alerta (HSET/HDEL): workers diferentes não sobrescrevem
+            # os reconhecimentos uns dos outros; o hash expira junto com a retenção
+            if set_acks:
+                await self.shared_cache.set_hash_fields(ACKS_NAME, set_acks, ttl=self.retention)
+            if drop:
+                await self.shared_cache.delete_hash_fields(ACKS_NAME, drop)
+        except Exception as e:
+            logger.error(f"Erro ao gravar reconhecimentos de alertas: {e}")
+
+    async def load_acks(self, name: str = ACKS_NAME) -> None:
+        """Carrega os reconhecimentos persistidos (startup e invalidação por outro worker)"""
+        if self.shared_cache is None:
+            return
+        self._acks = await self.shared_cache.get_hash(ACKS_NAME)
+        for alert_id, alert in self._alerts.items():
+            ack = self._acks.get(alert_id)
+            if (ack is not None) != alert["acknowledged"]:
+                self._set_acknowledged(alert, ack)
+
+    async def start(self) -> None:
+        """Carrega os reconhecimentos e passa a acompanhar as alterações dos outros workers"""
+        if self.shared_cache is not None:
+            self.shared_cache.on_invalidate(ACKS_NAME, self.load_acks)
+            try:
+                await self.load_acks()
+            except Exception as e:
+                logger.error(f"Erro ao carregar reconhecimentos de alertas: {e}")
+
+
+# Singleton global para reutilização
+_alert_store: Optional[AlertStore] = None
+
+def get_alert_store() -> AlertStore:
+    """
+    Retorna uma instância singleton do store de alertas
+    """
+    global _alert_store
+    if _alert_store is None:
+        _alert_store = AlertStore(shared_cache=get_shared_cache())
+    return _alert_store
@@ -0,0 +1,327 @@
+"""
+Anomaly Detector
+Detecção de anomalias em streaming sobre os KPIs dos dispositivos (RSSI dos
+clientes WiFi, potência RX, intervalo desde o último inform e taxa de faults),
+alimentada pelo sync de inventário e emitida como alertas
+
+Depende do numpy (requirements-analytics.txt); sem ele a detecção fica desligada.
+"""
+
+import logging
+import os
+import warnings
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.services.alert_store import get_alert_store
+from app.services.genieacs_transformers import extract_optical_power, extract_wifi_rssi
+from app.services.inventory_sync import get_inventory_sync
+from app.services.metrics import observe_transform
+from app.services.shared_cache import SharedCache, get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Anomalias atuais no cache compartilhado (publicadas pelo líder do sync)
+ANOMALIES_NAME = "anomalies"
+
+# (métrica, direção ruim: -1 queda / +1 alta, desvio mínimo, rótulo, unidade)
+METRICS = [
+    ("rssi", -1, 2.0, "RSSI", "dBm"),
+    ("rx_power", -1, 1.0, "potência RX", "dBm"),
+    ("inform_gap", 1, 60.0, "intervalo sem inform", "s"),
+    ("fault_rate", 1, 1.0, "taxa de faults", "faults/ciclo"),
+]
+
+# Fator que torna o MAD um estimador do desvio padrão sob distribuição normal
+MAD_SCALE = 1.4826
+
+
+def _numpy():
+    """numpy é opcional: importado só quando a detecção é usada"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class AnomalyDetector:
+    """
+    Linha de base por dispositivo e métrica com memória fixa
+
+    A cada ciclo, os KPIs de todos os dispositivos formam uma matriz (dispositivos ×
+    métricas) pontuada de uma vez contra a média e o desvio EWMA de cada dispositivo:
+    score = direção × (valor − média) / desvio. A atualização da EWMA usa o valor
+    limitado a ±threshold desvios, para que uma anomalia não contamine a própria
+    linha de base. A cada `refit_interval` ciclos (e ao fim do aquecimento), média e
+    desvio são reajustados de forma robusta pela mediana e pelo MAD da janela
+    recente de cada dispositivo (`window` amostras por métrica, em buffer circular).
+
+    Memória por dispositivo: `window` × 4 amostras mais 3 estatísticas por métrica;
+    as linhas de dispositivos removidos do GenieACS são reaproveitadas.
+    """
+
+    def __init__(self, alpha: float = None, threshold: float = None, window: int = None,
+                 min_samples: int = None, refit_interval: int = None, shared_cache: SharedCache = None):
+        self.alpha = alpha or float(os.getenv("ANOMALY_EWMA_ALPHA", "0.1"))
+        self.threshold = threshold or float(os.getenv("ANOMALY_Z_THRESHOLD", "4"))
+        self.window = window or int(os.getenv("ANOMALY_WINDOW", "64"))
+        self.min_samples = min_samples or int(os.getenv("ANOMALY_MIN_SAMPLES", "10"))
+        self.refit_interval = refit_interval or int(os.getenv("ANOMALY_REFIT_INTERVAL", "20"))
+        self.enabled = os.getenv("ANOMALY_DETECTION_ENABLED", "true").lower() == "true"
+        self.shared_cache = shared_cache
+
+        self.anomalies: List[Dict[str, Any]] = []
+        self.cycles = 0
+        self._np = None
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._fault_timestamps: Dict[str, str] = {}
+        self._capacity = 0
+
+    @property
+    def available(self) -> bool:
+        return self._np is not None
+
+    # Estado
+
+    def _allocate(self, capacity: int) -> None:
+        np = self._np
+        metrics = len(METRICS)
+        old = self._capacity
+        grow = {
+            "_mean": np.zeros((capacity, metrics)),
+            "_var": np.zeros((capacity, metrics)),
+            "_count": np.zeros((capacity, metrics), dtype=np.int64),
+            "_samples": np.full((capacity, metrics, self.window), np.nan),
+            "_cursor": np.zeros(capacity, dtype=np.int64),
+        }
+        for name, array in grow.items():
+            if old:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+        self._free.extend(range(capacity - 1, old - 1, -1))
+        self._capacity = capacity
+
+    def _reset_rows(self, rows) -> None:
+        self._mean[rows] = 0.0
+        self._var[rows] = 0.0
+        self._count[rows] = 0
+        self._samples[rows] = self._np.nan
+        self._cursor[rows] = 0
+
+    def _rows_for(self, device_ids: List[str]):
+        """Linhas dos dispositivos do ciclo; libera as de dispositivos que sumiram"""
+        gone = self._slots.keys() - set(device_ids)
+        if gone:
+            rows = [self._slots.pop(device_id) for device_id in gone]
+            self._reset_rows(rows)
+            self._free.extend(rows)
+
+        missing = len([d for d in device_ids if d not in self._slots])
+        if missing > len(self._free):
+            self._allocate(max(self._capacity * 2, self._capacity + missing, 64))
+        for device_id in device_ids:
+            if device_id not in self._slots:
+                self._slots[device_id] = self._free.pop()
+        return self._np.fromiter((self._slots[d] for d in device_ids), dtype=self._np.int64, count=len(device_ids))
+
+    # Features
+
+    def _features(self, cycle: Dict[str, Any]):
+        """Matriz dispositivos × métricas do ciclo (NaN quando a métrica não existe)"""
+        np = self._np
+        now = cycle["timestamp"].astimezone(timezone.utc)
+
+        # Faults novos ou repetidos (timestamp alterado) por dispositivo neste ciclo
+        new_faults: Dict[str, int] = defaultdict(int)
+        faults = cycle["faults"]
+        for fault_id, fault in faults.items():
+            timestamp = fault.get("timestamp")
+            if self._fault_timestamps.get(fault_id) != timestamp:
+                new_faults[fault.get("device")] += 1
+        self._fault_timestamps = {fault_id: fault.get("timestamp") for fault_id, fault in faults.items()}
+
+        devices = cycle["devices"]
+        device_ids = []
+        rows = []
+        for device_data in cycle["raw_devices"]:
+            cpe = devices.get(device_data.get("_id"))
+            if cpe is None:
+                continue
+            rx_power, _ = extract_optical_power(device_data)
+            inform_gap = None
+            last_inform = device_data.get("_lastInform")
+            if last_inform:
+                try:
+                    informed_at = datetime.fromisoformat(last_inform.replace("Z", "+00:00"))
+                    inform_gap = max(0.0, (now - informed_at).total_seconds())
+                except ValueError:
+                    pass
+            device_ids.append(cpe["id"])
+            rows.append((extract_wifi_rssi(device_data), rx_power, inform_gap, new_faults.get(cpe["id"], 0)))
+
+        values = np.array(rows, dtype=float).reshape(len(rows), len(METRICS))
+        return device_ids, values
+
+    # Pontuação
+
+    def score_batch(self, device_ids: List[str], values) -> List[Dict[str, Any]]:
+        """
+        Pontua o lote contra as linhas de base e atualiza os modelos
+
+        Args:
+            device_ids: Dispositivos do ciclo (um por linha de values)
+            values: Matriz dispositivos × métricas (NaN = sem leitura)
+
+        Returns:
+            Anomalias do ciclo
+        """
+        np = self._np
+        rows = self._rows_for(device_ids)
+        if not len(rows):
+            return []
+
+        directions = np.array([m[1] for m in METRICS], dtype=float)
+        floors = np.array([m[2] for m in METRICS], dtype=float)
+        present = ~np.isnan(values)
+        mean = self._mean[rows]
+        count = self._count[rows]
+        std = np.maximum(np.sqrt(self._var[rows]), floors)
+
+        # Pontua antes de atualizar: a leitura atual não entra na própria referência
+        with np.errstate(invalid="ignore"):
+            scores = np.where(present, directions * (values - mean) / std, np.nan)
+        warmed = count >= self.min_samples
+        flagged = present & warmed & (scores > self.threshold)
+
+        # EWMA com valor limitado (a primeira leitura inicializa a média)
+        clipped = np.clip(values, mean - self.threshold * std, mean + self.threshold * std)
+        update = np.where(warmed, clipped, values)
+        first = present & (count == 0)
+        delta = np.where(present, update - mean, 0.0)
+        new_mean = np.where(first, values, mean + self.alpha * delta)
+        new_var = np.where(present & ~first, (1 - self.alpha) * (self._var[rows] + self.alpha * delta ** 2), self._var[rows])
+        self._mean[rows] = new_mean
+        self._var[rows] = new_var
+        self._count[rows] = count + present
+
+        # Janela circular das leituras brutas (base do reajuste robusto)
+        cursor = self._cursor[rows]
+        self._samples[rows, :, cursor] = values
+        self._cursor[rows] = (cursor + 1) % self.window
+
+        # Reajuste robusto: dispositivos que acabaram de aquecer, ou todos periodicamente
+        if self.cycles % self.refit_interval == 0:
+            self.refit(rows)
+        else:
+            just_warmed = np.any(present & (count + present == self.min_samples), axis=1)
+            if just_warmed.any():
+                self.refit(rows[just_warmed])
+
+        detected_at = datetime.now(timezone.utc).isoformat()
+        anomalies = []
+        for row_index, metric_index in zip(*np.nonzero(flagged)):
+            metric, _, _, label, unit = METRICS[metric_index]
+            score = float(scores[row_index, metric_index])
+            value = float(values[row_index, metric_index])
+            baseline = float(mean[row_index, metric_index])
+            anomalies.append({
+                "device_id": device_ids[row_index],
+                "metric": metric,
+                "value": round(value, 2),
+                "baseline": round(baseline, 2),
+                "score": round(score, 2),
+                "severity": "critical" if score >= 2 * self.threshold else "warning",
+                "title": f"Anomalia em {label}",
+                "description": (
+                    f"{label[0].upper()}{label[1:]} em {value:.1f} {unit}, "
+                    f"linha de base {baseline:.1f} {unit} ({score:.1f} desvios)"
+                ),
+                # Limite de Chebyshev: P(|z| >= k) <= 1/k²
+                "confidence": round(100 * (1 - 1 / score ** 2), 1),
+                "detected_at": detected_at
+            })
+        return anomalies
+
+    def refit(self, rows) -> None:
+        """Reajusta média e desvio pela mediana e MAD da janela de cada dispositivo"""
+        np = self._np
+        window = self._samples[rows]
+        valid = np.sum(~np.isnan(window), axis=2) >= self.min_samples
+        if not valid.any():
+            return
+        with warnings.catch_warnings():
+            # Métricas sem nenhuma leitura na janela (ex: CPE sem óptica) geram NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            median = np.nanmedian(window, axis=2)
+            mad = np.nanmedian(np.abs(window - median[..., None]), axis=2)
+        self._mean[rows] = np.where(valid, median, self._mean[rows])
+        self._var[rows] = np.where(valid, (MAD_SCALE * mad) ** 2, self._var[rows])
+
+    # Ciclo
+
+    async def record_cycle(self, cycle: Dict[str, Any]) -> None:
+        """
+        Listener do sync de inventário (executado pelo líder): pontua o ciclo,
+        atualiza os alertas de anomalia e publica as anomalias para os demais workers
+        """
+        if not self.available:
+            return
+        self.cycles += 1
+        with observe_transform("anomaly_scoring"):
+            device_ids, values = self._features(cycle)
+            self.anomalies = self.score_batch(device_ids, values)
+        if self.anomalies:
+            logger.info(f"📈 {len(self.anomalies)} anomalias em {len(device_ids)} dispositivos")
+        await get_alert_store().apply_anomalies(self.anomalies)
+        if self.shared_cache is not None:
+            try:
+                await self.shared_cache.put_json(ANOMALIES_NAME, self.anomalies,
+                                                 ttl=get_inventory_sync().max_snapshot_age)
+            except Exception as e:
+                logger.error(f"Erro ao publicar anomalias: {e}")
+
+    async def load_anomalies(self, name: str = ANOMALIES_NAME) -> None:
+        """Carrega as anomalias publicadas pelo líder (startup e invalidação)"""
+        if self.shared_cache is None:
+            return
+        self.anomalies = await self.shared_cache.get_json(ANOMALIES_NAME) or []
+        await get_alert_store().apply_anomalies(self.anomalies)
+
+    async def start(self) -> bool:
+        """
+        Ativa a detecção se habilitada e o numpy estiver instalado
+
+        Returns:
+            True se a detecção está ativa
+        """
+        if not self.enabled:
+            return False
+        self._np = _numpy()
+        if self._np is None:
+            logger.info("ℹ️ Detecção de anomalias desligada: numpy não instalado (requirements-analytics.txt)")
+            return False
+        self._allocate(64)
+        if self.shared_cache is not None:
+            self.shared_cache.on_invalidate(ANOMALIES_NAME, self.load_anomalies)
+            try:
+                await self.load_anomalies()
+            except Exception as e:
+                logger.error(f"Erro ao carregar anomalias: {e}")
+        logger.info(f"📈 Detecção de anomalias ativa (limite {self.threshold} desvios, janela {self.window})")
+        return True
+
+
+# Singleton global para reutilização
+_anomaly_detector: Optional[AnomalyDetector] = None
+
+def get_anomaly_detector() -> AnomalyDetector:
+    """
+    Retorna uma instância singleton do detector de anomalias
+    """
+    global _anomaly_detector
+    if _anomaly_detector is None:
+        _anomaly_detector = AnomalyDetector(shared_cache=get_shared_cache())
+    return _anomaly_detector
@@ -0,0 +1,238 @@
+"""
+JWT Authentication
+Validação dos tokens JWT (Bearer) das requisições com python-jose. A chave é
+um segredo compartilhado (HS256) ou o JWKS do provedor de identidade, com as
+chaves construídas uma vez e mantidas em cache. Os claims verificados ficam num
+LRU indexado pelo próprio token até o `exp`, junto com o usuário montado a
+partir deles: as requisições seguintes do mesmo token (polling dos dashboards)
+custam uma consulta ao dicionário, sem verificar a assinatura de novo.
+
+Sem JWT_SECRET nem JWT_JWKS_URL a autenticação fica desativada e a API usa o
+usuário fixo de desenvolvimento.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class AuthenticationError(Exception):
+    """Token ausente, inválido, expirado ou assinado por chave desconhecida"""
+
+
+def _jose():
+    """python-jose é importado só quando a autenticação está configurada"""
+    from jose import jwk, jwt
+    return jwk, jwt
+
+
+def claim_value(claims: Dict[str, Any], path: str) -> Any:
+    """Valor de um claim, aceitando caminho com pontos (ex: "realm_access.roles")"""
+    value: Any = claims
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def role_from_claims(claims: Dict[str, Any], role_claim: str = "role", default: str = "operator") -> str:
+    """
+    Papel do usuário a partir do claim configurado
+
+    Returns:
+        O valor do claim; se for uma lista de papéis, "admin" quando presente,
+        senão o primeiro; `default` sem o claim
+    """
+    value = claim_value(claims, role_claim)
+    if isinstance(value, str) and value:
+        return value
+    if isinstance(value, (list, tuple)) and value:
+        return "admin" if "admin" in value else str(value[0])
+    return default
+
+
+class JWTAuthenticator:
+    """
+    Verificador de tokens JWT com cache de chaves, de claims e de usuários
+
+    - JWKS: buscado no primeiro uso e a cada `jwks_ttl`; um `kid` desconhecido
+      (rotação de chaves) força uma nova busca, no máximo uma a cada
+      `jwks_min_refresh` segundos para que tokens forjados não gerem tráfego
+    - Claims: LRU de até `cache_size` tokens, cada um válido até o próprio `exp`;
+      se uma chave sai do JWKS, o cache é limpo e os tokens são reverificados
+    - Usuário: montado uma vez por token e guardado junto com os claims
+    """
+
+    def __init__(self, secret: str = None, jwks_url: str = None, algorithms: List[str] = None,
+                 audience: str = None, issuer: str = None, cache_size: int = None,
+                 jwks_ttl: float = None, jwks_min_refresh: float = None, leeway: int = None):
+        self.secret = secret if secret is not None else os.getenv("JWT_SECRET", "")
+        self.jwks_url = jwks_url if jwks_url is not None else os.getenv("JWT_JWKS_URL", "")
+        default_algorithms = "RS256" if self.jwks_url and not self.secret else "HS256"
+        self.algorithms = algorithms or [
+            algorithm.strip() for algorithm in os.getenv("JWT_ALGORITHMS", default_algorithms).split(",")
+            if algorithm.strip()
+        ]
+        self.audience = audience if audience is not None else os.getenv("JWT_AUDIENCE") or None
+        self.issuer = issuer if issuer is not None else os.getenv("JWT_ISSUER") or None
+        self.cache_size = cache_size or int(os.getenv("JWT_CLAIMS_CACHE_SIZE", "10000"))
+        self.jwks_ttl = jwks_ttl or float(os.getenv("JWT_JWKS_TTL", "3600"))
+        self.jwks_min_refresh = jwks_min_refresh if jwks_min_refresh is not None else 30.0
+        self.leeway = leeway if leeway is not None else int(os.getenv("JWT_LEEWAY", "0"))
+        self.role_claim = os.getenv("JWT_ROLE_CLAIM", "role")
+
+        # token -> (exp, claims, usuário)
+        self._claims: "OrderedDict[str, Tuple[float, Dict[str, Any], Any]]" = OrderedDict()
+        self._keys: Dict[str, Any] = {}
+        self._keys_fetched_at = 0.0
+        self._jwks_lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.secret or self.jwks_url)
+
+    def _options(self) -> Dict[str, Any]:
+        return {
+            "require_exp": True,
+            "verify_aud": self.audience is not None,
+            "leeway": self.leeway
+        }
+
+    async def _fetch_jwks(self) -> None:
+        """Busca o JWKS e constrói as chaves (limpa os claims se uma chave saiu)"""
+        jwk, _ = _jose()
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            response = await client.get(self.jwks_url)
+            response.raise_for_status()
+        keys = {}
+        for data in response.json().get("keys", []):
+            if data.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[data.get("kid", "")] = jwk.construct(data, data.get("alg") or self.algorithms[0])
+            except Exception as e:
+                logger.warning(f"⚠️ Chave do JWKS ignorada ({data.get('kid')}): {e}")
+
+        if self._keys.keys() - keys.keys():
+            self._claims.clear()
+        self._keys = keys
+        self._keys_fetched_at = time.monotonic()
+        logger.info(f"🔑 JWKS carregado: {len(keys)} chave(s)")
+
+    async def _signing_key(self, kid: Optional[str]) -> Any:
+        """Chave de verificação do token (segredo ou chave do JWKS pelo `kid`)"""
+        if self.secret:
+            return self.secret
+
+        age = time.monotonic() - self._keys_fetched_at
+        missing = kid is not None and kid not in self._keys
+        if not self._keys or age > self.jwks_ttl or (missing and age > self.jwks_min_refresh):
+            async with self._jwks_lock:
+                # Outra requisição pode ter buscado enquanto esta aguardava
+                age = time.monotonic() - self._keys_fetched_at
+                missing = kid is not None and kid not in self._keys
+                if not self._keys or age > self.jwks_ttl or (missing and age > self.jwks_min_refresh):
+                    try:
+                        await self._fetch_jwks()
+                    except Exception as e:
+                        # Com o provedor fora, as chaves já conhecidas continuam valendo
+                        logger.error(f"Erro ao buscar o JWKS: {e}")
+                        if not self._keys:
+                            raise AuthenticationError("Chaves de verificação indisponíveis")
+
+        if kid is None:
+            if len(self._keys) == 1:
+                return next(iter(self._keys.values()))
+            raise AuthenticationError("Token sem kid")
+        key = self._keys.get(kid)
+        if key is None:
+            raise AuthenticationError("Token assinado por chave desconhecida")
+        return key
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verifica assinatura e claims do token
+
+        Returns:
+            Claims do token
+
+        Raises:
+            AuthenticationError: Token inválido ou expirado
+        """
+        return (await self._entry(token, None))[1]
+
+    async def authenticate(self, token: str, build_user: Callable[[Dict[str, Any]], Any]) -> Any:
+        """
+        Usuário do token, montado por `build_user(claims)` na primeira verificação
+        e reaproveitado enquanto o token estiver no cache
+
+        Raises:
+            AuthenticationError: Token inválido ou expirado
+        """
+        entry = await self._entry(token, build_user)
+        if entry[2] is None:
+            entry = self._store(token, entry[0], entry[1], build_user(entry[1]))
+        return entry[2]
+
+    async def _entry(self, token: str,
+                     build_user: Optional[Callable[[Dict[str, Any]], Any]]) -> Tuple[float, Dict[str, Any], Any]:
+        cached = self._claims.get(token)
+        if cached is not None:
+            if cached[0] > time.time():
+                self._claims.move_to_end(token)
+                record_cache("jwt_claims", True)
+                return cached
+            del self._claims[token]
+        record_cache("jwt_claims", False)
+
+        _, jwt = _jose()
+        try:
+            header = jwt.get_unverified_header(token)
+            if header.get("alg") not in self.algorithms:
+                raise AuthenticationError("Algoritmo do token não permitido")
+            key = await self._signing_key(header.get("kid"))
+            claims = jwt.decode(
+                token, key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                options=self._options()
+            )
+        except AuthenticationError:
+            raise
+        except Exception as e:
+            raise AuthenticationError(str(e) or "Token inválido") from e
+
+        user = build_user(claims) if build_user is not None else None
+        return self._store(token, float(claims["exp"]), claims, user)
+
+    def _store(self, token: str, exp: float, claims: Dict[str, Any], user: Any) -> Tuple[float, Dict[str, Any], Any]:
+        entry = (exp, claims, user)
+        self._claims[token] = entry
+        self._claims.move_to_end(token)
+        while len(self._claims) > self.cache_size:
+            self._claims.popitem(last=False)
+        return entry
+
+
+# Singleton global para reutilização
+_jwt_authenticator: Optional[JWTAuthenticator] = None
+
+def get_jwt_authenticator() -> JWTAuthenticator:
+    """
+    Retorna uma instância singleton do verificador de tokens JWT
+    """
+    global _jwt_authenticator
+    if _jwt_authenticator is None:
+        _jwt_authenticator = JWTAuthenticator()
+    return _jwt_authenticator
@@ -0,0 +1,479 @@
+"""
+Bulk WiFi
+Aplicação de um perfil WiFi em muitos dispositivos: planejamento do conjunto mínimo
+de parâmetros por dispositivo e execução com limites de concorrência global e por OLT
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.services.admission import PRIORITY_BULK, AdmissionRejected, admission_priority
+from app.services.event_stream import EventBroker, get_event_broker
+from app.services.genieacs_client import get_genieacs_client
+from app.services.genieacs_transformers import (
+    create_wifi_parameter_updates,
+    determine_device_status,
+    extract_manufacturer_model,
+    extract_wifi_config_from_device
+)
+from app.services.resilience import deadline_scope
+from app.services.shared_cache import SharedCache, get_shared_cache
+from app.services.wifi_jobs import WiFiJobQueue, get_wifi_job_queue
+
+logger = logging.getLogger(__name__)
+
+# Campos do perfil comparados com a configuração atual do dispositivo
+PROFILE_FIELDS = ["ssid", "security", "channel", "power", "hidden", "enabled"]
+
+# Parâmetros buscados no GenieACS para o planejamento
+PLANNING_PROJECTION = [
+    "_id",
+    "_deviceId",
+    "_lastInform",
+    "InternetGatewayDevice.LANDevice.1.WLANConfiguration"
+]
+
+# Intervalo mínimo entre eventos de progresso de uma operação
+PROGRESS_EVENT_INTERVAL = 2.0
+
+# Estados de uma operação em massa
+BULK_PLANNING = "planning"
+BULK_PLANNED = "planned"
+BULK_RUNNING = "running"
+BULK_COMPLETED = "completed"
+BULK_CANCELLED = "cancelled"
+BULK_FAILED = "failed"
+
+FINAL_STATUSES = {BULK_PLANNED, BULK_COMPLETED, BULK_CANCELLED, BULK_FAILED}
+
+
+def plan_device_updates(current: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Calcula os campos do perfil que diferem da configuração atual do dispositivo
+
+    Args:
+        current: Configuração extraída por extract_wifi_config_from_device
+        profile: Campos do perfil (sem valores None)
+
+    Returns:
+        Atualizações mínimas (vazio se o dispositivo já está conforme o perfil)
+    """
+    updates = {}
+    for field in PROFILE_FIELDS:
+        if field not in profile:
+            continue
+        wanted, actual = profile[field], current.get(field)
+        if field == "channel":
+            wanted, actual = str(wanted).lower(), str(actual).lower()
+        if wanted != actual:
+            updates[field] = profile[field]
+
+    # A senha só é comparável quando o CPE a expõe; sem leitura, é sempre reenviada
+    password = profile.get("password")
+    if password and profile.get("security") != "Open" and password != current.get("password"):
+        updates["password"] = password
+
+    return updates
+
+
+def matches_selector(device_data: Dict[str, Any], wifi_config: Dict[str, Any], selector: Dict[str, Any],
+                     olt_id: Optional[str]) -> bool:
+    """
+    Verifica se um dispositivo atende ao seletor do push em massa
+
+    Args:
+        device_data: Dados raw do dispositivo
+        wifi_config: Configuração WiFi atual do dispositivo
+        selector: device_ids (set), profile_id, manufacturer, model, olt_id, online_only
+        olt_id: OLT do dispositivo (None se desconhecida)
+    """
+    device_ids = selector.get("device_ids")
+    if device_ids and device_data.get("_id") not in device_ids:
+        return False
+
+    profile_id = selector.get("profile_id")
+    if profile_id:
+        ssid = wifi_config.get("ssid") or ""
+        if f"profile-{ssid.replace(' ', '-').lower()}" != profile_id:
+            return False
+
+    manufacturer, model = extract_manufacturer_model(device_data)
+    if selector.get("manufacturer") and selector["manufacturer"].lower() != manufacturer.lower():
+        return False
+    if selector.get("model") and selector["model"].lower() != model.lower():
+        return False
+
+    if selector.get("olt_id") and selector["olt_id"] != olt_id:
+        return False
+
+    if selector.get("online_only") and determine_device_status(device_data.get("_lastInform")) != "online":
+        return False
+
+    return True
+
+
+class DevicePlan:
+    """Parâmetros planejados para um dispositivo"""
+
+    def __init__(self, device_id: str, olt_id: Optional[str], updates: Dict[str, Any],
+                 parameter_values: List[List[Any]]):
+        self.device_id = device_id
+        self.olt_id = olt_id
+        self.updates = updates
+        self.parameter_values = parameter_values
+        self.status = "pending"
+        self.attempts = 0
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "device_id": self.device_id,
+            "olt_id": self.olt_id,
+            "status": self.status,
+            "updates": sorted(self.updates),
+            "parameters": len(self.parameter_values),
+            "attempts": self.attempts,
+            "error": self.error
+        }
+
+
+class BulkWiFiOperation:
+    """Push de um perfil WiFi para um conjunto de dispositivos"""
+
+    def __init__(self, profile: Dict[str, Any], band: str, selector: Dict[str, Any], dry_run: bool = False):
+        self.id = uuid.uuid4().hex
+        self.profile = profile
+        self.band = band
+        self.selector = selector
+        self.dry_run = dry_run
+        self.status = BULK_PLANNING
+        self.plans: List[DevicePlan] = []
+        self.matched = 0
+        self.skipped = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.cancel_requested = False
+        self._task: Optional[asyncio.Task] = None
+
+    def counts(self) -> Dict[str, int]:
+        counts = {"pending": 0, "running": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+        for plan in self.plans:
+            counts[plan.status] += 1
+        return counts
+
+    def to_dict(self, include_devices: bool = False) -> Dict[str, Any]:
+        counts = self.counts()
+        done = counts["succeeded"] + counts["failed"]
+        total = len(self.plans)
+
+        rate = None
+        eta_seconds = None
+        if self.started_at and done:
+            elapsed = ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+            if elapsed > 0:
+                rate = done / elapsed
+                eta_seconds = round((counts["pending"] + counts["running"]) / rate, 1)
+
+        result = {
+            "id": self.id,
+            "status": self.status,
+            "band": self.band,
+            "profile": {k: v for k, v in self.profile.items() if k != "password"},
+            "selector": self.selector,
+            "dry_run": self.dry_run,
+            "matched_devices": self.matched,
+            "already_compliant": self.skipped,
+            "total": total,
+            **counts,
+            "progress": round(done / total, 4) if total else 1.0,
+            "devices_per_hour": round(rate * 3600) if rate else None,
+            "eta_seconds": eta_seconds,
+            "error": self.error,
+            "failures": [p.to_dict() for p in self.plans if p.status == "failed"][:100],
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+        if include_devices:
+            result["devices"] = [p.to_dict() for p in self.plans]
+        return result
+
+
+class BulkWiFiScheduler:
+    """
+    Executa operações em massa respeitando um limite global de escritas simultâneas
+    (compartilhado por todas as operações) e um limite por OLT
+
+    As escritas passam pelo lock por dispositivo da fila de jobs WiFi, então nunca
+    concorrem com alterações individuais do mesmo dispositivo.
+    """
+
+    def __init__(self, concurrency: int = None, olt_concurrency: int = None, max_retries: int = None,
+                 retention: int = None, job_queue: WiFiJobQueue = None, shared_cache: SharedCache = None,
+                 event_broker: EventBroker = None):
+        self.concurrency = concurrency or int(os.getenv("BULK_WIFI_CONCURRENCY", "20"))
+        self.olt_concurrency = olt_concurrency or int(os.getenv("BULK_WIFI_OLT_CONCURRENCY", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("BULK_WIFI_MAX_RETRIES", "2"))
+        self.retention = retention or int(os.getenv("BULK_WIFI_RETENTION", "86400"))
+        self.job_queue = job_queue
+        self.shared_cache = shared_cache
+        self.event_broker = event_broker
+
+        # Resolve a OLT de um dispositivo; sem ela, só o limite global se aplica
+        self.olt_resolver: Optional[Callable[[str], Optional[str]]] = None
+
+        self._global = asyncio.Semaphore(self.concurrency)
+        self._olt_in_flight: Dict[str, int] = {}
+        self._operations: "OrderedDict[str, BulkWiFiOperation]" = OrderedDict()
+
+    def submit(self, profile: Dict[str, Any], band: str, selector: Dict[str, Any],
+               dry_run: bool = False) -> BulkWiFiOperation:
+        """
+        Cria e inicia uma operação em massa (planejamento e execução em background)
+
+        Args:
+            profile: Campos do perfil WiFi (sem valores None)
+            band: Banda WiFi ("2.4GHz" ou "5GHz")
+            selector: Seletor de dispositivos
+            dry_run: Apenas planeja, sem aplicar
+
+        Returns:
+            Operação criada
+        """
+        operation = BulkWiFiOperation(profile, band, selector, dry_run)
+        self._operations[operation.id] = operation
+        self._prune()
+        operation._task = asyncio.create_task(self._run(operation))
+        logger.info(f"📦 Push WiFi em massa {operation.id} criado (dry_run={dry_run})")
+        return operation
+
+    async def get(self, operation_id: str, include_devices: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Progresso de uma operação (local ou executada por outro worker)
+        """
+        operation = self._operations.get(operation_id)
+        if operation is not None:
+            return operation.to_dict(include_devices)
+        if self.shared_cache is not None:
+            return await self.shared_cache.get_json(f"wifi-bulk:{operation_id}")
+        return None
+
+    def cancel(self, operation_id: str) -> Optional[BulkWiFiOperation]:
+        """
+        Interrompe o despacho de novos dispositivos (os que estão em andamento terminam)
+
+        Returns:
+            Operação ou None se não estiver neste worker
+        """
+        operation = self._operations.get(operation_id)
+        if operation is not None and operation.status not in FINAL_STATUSES:
+            operation.cancel_requested = True
+        return operation
+
+    def _prune(self) -> None:
+        now = datetime.now()
+        for operation_id, operation in list(self._operations.items()):
+            if operation.status in FINAL_STATUSES and operation.finished_at and \
+                    (now - operation.finished_at).total_seconds() > self.retention:
+                del self._operations[operation_id]
+
+    async def _store(self, operation: BulkWiFiOperation) -> None:
+        if self.shared_cache is None:
+            return
+        try:
+            await self.shared_cache.put_json(f"wifi-bulk:{operation.id}", operation.to_dict(), ttl=self.retention)
+        except Exception as e:
+            logger.error(f"Erro ao gravar progresso do push em massa {operation.id}: {e}")
+
+    async def _emit(self, event_type: str, operation: BulkWiFiOperation) -> None:
+        await self._store(operation)
+        if self.event_broker is None:
+            return
+        try:
+            data = operation.to_dict()
+            data.pop("failures", None)
+            await self.event_broker.emit(event_type, data)
+        except Exception as e:
+            logger.error(f"Erro ao publicar evento do push em massa {operation.id}: {e}")
+
+    async def _plan(self, operation: BulkWiFiOperation) -> None:
+        client = await get_genieacs_client()
+        selector = dict(operation.selector)
+        query = None
+        if selector.get("device_ids"):
+            selector["device_ids"] = set(selector["device_ids"])
+            query = {"_id": {"$in": list(selector["device_ids"])}}
+        raw_devices = await client.get_devices(query=query, projection=PLANNING_PROJECTION, raise_errors=True)
+
+        for device_data in raw_devices:
+            device_id = device_data.get("_id")
+            wifi_config = extract_wifi_config_from_device(device_data, operation.band)
+            if not device_id or not wifi_config:
+                continue
+            olt_id = self.olt_resolver(device_id) if self.olt_resolver else None
+            if not matches_selector(device_data, wifi_config, selector, olt_id):
+                continue
+
+            operation.matched += 1
+            updates = plan_device_updates(wifi_config, operation.profile)
+            tasks = create_wifi_parameter_updates(device_id, updates, operation.band) if updates else []
+            parameter_values = [
+                list(pair)
+                for task in tasks if task["name"] == "setParameterValues"
+                for pair in task["parameterValues"]
+            ]
+            if not parameter_values:
+                operation.skipped += 1
+                continue
+            operation.plans.append(DevicePlan(device_id, olt_id, updates, parameter_values))
+
+    async def _apply(self, operation: BulkWiFiOperation, plan: DevicePlan) -> None:
+        plan.status = "running"
+        try:
+            client = await get_genieacs_client()
+            for attempt in range(self.max_retries + 1):
+                plan.attempts = attempt + 1
+                try:
+                    # Connection requests de bulk cedem a vez aos interativos na admissão
+                    with admission_priority(PRIORITY_BULK):
+                        if self.job_queue is not None:
+                            async with self.job_queue.device_lock(plan.device_id):
+                                success = await client.set_parameters(plan.device_id, plan.parameter_values)
+                        else:
+                            success = await client.set_parameters(plan.device_id, plan.parameter_values)
+                    plan.error = None if success else "Falha ao aplicar configurações"
+                except AdmissionRejected as e:
+                    success = False
+                    plan.error = e.detail
+                if success:
+                    plan.status = "succeeded"
+                    return
+                if attempt < self.max_retries:
+                    # Backoff exponencial com jitter para não sincronizar as retentativas
+                    await asyncio.sleep(min(30.0, 2 ** attempt) * random.uniform(0.5, 1.5))
+            plan.status = "failed"
+        except Exception as e:
+            plan.status = "failed"
+            plan.error = str(e)
+        finally:
+            self._global.release()
+            if plan.olt_id is not None:
+                self._olt_in_flight[plan.olt_id] -= 1
+                if self._olt_in_flight[plan.olt_id] <= 0:
+                    del self._olt_in_flight[plan.olt_id]
+
+    async def _execute(self, operation: BulkWiFiOperation) -> None:
+        # Uma fila por OLT, despachadas em round-robin para espalhar a carga
+        queues: Dict[Optional[str], Deque[DevicePlan]] = {}
+        for plan in operation.plans:
+            queues.setdefault(plan.olt_id, deque()).append(plan)
+
+        running = set()
+        last_progress = time.monotonic()
+        try:
+            await self._dispatch(operation, queues, running, last_progress)
+        except asyncio.CancelledError:
+            for task in running:
+                task.cancel()
+            raise
+
+        for plan in operation.plans:
+            if plan.status == "pending":
+                plan.status = "cancelled"
+
+    async def _dispatch(self, operation: BulkWiFiOperation, queues: Dict[Optional[str], Deque[DevicePlan]],
+                        running: set, last_progress: float) -> None:
+        while (queues or running) and not operation.cancel_requested:
+            for olt_id in list(queues):
+                if self._global.locked():
+                    break
+                if olt_id is not None and self._olt_in_flight.get(olt_id, 0) >= self.olt_concurrency:
+                    continue
+                await self._global.acquire()
+                plan = queues[olt_id].popleft()
+                if not queues[olt_id]:
+                    del queues[olt_id]
+                if olt_id is not None:
+                    self._olt_in_flight[olt_id] = self._olt_in_flight.get(olt_id, 0) + 1
+                running.add(asyncio.create_task(self._apply(operation, plan)))
+
+            if running:
+                done, _ = await asyncio.wait(running, timeout=1.0, return_when=asyncio.FIRST_COMPLETED)
+                running.difference_update(done)
+            else:
+                # Todos os slots ocupados por outras operações
+                await asyncio.sleep(0.2)
+
+            if time.monotonic() - last_progress >= PROGRESS_EVENT_INTERVAL:
+                last_progress = time.monotonic()
+                await self._emit("wifi_bulk.progress", operation)
+
+        if running:
+            await asyncio.wait(running)
+
+    async def _run(self, operation: BulkWiFiOperation) -> None:
+        # A task herda o contexto da requisição que a criou: o deadline dela não se aplica aqui
+        with deadline_scope(None):
+            await self._run_operation(operation)
+
+    async def _run_operation(self, operation: BulkWiFiOperation) -> None:
+        try:
+            await self._plan(operation)
+            logger.info(
+                f"📦 Push em massa {operation.id}: {operation.matched} dispositivos, "
+                f"{operation.skipped} já conformes, {len(operation.plans)} a alterar"
+            )
+            if operation.dry_run:
+                operation.status = BULK_PLANNED
+                return
+
+            operation.status = BULK_RUNNING
+            operation.started_at = datetime.now()
+            await self._emit("wifi_bulk.progress", operation)
+            await self._execute(operation)
+            operation.status = BULK_CANCELLED if operation.cancel_requested else BULK_COMPLETED
+        except asyncio.CancelledError:
+            operation.status = BULK_CANCELLED
+            raise
+        except Exception as e:
+            logger.error(f"Erro no push WiFi em massa {operation.id}: {e}")
+            operation.status = BULK_FAILED
+            operation.error = str(e)
+        finally:
+            operation.finished_at = datetime.now()
+            if not asyncio.current_task().cancelling():
+                await self._emit("wifi_bulk.completed", operation)
+            logger.info(f"🏁 Push em massa {operation.id}: {operation.status} {operation.counts()}")
+
+    async def stop(self) -> None:
+        """Cancela as operações em andamento (desligamento do servidor)"""
+        tasks = [op._task for op in self._operations.values() if op._task and not op._task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Singleton global para reutilização
+_bulk_wifi_scheduler: Optional[BulkWiFiScheduler] = None
+
+def get_bulk_wifi_scheduler() -> BulkWiFiScheduler:
+    """
+    Retorna uma instância singleton do agendador de push WiFi em massa
+    """
+    global _bulk_wifi_scheduler
+    if _bulk_wifi_scheduler is None:
+        _bulk_wifi_scheduler = BulkWiFiScheduler(
+            job_queue=get_wifi_job_queue(),
+            shared_cache=get_shared_cache(),
+            event_broker=get_event_broker()
+        )
+    return _bulk_wifi_scheduler
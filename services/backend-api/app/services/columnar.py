@@ -0,0 +1,226 @@
+"""
+Columnar Responses
+Tabelas colunares das listas grandes (inventário de CPEs e ONUs, histórico de KPIs)
+e negociação de conteúdo para formatos compactos: MessagePack (linhas como arrays,
+com os nomes das colunas uma única vez) ou Arrow IPC (record batch colunar).
+JSON continua sendo o padrão.
+
+msgpack e pyarrow são opcionais (requirements-formats.txt); sem eles o formato
+correspondente não é oferecido e a resposta sai em JSON.
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from fastapi import Request, Response
+
+from app.services.metrics import observe_transform
+
+logger = logging.getLogger(__name__)
+
+FORMAT_JSON = "json"
+FORMAT_MSGPACK = "msgpack"
+FORMAT_ARROW = "arrow"
+
+MEDIA_TYPES = {
+    FORMAT_MSGPACK: "application/msgpack",
+    FORMAT_ARROW: "application/vnd.apache.arrow.stream",
+}
+
+ACCEPTED_MEDIA_TYPES = {
+    "application/msgpack": FORMAT_MSGPACK,
+    "application/x-msgpack": FORMAT_MSGPACK,
+    "application/vnd.msgpack": FORMAT_MSGPACK,
+    "application/vnd.apache.arrow.stream": FORMAT_ARROW,
+    "application/json": FORMAT_JSON,
+    "application/*": FORMAT_JSON,
+    "*/*": FORMAT_JSON,
+}
+
+
+def _msgpack():
+    """msgpack é opcional: importado só quando o formato é pedido"""
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+
+def _pyarrow():
+    """pyarrow é opcional: importado só quando o formato é pedido"""
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def format_available(fmt: str) -> bool:
+    if fmt == FORMAT_MSGPACK:
+        return _msgpack() is not None
+    if fmt == FORMAT_ARROW:
+        return _pyarrow() is not None
+    return fmt == FORMAT_JSON
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """
+    Escolhe o formato da resposta pelo header Accept
+
+    Args:
+        accept: Valor do header (ex: "application/vnd.apache.arrow.stream, application/json;q=0.5")
+
+    Returns:
+        "msgpack", "arrow" ou "json" (padrão, inclusive quando o formato pedido
+        não está instalado)
+    """
+    if not accept:
+        return FORMAT_JSON
+    candidates = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            candidates.append((-quality, position, media_type.lower()))
+
+    for _, _, media_type in sorted(candidates):
+        fmt = ACCEPTED_MEDIA_TYPES.get(media_type)
+        if fmt is not None and format_available(fmt):
+            return fmt
+    return FORMAT_JSON
+
+
+def response_format(request: Request, response: Response) -> str:
+    """
+    Dependência das rotas com formatos compactos: formato negociado pelo Accept
+    (a resposta JSON também leva Vary: Accept para caches intermediários)
+    """
+    response.headers["Vary"] = "Accept"
+    return negotiate_format(request.headers.get("accept"))
+
+
+class ColumnarTable:
+    """
+    Colunas de mesmo tamanho na ordem de `fields`, com metadados da resposta
+
+    As codificações são feitas uma vez por tabela e reaproveitadas enquanto ela
+    estiver em cache (ver ColumnarInventory).
+    """
+
+    def __init__(self, fields: Sequence[str], columns: List[Sequence[Any]],
+                 metadata: Dict[str, Any] = None):
+        self.fields = list(fields)
+        self.columns = columns
+        self.metadata = metadata or {}
+        self._encoded: Dict[str, bytes] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], fields: Sequence[str],
+                     metadata: Dict[str, Any] = None) -> "ColumnarTable":
+        """Extrai as colunas de registros já existentes (snapshot, índice, consulta)"""
+        records = records if isinstance(records, (list, tuple)) else list(records)
+        return cls(fields, [[record.get(field) for record in records] for field in fields], metadata)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Any]], fields: Sequence[str],
+                  metadata: Dict[str, Any] = None) -> "ColumnarTable":
+        """Transpõe linhas posicionais (ex: pontos [ts, valor] dos gráficos)"""
+        columns = [list(column) for column in zip(*rows)] if rows else [[] for _ in fields]
+        return cls(fields, columns, metadata)
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def to_msgpack(self) -> bytes:
+        """{**metadados, "columns": [nomes], "rows": [[valores], ...]}"""
+        msgpack = _msgpack()
+        return msgpack.packb({
+            **self.metadata,
+            "columns": self.fields,
+            "rows": list(zip(*self.columns))
+        })
+
+    def to_arrow(self) -> bytes:
+        """Stream IPC com um record batch; metadados no schema (valores em JSON)"""
+        pa = _pyarrow()
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(column) for column in self.columns],
+            names=self.fields
+        ).replace_schema_metadata({
+            key: json.dumps(value, default=str) for key, value in self.metadata.items()
+        })
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+    def encode(self, fmt: str) -> bytes:
+        encoded = self._encoded.get(fmt)
+        if encoded is None:
+            with observe_transform(f"encode_{fmt}"):
+                encoded = self.to_msgpack() if fmt == FORMAT_MSGPACK else self.to_arrow()
+            self._encoded[fmt] = encoded
+        return encoded
+
+
+def columnar_response(table: ColumnarTable, fmt: str) -> Response:
+    """Resposta binária com a tabela no formato negociado"""
+    return Response(
+        content=table.encode(fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Vary": "Accept"}
+    )
+
+
+class ColumnarInventory:
+    """
+    Tabelas colunares do inventário reaproveitadas enquanto a fonte não muda
+
+    Cada tabela é identificada por um nome e por uma chave da versão da fonte
+    (ex: snapshot do sync ou versão do índice de ONUs): a extração das colunas e
+    as codificações acontecem uma vez por versão, não a cada requisição.
+    """
+
+    def __init__(self):
+        self._tables: Dict[str, tuple] = {}
+
+    def table(self, name: str, version: Any, build: Callable[[], ColumnarTable]) -> ColumnarTable:
+        """
+        Args:
+            name: Nome da tabela (ex: "cpes")
+            version: Chave pequena e comparável da versão da fonte
+            build: Monta a tabela quando a versão mudou
+
+        Returns:
+            Tabela da versão atual
+        """
+        cached = self._tables.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with observe_transform(f"columnar_{name}"):
+            table = build()
+        self._tables[name] = (version, table)
+        return table
+
+
+# Singleton global para reutilização
+_columnar_inventory: Optional[ColumnarInventory] = None
+
+def get_columnar_inventory() -> ColumnarInventory:
+    """
+    Retorna uma instância singleton das tabelas colunares do inventário
+    """
+    global _columnar_inventory
+    if _columnar_inventory is None:
+        _columnar_inventory = ColumnarInventory()
+    return _columnar_inventory
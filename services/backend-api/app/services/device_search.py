@@ -0,0 +1,409 @@
+"""
+Device Search
+Índice em memória para busca de dispositivos (typeahead) por serial, ID do
+GenieACS, SSID, IP, nome do cliente e modelo, atualizado incrementalmente a
+cada ciclo do sync de inventário
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from app.services.genieacs_client import get_genieacs_client
+from app.services.genieacs_transformers import transform_genieacs_to_cpe
+from app.services.inventory_sync import SNAPSHOT_NAME, get_inventory_sync
+from app.services.metrics import observe_transform
+from app.services.shared_cache import SharedCache
+from app.services.tracing import mark_degraded
+
+logger = logging.getLogger(__name__)
+
+# Campos pesquisáveis, na ordem de prioridade do campo que casou
+SEARCH_FIELDS = ("serial_number", "id", "ip_address", "wifi_ssid", "customer_name", "model")
+
+# Campos de texto livre: também indexados por palavra ("silva" acha "João Silva")
+WORD_FIELDS = {"wifi_ssid", "customer_name", "model"}
+
+# Campos de poucos valores distintos: só termos (um trigrama deles casaria com boa
+# parte da frota e não ajuda a filtrar)
+NO_GRAM_FIELDS = {"model"}
+
+# Campos devolvidos em cada resultado
+RESULT_FIELDS = ("id", "serial_number", "model", "status", "ip_address", "wifi_ssid", "customer_name")
+
+NGRAM = 3
+
+# Acima disso, a lista ordenada de termos é refeita de uma vez em vez de inserção a inserção
+TOKEN_REBUILD_THRESHOLD = 1000
+
+WORD_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(value: Any) -> str:
+    """Minúsculas e sem acentos ("João" → "joao")"""
+    text = str(value).strip().lower()
+    if text.isascii():
+        return text
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+class DeviceSearchIndex:
+    """
+    Busca por prefixo e por substring com custo proporcional ao resultado
+
+    - Termos (valores completos dos campos e palavras dos campos de texto livre)
+      ficam numa lista ordenada: a busca por prefixo é uma busca binária seguida
+      da leitura dos termos em sequência até completar o limite.
+    - Trigramas dos valores apontam para listas compactas (array de inteiros) de
+      documentos; a busca por substring percorre só a menor lista entre os
+      trigramas da consulta, conferindo cada candidato no texto do documento.
+
+    Ordem dos resultados: termo exato, prefixo de termo, substring. Um dispositivo
+    alterado só mexe nos termos e trigramas que mudaram; entradas de trigramas que
+    deixaram de valer são descartadas na conferência e removidas numa compactação
+    quando passam da metade do índice.
+    """
+
+    def __init__(self, refresh_interval: float = None):
+        self.refresh_interval = refresh_interval or float(os.getenv("SEARCH_REFRESH_INTERVAL", "30"))
+
+        # Documentos: id interno → dispositivo, valores normalizados, texto e CPE
+        self._doc_of: Dict[str, int] = {}
+        self._device_ids: List[Optional[str]] = []
+        self._raw: List[Optional[Tuple[Any, ...]]] = []
+        self._values: List[Optional[Tuple[str, ...]]] = []
+        self._texts: List[str] = []
+        self._records: List[Optional[Dict[str, Any]]] = []
+        self._free: List[int] = []
+
+        # Termo → documento (int) ou documentos (set), e termos em ordem
+        self._token_docs: Dict[str, Union[int, Set[int]]] = {}
+        self._tokens: List[str] = []
+        self._grams: Dict[str, array] = {}
+        self._postings = 0
+        self._stale_postings = 0
+
+        self.version = 0
+        self._last_devices: Optional[Dict[str, Any]] = None
+        self._last_refresh: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_of)
+
+    # Estrutura
+
+    @staticmethod
+    def _doc_tokens(values: Optional[Tuple[str, ...]]) -> Set[str]:
+        tokens = set()
+        for field, value in zip(SEARCH_FIELDS, values or ()):
+            if value:
+                tokens.add(value)
+                if field in WORD_FIELDS:
+                    tokens.update(word for word in WORD_SPLIT.split(value) if word)
+        return tokens
+
+    @staticmethod
+    def _doc_grams(values: Optional[Tuple[str, ...]]) -> Set[str]:
+        return {
+            value[i:i + NGRAM]
+            for field, value in zip(SEARCH_FIELDS, values or ())
+            if value and field not in NO_GRAM_FIELDS
+            for i in range(len(value) - NGRAM + 1)
+        }
+
+    def _add_token(self, token: str, doc: int) -> bool:
+        entry = self._token_docs.get(token)
+        if entry is None:
+            self._token_docs[token] = doc
+            return True
+        if isinstance(entry, int):
+            self._token_docs[token] = {entry, doc}
+        else:
+            entry.add(doc)
+        return False
+
+    def _remove_token(self, token: str, doc: int) -> bool:
+        entry = self._token_docs.get(token)
+        if isinstance(entry, int):
+            if entry == doc:
+                del self._token_docs[token]
+                return True
+        elif entry is not None:
+            entry.discard(doc)
+            if len(entry) == 1:
+                self._token_docs[token] = next(iter(entry))
+        return False
+
+    def _docs_of(self, token: str) -> Iterable[int]:
+        entry = self._token_docs.get(token)
+        if entry is None:
+            return ()
+        return (entry,) if isinstance(entry, int) else entry
+
+    def _index(self, doc: int, old: Optional[Tuple[str, ...]], new: Optional[Tuple[str, ...]],
+               added: Set[str], removed: Set[str]) -> None:
+        old_tokens, new_tokens = self._doc_tokens(old), self._doc_tokens(new)
+        for token in old_tokens - new_tokens:
+            if self._remove_token(token, doc):
+                removed.add(token)
+        for token in new_tokens - old_tokens:
+            if self._add_token(token, doc):
+                added.add(token)
+
+        old_grams = self._doc_grams(old)
+        new_grams = self._doc_grams(new) - old_grams
+        grams = self._grams
+        for gram in new_grams:
+            postings = grams.get(gram)
+            if postings is None:
+                postings = grams[gram] = array("I")
+            postings.append(doc)
+        self._postings += len(new_grams)
+        if old_grams:
+            self._stale_postings += len(old_grams - self._doc_grams(new))
+
+    def _upsert(self, device_id: str, cpe: Dict[str, Any], added: Set[str], removed: Set[str]) -> bool:
+        raw = tuple(cpe.get(field) for field in SEARCH_FIELDS)
+        doc = self._doc_of.get(device_id)
+        if doc is not None:
+            # Status e demais campos exibidos vêm sempre do CPE atual
+            self._records[doc] = cpe
+            if self._raw[doc] == raw:
+                return False
+            old = self._values[doc]
+        else:
+            old = None
+            if self._free:
+                doc = self._free.pop()
+            else:
+                doc = len(self._device_ids)
+                self._device_ids.append(None)
+                self._raw.append(None)
+                self._values.append(None)
+                self._texts.append("")
+                self._records.append(None)
+            self._doc_of[device_id] = doc
+            self._device_ids[doc] = device_id
+            self._records[doc] = cpe
+
+        values = tuple(normalize(value) if value else "" for value in raw)
+        self._index(doc, old, values, added, removed)
+        self._raw[doc] = raw
+        self._values[doc] = values
+        # Separador fora do alfabeto das consultas: uma substring não atravessa campos
+        self._texts[doc] = "\x1f".join(values)
+        return True
+
+    def _remove(self, device_id: str, added: Set[str], removed: Set[str]) -> None:
+        doc = self._doc_of.pop(device_id)
+        self._index(doc, self._values[doc], None, added, removed)
+        self._device_ids[doc] = None
+        self._raw[doc] = None
+        self._values[doc] = None
+        self._texts[doc] = ""
+        self._records[doc] = None
+        self._free.append(doc)
+
+    def _sync_tokens(self, added: Set[str], removed: Set[str]) -> None:
+        if len(added) + len(removed) > TOKEN_REBUILD_THRESHOLD:
+            self._tokens = sorted(self._token_docs)
+            return
+        for token in removed - added:
+            i = bisect_left(self._tokens, token)
+            if i < len(self._tokens) and self._tokens[i] == token:
+                del self._tokens[i]
+        for token in added - removed:
+            insort(self._tokens, token)
+
+    def _compact(self) -> None:
+        grams: Dict[str, array] = {}
+        postings = 0
+        for doc, values in enumerate(self._values):
+            for gram in self._doc_grams(values):
+                entry = grams.get(gram)
+                if entry is None:
+                    entry = grams[gram] = array("I")
+                entry.append(doc)
+                postings += 1
+        self._grams = grams
+        self._postings = postings
+        self._stale_postings = 0
+
+    def apply(self, devices: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Sincroniza o índice com o inventário atual
+
+        Args:
+            devices: CPEs indexados por id (snapshot do sync)
+
+        Returns:
+            Quantidade de dispositivos adicionados, com campos pesquisáveis
+            alterados ou removidos
+        """
+        changed = 0
+        added: Set[str] = set()
+        removed: Set[str] = set()
+        with observe_transform("search_index"):
+            for device_id, cpe in devices.items():
+                changed += self._upsert(device_id, cpe, added, removed)
+            for device_id in self._doc_of.keys() - devices.keys():
+                self._remove(device_id, added, removed)
+                changed += 1
+            self._sync_tokens(added, removed)
+            if self._stale_postings > max(self._postings // 2, 10000):
+                self._compact()
+        if changed:
+            self.version += 1
+        return changed
+
+    # Consulta
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Busca dispositivos
+
+        Args:
+            query: Texto da busca; com várias palavras, a mais longa guia a busca no
+                índice e todas precisam aparecer no dispositivo
+            limit: Máximo de resultados
+
+        Returns:
+            Dispositivos encontrados com o campo que casou ("match")
+        """
+        terms = sorted({normalize(term) for term in query.split()} - {""}, key=len, reverse=True)
+        if not terms or limit <= 0:
+            return []
+        anchor = terms[0]
+        found: List[int] = []
+        seen: Set[int] = set()
+
+        def accept(doc: int) -> bool:
+            # True quando o limite foi atingido
+            if doc in seen or self._device_ids[doc] is None:
+                return False
+            text = self._texts[doc]
+            if all(term in text for term in terms):
+                seen.add(doc)
+                found.append(doc)
+            return len(found) >= limit
+
+        def collect() -> None:
+            # 1. Termo exato
+            for doc in self._docs_of(anchor):
+                if accept(doc):
+                    return
+            # 2. Prefixo de termo
+            i = bisect_left(self._tokens, anchor)
+            while i < len(self._tokens) and self._tokens[i].startswith(anchor):
+                if self._tokens[i] != anchor:
+                    for doc in self._docs_of(self._tokens[i]):
+                        if accept(doc):
+                            return
+                i += 1
+            # 3. Substring, pelos trigramas
+            if len(anchor) >= NGRAM:
+                postings = []
+                for j in range(len(anchor) - NGRAM + 1):
+                    entry = self._grams.get(anchor[j:j + NGRAM])
+                    if entry is None:
+                        return
+                    postings.append(entry)
+                for doc in min(postings, key=len):
+                    if accept(doc):
+                        return
+
+        collect()
+        return [self._result(doc, anchor) for doc in found]
+
+    def _result(self, doc: int, anchor: str) -> Dict[str, Any]:
+        record = self._records[doc]
+        match = next(
+            (field for field, value in zip(SEARCH_FIELDS, self._values[doc]) if anchor in value),
+            None
+        )
+        return {**{field: record.get(field) for field in RESULT_FIELDS}, "match": match}
+
+    # Fontes
+
+    async def _poll(self) -> None:
+        client = await get_genieacs_client()
+        raw_devices = await client.get_devices(raise_errors=True)
+        devices = {}
+        with observe_transform("cpe_batch"):
+            for device_data in raw_devices:
+                cpe_data = transform_genieacs_to_cpe(device_data)
+                if cpe_data:
+                    devices[cpe_data["id"]] = cpe_data
+        self.apply(devices)
+
+    async def refresh(self) -> None:
+        """
+        Garante um índice atualizado antes de uma busca
+
+        Com o sync ativo o índice segue o snapshot (de graça quando ele não mudou);
+        sem ele, o GenieACS é consultado no máximo a cada `refresh_interval` segundos.
+
+        Raises:
+            Exception: Falha ao consultar o GenieACS sem nenhum dado carregado
+        """
+        snapshot = get_inventory_sync().get_snapshot(allow_stale=True)
+        if snapshot is not None:
+            devices = snapshot["devices"]
+            if devices is not self._last_devices:
+                changed = self.apply(devices)
+                self._last_devices = devices
+                self._last_refresh = time.monotonic()
+                if changed:
+                    logger.info(f"🔎 Índice de busca: {changed} dispositivos atualizados, {len(self)} no total")
+            return
+
+        async with self._refresh_lock:
+            if self._last_refresh is not None and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return
+            try:
+                await self._poll()
+                self._last_refresh = time.monotonic()
+            except Exception as e:
+                if self._last_refresh is None:
+                    raise
+                logger.warning(f"⚠️ Falha ao atualizar índice de busca, usando o já carregado: {e}")
+                mark_degraded("genieacs_unavailable", time.monotonic() - self._last_refresh)
+
+    async def record_cycle(self, cycle: Dict[str, Any]) -> None:
+        """Listener do sync de inventário: índice pronto antes da próxima busca"""
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Erro ao atualizar índice de busca: {e}")
+
+    async def load_snapshot(self, name: str = SNAPSHOT_NAME) -> None:
+        """Handler de invalidação: segue o snapshot publicado pelo líder"""
+        await self.record_cycle({})
+
+    def start(self, shared_cache: SharedCache) -> None:
+        """
+        Atualiza o índice a cada snapshot do líder, para que a primeira busca após
+        um ciclo não pague a atualização (registrar depois do sync de inventário,
+        cujo handler carrega o snapshot)
+        """
+        shared_cache.on_invalidate(SNAPSHOT_NAME, self.load_snapshot)
+
+
+# Singleton global para reutilização
+_device_search: Optional[DeviceSearchIndex] = None
+
+def get_device_search() -> DeviceSearchIndex:
+    """
+    Retorna uma instância singleton do índice de busca de dispositivos
+    """
+    global _device_search
+    if _device_search is None:
+        _device_search = DeviceSearchIndex()
+    return _device_search
@@ -0,0 +1,112 @@
+"""
+Downsampling
+Redução de séries temporais para gráficos (LTTB e buckets min/avg/max)
+"""
+
+from typing import List, Sequence, Tuple
+
+Point = Tuple[float, float]
+
+
+def lttb(points: Sequence[Point], threshold: int) -> List[Point]:
+    """
+    Largest-Triangle-Three-Buckets: mantém o formato visual da série com N pontos
+
+    Args:
+        points: Pontos (timestamp, valor) ordenados por timestamp
+        threshold: Número de pontos desejado
+
+    Returns:
+        Série reduzida (inclui sempre o primeiro e o último ponto)
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Média do próximo bucket (terceiro vértice do triângulo)
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        count = next_end - next_start
+        avg_x = sum(p[0] for p in points[next_start:next_end]) / count
+        avg_y = sum(p[1] for p in points[next_start:next_end]) / count
+
+        # Ponto do bucket atual que forma o maior triângulo com o anterior e a média
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = points[a]
+        max_area = -1.0
+        chosen = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                chosen = j
+
+        sampled.append(points[chosen])
+        a = chosen
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax_buckets(points: Sequence[Point], buckets: int) -> List[Tuple[float, float, float, float]]:
+    """
+    Agrupa a série em N buckets consecutivos com mínimo, média e máximo
+
+    Args:
+        points: Pontos (timestamp, valor) ordenados por timestamp
+        buckets: Número de buckets desejado
+
+    Returns:
+        Lista de (timestamp inicial, min, avg, max)
+    """
+    n = len(points)
+    if n == 0:
+        return []
+    buckets = max(1, min(buckets, n))
+    size = n / buckets
+    result = []
+    for i in range(buckets):
+        chunk = points[int(i * size):int((i + 1) * size)]
+        if not chunk:
+            continue
+        values = [p[1] for p in chunk]
+        result.append((chunk[0][0], min(values), sum(values) / len(values), max(values)))
+    return result
+
+
+def merge_envelopes(envelopes: Sequence[Tuple[float, float, float, float]],
+                    buckets: int) -> List[Tuple[float, float, float, float]]:
+    """
+    Agrupa envelopes já agregados (timestamp, avg, min, max) em N buckets,
+    preservando o mínimo e o máximo reais de cada grupo
+
+    Args:
+        envelopes: Envelopes ordenados por timestamp
+        buckets: Número de buckets desejado
+
+    Returns:
+        Lista de (timestamp inicial, min, avg, max)
+    """
+    n = len(envelopes)
+    if n == 0:
+        return []
+    buckets = max(1, min(buckets, n))
+    size = n / buckets
+    result = []
+    for i in range(buckets):
+        chunk = envelopes[int(i * size):int((i + 1) * size)]
+        if not chunk:
+            continue
+        result.append((
+            chunk[0][0],
+            min(e[2] for e in chunk),
+            sum(e[1] for e in chunk) / len(chunk),
+            max(e[3] for e in chunk)
+        ))
+    return result
@@ -0,0 +1,279 @@
+"""
+Event Stream
+Canal de push (Server-Sent Events) com deltas de dispositivos e faults
+alimentado pelo sync de inventário
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Canal do cache compartilhado usado para replicar eventos entre workers
+EVENTS_CHANNEL = "events"
+
+# Canal usado pelos demais workers para enviar eventos ao líder, que atribui a versão
+FORWARD_CHANNEL = "events-forward"
+
+
+class StreamSubscriber:
+    """Cliente conectado ao stream, com fila limitada (backpressure)"""
+
+    def __init__(self, max_queue: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def offer(self, event: Dict[str, Any]) -> bool:
+        """
+        Enfileira um evento sem bloquear o publicador
+
+        Returns:
+            False se a fila do cliente estourou (cliente lento)
+        """
+        if self.overflowed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            # Cliente lento: em vez de segurar o publicador ou crescer sem limite,
+            # o stream é encerrado com "resync" e o cliente retoma pela versão
+            self.overflowed = True
+            return False
+
+
+class EventBroker:
+    """Distribui eventos versionados para os clientes conectados"""
+
+    def __init__(self, buffer_size: int = None, client_queue_size: int = None):
+        self.version = 0
+        self.client_queue_size = client_queue_size or int(os.getenv("STREAM_CLIENT_QUEUE_SIZE", "500"))
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=buffer_size or int(os.getenv("STREAM_BUFFER_SIZE", "5000")))
+        self._subscribers: Set[StreamSubscriber] = set()
+        self._shared_cache = None
+        self._is_leader: Callable[[], bool] = lambda: True
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> int:
+        """
+        Publica um evento para todos os clientes
+
+        Args:
+            event_type: Tipo do evento (ex: "device.status")
+            data: Payload compacto do evento
+
+        Returns:
+            Versão atribuída ao evento
+        """
+        self.version += 1
+        event = {
+            "version": self.version,
+            "type": event_type,
+            "data": data,
+            "timestamp": datetime.now().isoformat()
+        }
+        self._dispatch(event)
+        return self.version
+
+    def ingest(self, event: Dict[str, Any]) -> None:
+        """
+        Recebe um evento já versionado por outro worker
+
+        Args:
+            event: Evento com versão atribuída pelo worker líder
+        """
+        if event["version"] <= self.version:
+            return
+        self.version = event["version"]
+        self._dispatch(event)
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        self._buffer.append(event)
+        for subscriber in self._subscribers:
+            subscriber.offer(event)
+
+    def publish_changes(self, changes: List[Dict[str, Any]]) -> int:
+        """
+        Publica uma lista de mudanças no formato {"type": ..., "data": ...}
+
+        Returns:
+            Versão atual após a publicação
+        """
+        for change in changes:
+            self.publish(change["type"], change["data"])
+        return self.version
+
+    def attach_shared_cache(self, shared_cache, is_leader: Callable[[], bool] = None) -> None:
+        """
+        Replica os eventos entre workers, mantendo as mesmas versões em todos
+        (um cliente pode reconectar em outro worker e retomar pelo Last-Event-ID)
+
+        Args:
+            shared_cache: SharedCache (registrar antes de shared_cache.start())
+            is_leader: Indica se este worker é o líder (quem versiona os eventos)
+        """
+        self._shared_cache = shared_cache
+        if is_leader is not None:
+            self._is_leader = is_leader
+        shared_cache.on_message(EVENTS_CHANNEL, self._ingest_replicated)
+        shared_cache.on_message(FORWARD_CHANNEL, self._ingest_forwarded)
+
+    async def _ingest_replicated(self, events: List[Dict[str, Any]]) -> None:
+        for event in events:
+            self.ingest(event)
+
+    async def _ingest_forwarded(self, change: Dict[str, Any]) -> None:
+        if self._is_leader():
+            await self.emit(change["type"], change["data"])
+
+    async def emit(self, event_type: str, data: Dict[str, Any]) -> None:
+        """
+        Publica um evento originado fora do sync (ex: jobs) em todos os workers
+
+        O líder versiona e replica o evento; os demais workers o encaminham ao líder
+        para que as versões continuem idênticas em todos os workers.
+        """
+        if self._shared_cache is None:
+            self.publish(event_type, data)
+        elif self._is_leader():
+            version = self.publish(event_type, data)
+            await self._shared_cache.publish(EVENTS_CHANNEL, self.events_since(version - 1))
+        else:
+            await self._shared_cache.publish(FORWARD_CHANNEL, {"type": event_type, "data": data})
+
+    async def publish_cycle(self, cycle: Dict[str, Any]) -> None:
+        """
+        Listener do sync de inventário: publica as mudanças do ciclo e as replica
+
+        Args:
+            cycle: Dicionário do ciclo de sync
+        """
+        first = self.version
+        self.publish_changes(cycle["changes"])
+        if self._shared_cache is not None and self.version > first:
+            events = self.events_since(first) or list(self._buffer)
+            await self._shared_cache.publish(EVENTS_CHANNEL, events)
+
+    def events_since(self, version: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Retorna os eventos posteriores a uma versão
+
+        Args:
+            version: Última versão recebida pelo cliente
+
+        Returns:
+            Lista de eventos, ou None se a versão já saiu do buffer ou é posterior
+            à atual (ex: backend reiniciado com a versão zerada): resync necessário
+        """
+        if version > self.version:
+            return None
+        if version == self.version:
+            return []
+        if not self._buffer or version < self._buffer[0]["version"] - 1:
+            return None
+        return [event for event in self._buffer if event["version"] > version]
+
+    def subscribe(self) -> StreamSubscriber:
+        subscriber = StreamSubscriber(self.client_queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    async def sse_stream(self, since: Optional[int] = None, heartbeat: float = 15.0) -> AsyncIterator[str]:
+        """
+        Gera o stream SSE de um cliente
+
+        Args:
+            since: Versão a partir da qual retomar (None = apenas eventos novos)
+            heartbeat: Intervalo em segundos dos comentários de keep-alive
+
+        Yields:
+            Frames SSE formatados
+        """
+        subscriber = self.subscribe()
+        last_sent = self.version
+        try:
+            # Sem id: o Last-Event-ID do navegador só avança com eventos realmente entregues
+            yield format_sse({"version": last_sent}, event="hello")
+
+            if since is not None:
+                replay = self.events_since(since)
+                if replay is None:
+                    yield format_sse({"version": self.version, "reason": "version_expired"},
+                                     event="resync", event_id=self.version)
+                    return
+                # Eventos publicados durante o replay já estão na fila: descartar duplicados
+                last_sent = since
+                for event in replay:
+                    yield format_event(event)
+                    last_sent = event["version"]
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    if subscriber.overflowed:
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if event["version"] <= last_sent:
+                    continue
+                yield format_event(event)
+                last_sent = event["version"]
+
+                if subscriber.overflowed and subscriber.queue.empty():
+                    break
+
+            logger.warning("⚠️ Cliente de stream lento, encerrando com resync")
+            yield format_sse({"version": last_sent, "reason": "slow_consumer"}, event="resync", event_id=last_sent)
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def format_sse(data: Dict[str, Any], event: str = None, event_id: int = None) -> str:
+    """
+    Formata um frame Server-Sent Events
+
+    Args:
+        data: Payload serializado como JSON
+        event: Nome do evento
+        event_id: Id do evento (usado pelo navegador em Last-Event-ID)
+
+    Returns:
+        Frame SSE
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def format_event(event: Dict[str, Any]) -> str:
+    return format_sse(event["data"], event=event["type"], event_id=event["version"])
+
+
+# Singleton global para reutilização
+_event_broker: Optional[EventBroker] = None
+
+def get_event_broker() -> EventBroker:
+    """
+    Retorna uma instância singleton do broker de eventos
+    """
+    global _event_broker
+    if _event_broker is None:
+        _event_broker = EventBroker()
+    return _event_broker
@@ -3,41 +3,505 @@ GenieACS NBI API Client
 Cliente para integração com a API Northbound Interface do GenieACS
 """
 
+import asyncio
 import httpx
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+from urllib.parse import urlparse
 import json
 import os
+import time
+
+from app.services.admission import AdmissionRejected, ConnectionRequestAdmission
+from app.services.metrics import (
+    GENIEACS_SHARD_DEVICES,
+    instrument_genieacs,
+    on_genieacs_request,
+    on_genieacs_response,
+    record_genieacs_retry,
+    record_genieacs_shard,
+    record_genieacs_short_circuit
+)
+from app.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    backoff_delay,
+    deadline_remaining
+)
+from app.services.shared_cache import get_shared_cache
+from app.services.tracing import mark_degraded
 
 logger = logging.getLogger(__name__)
 
+# TTLs (segundos) dos documentos no cache compartilhado entre workers
+DEVICE_CACHE_TTL = float(os.getenv("DEVICE_CACHE_TTL", "30"))
+FAULTS_CACHE_TTL = float(os.getenv("FAULTS_CACHE_TTL", "15"))
+GENIEACS_TIMEOUT = float(os.getenv("GENIEACS_TIMEOUT", "30"))
+GENIEACS_READ_RETRIES = int(os.getenv("GENIEACS_READ_RETRIES", "2"))
+
+# Pool de conexões com a NBI
+GENIEACS_MAX_CONNECTIONS = int(os.getenv("GENIEACS_MAX_CONNECTIONS", "100"))
+GENIEACS_MAX_KEEPALIVE = int(os.getenv("GENIEACS_MAX_KEEPALIVE", "20"))
+GENIEACS_KEEPALIVE_EXPIRY = float(os.getenv("GENIEACS_KEEPALIVE_EXPIRY", "30"))
+GENIEACS_HTTP2 = os.getenv("GENIEACS_HTTP2", "false").lower() == "true"
+GENIEACS_WARM_CONNECTIONS = int(os.getenv("GENIEACS_WARM_CONNECTIONS", "4"))
+
+
+def http2_available() -> bool:
+    """HTTP/2 no httpx depende do pacote opcional h2 (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parse_shard_urls(value: str) -> List[Tuple[str, str]]:
+    """
+    Lê a lista de instâncias do GenieACS
+
+    Args:
+        value: URLs separadas por vírgula, opcionalmente nomeadas
+            ("http://acs1:7557,http://acs2:7557" ou "sp=http://acs1:7557,rj=http://acs2:7557")
+
+    Returns:
+        Lista de (nome, URL); sem nome explícito, o nome é o host da URL
+    """
+    shards: List[Tuple[str, str]] = []
+    names = set()
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, url = item.partition("=")
+        if not sep or "://" in name:
+            name, url = urlparse(item).hostname or f"acs{len(shards) + 1}", item
+        name = name.strip()
+        if name in names:
+            name = f"{name}-{len(shards) + 1}"
+        names.add(name)
+        shards.append((name, url.strip().rstrip("/")))
+    return shards
+
+
+def sort_documents(documents: List[Dict[str, Any]], sort: Dict[str, int]) -> List[Dict[str, Any]]:
+    """
+    Ordena documentos do GenieACS como o MongoDB faria com o mesmo sort
+    (usado para mesclar páginas vindas de instâncias diferentes)
+
+    Args:
+        documents: Documentos a ordenar
+        sort: {campo: 1 | -1}; campos com "." navegam no documento e parâmetros
+            TR-069 são comparados pelo _value
+    """
+    def value_of(document: Dict[str, Any], path: str) -> Any:
+        value: Any = document
+        for part in path.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        if isinstance(value, dict):
+            value = value.get("_value")
+        return value
+
+    result = list(documents)
+    # Ordenações estáveis da última chave para a primeira; nulos primeiro (como no MongoDB)
+    for path, direction in reversed(list(sort.items())):
+        def key(document: Dict[str, Any], path: str = path) -> tuple:
+            value = value_of(document, path)
+            if value is None:
+                return (0, "")
+            return (1, value) if isinstance(value, (int, float, str)) else (1, str(value))
+        result.sort(key=key, reverse=direction < 0)
+    return result
+
+
+class ShardNotFoundError(Exception):
+    """Dispositivo não encontrado em nenhuma instância do GenieACS"""
+
+
+class GenieACSShard:
+    """Uma instância do GenieACS no pool, com circuit breaker e saúde próprios"""
+
+    def __init__(self, name: str, base_url: str, breaker_name: str):
+        self.name = name
+        self.base_url = base_url
+        # Falha rápido enquanto esta instância estiver fora, sem afetar as demais
+        self.breaker = CircuitBreaker(breaker_name)
+        self.devices: Optional[int] = None
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+
+    def record_success(self) -> None:
+        self.last_success = time.time()
+        record_genieacs_shard(self.name, "success")
+
+    def record_error(self, error: Any, outcome: str = "error") -> None:
+        self.last_error = str(error) or type(error).__name__
+        self.last_error_at = time.time()
+        record_genieacs_shard(self.name, outcome)
+
+    def record_devices(self, count: int) -> None:
+        self.devices = count
+        GENIEACS_SHARD_DEVICES.labels(self.name).set(count)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "url": self.base_url,
+            "circuit": self.breaker.state,
+            "devices": self.devices,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at
+        }
+
+
 class GenieACSClient:
-    """Cliente para comunicação com GenieACS NBI API"""
+    """
+    Cliente para comunicação com GenieACS NBI API
+
+    Suporta várias instâncias do GenieACS (GENIACS_API_URLS): leituras de
+    dispositivos, faults e tasks são feitas em todas ao mesmo tempo e mescladas;
+    tasks e leituras de um dispositivo vão direto à instância dona, conhecida
+    pelo mapa dispositivo → instância aprendido nas leituras.
+    """
     
     def __init__(self, base_url: str = None):
-        self.base_url = (base_url or os.getenv("GENIACS_API_URL", "http://genieacs:7557")).rstrip('/')
+        if base_url:
+            urls = [(urlparse(base_url).hostname or "genieacs", base_url.rstrip('/'))]
+        else:
+            urls = parse_shard_urls(os.getenv("GENIACS_API_URLS", "")) or [
+                ("genieacs", os.getenv("GENIACS_API_URL", "http://genieacs:7557").rstrip('/'))
+            ]
+        # Com uma instância só, o breaker mantém o nome "genieacs" (métricas e alertas existentes)
+        self.shards = [
+            GenieACSShard(name, url, "genieacs" if len(urls) == 1 else f"genieacs:{name}")
+            for name, url in urls
+        ]
+        self.base_url = self.shards[0].base_url
+        self.breaker = self.shards[0].breaker
+        # Dispositivo → instância dona (aprendido nas leituras)
+        self._device_shards: Dict[str, GenieACSShard] = {}
+
+        http2 = GENIEACS_HTTP2 and http2_available()
+        if GENIEACS_HTTP2 and not http2:
+            logger.warning("⚠️ GENIEACS_HTTP2 ativo, mas o pacote h2 não está instalado: usando HTTP/1.1")
         self.client = httpx.AsyncClient(
-            timeout=30.0,
+            timeout=GENIEACS_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=GENIEACS_MAX_CONNECTIONS,
+                max_keepalive_connections=GENIEACS_MAX_KEEPALIVE,
+                keepalive_expiry=GENIEACS_KEEPALIVE_EXPIRY
+            ),
+            http2=http2,
             headers={
                 "Accept": "application/json",
                 "Content-Type": "application/json"
+            },
+            event_hooks={
+                "request": [on_genieacs_request],
+                "response": [on_genieacs_response]
             }
         )
+        # Limita a taxa de connection requests (cada um dispara uma sessão CWMP)
+        self.admission = ConnectionRequestAdmission()
+        if len(self.shards) > 1:
+            logger.info(f"🧩 GenieACS com {len(self.shards)} instâncias: "
+                        f"{', '.join(shard.name for shard in self.shards)}")
         
     async def __aenter__(self):
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self) -> None:
+        """Fecha as conexões do pool"""
         await self.client.aclose()
+
+    def shards_status(self) -> List[Dict[str, Any]]:
+        """Saúde de cada instância do GenieACS (circuito, dispositivos, último erro)"""
+        return [shard.to_dict() for shard in self.shards]
+
+    @instrument_genieacs("warm_up")
+    async def warm_up(self, connections: int = None) -> int:
+        """
+        Abre conexões no pool com consultas mínimas simultâneas, para que as
+        primeiras requisições após o deploy não paguem o handshake
+
+        Args:
+            connections: Conexões a abrir por instância (padrão: GENIEACS_WARM_CONNECTIONS)
+
+        Returns:
+            Número de consultas bem-sucedidas
+
+        Raises:
+            httpx.HTTPError: Se nenhuma consulta tiver sucesso
+        """
+        connections = connections or GENIEACS_WARM_CONNECTIONS
+        results = await asyncio.gather(*[
+            self._request(shard, "GET", "/devices", idempotent=True,
+                          params={"projection": "_id", "limit": "1"})
+            for shard in self.shards
+            for _ in range(connections)
+        ], return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        if len(errors) == len(results):
+            raise errors[0]
+        logger.info(f"🔥 Pool do GenieACS aquecido ({len(results) - len(errors)}/{len(results)} conexões)")
+        return len(results) - len(errors)
+
+    async def _invalidate_device(self, device_id: str) -> None:
+        """
+        Descarta o documento em cache do dispositivo em todos os workers
+        (chamado após tasks que alteram ou atualizam parâmetros)
+        """
+        try:
+            await get_shared_cache().invalidate(f"device:{device_id}")
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao invalidar cache do dispositivo {device_id}: {e}")
+
+    async def _request(self, shard: GenieACSShard, method: str, path: str,
+                       idempotent: bool = False, **kwargs) -> httpx.Response:
+        """
+        Executa uma chamada à NBI de uma instância, registrando a saúde dela
+
+        Raises:
+            CircuitOpenError: Circuito da instância aberto
+            DeadlineExceeded: Orçamento de tempo da requisição esgotado
+            httpx.HTTPError: Erro de transporte após as tentativas
+        """
+        try:
+            response = await self._call(shard, method, f"{shard.base_url}{path}", idempotent, **kwargs)
+        except CircuitOpenError as e:
+            shard.record_error(e, "short_circuit")
+            raise
+        except Exception as e:
+            shard.record_error(e)
+            raise
+        if response.status_code >= 500:
+            shard.record_error(f"HTTP {response.status_code}")
+        else:
+            shard.record_success()
+        return response
     
-    async def get_devices(self, query: Dict[str, Any] = None, projection: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    async def _call(self, shard: GenieACSShard, method: str, url: str, idempotent: bool = False,
+                    **kwargs) -> httpx.Response:
         """
-        Busca dispositivos do GenieACS
+        Executa uma chamada passando pelo circuit breaker da instância e respeitando
+        o deadline da requisição da API; leituras idempotentes são refeitas com jitter
+        
+        Raises:
+            CircuitOpenError: Circuito aberto (sem contato com a instância)
+            DeadlineExceeded: Orçamento de tempo da requisição esgotado
+            httpx.HTTPError: Erro de transporte após as tentativas
+        """
+        breaker = shard.breaker
+        attempts = 1 + (GENIEACS_READ_RETRIES if idempotent else 0)
+        for attempt in range(attempts):
+            remaining = deadline_remaining()
+            if remaining is not None and remaining <= 0:
+                record_genieacs_short_circuit()
+                raise DeadlineExceeded("Orçamento de tempo da requisição esgotado")
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                record_genieacs_short_circuit()
+                raise
+            
+            timeout = min(GENIEACS_TIMEOUT, remaining) if remaining is not None else GENIEACS_TIMEOUT
+            try:
+                response = await self.client.request(method, url, timeout=timeout, **kwargs)
+            except httpx.TransportError as e:
+                # Timeout de leitura numa escrita = CPE lento no connection request, não GenieACS fora
+                if not idempotent and isinstance(e, httpx.ReadTimeout):
+                    breaker.release()
+                else:
+                    breaker.record_failure()
+                if attempt == attempts - 1:
+                    raise
+                error = e
+            except BaseException:
+                # Cancelamento (cliente desconectou, timeout do aquecimento, outra
+                # instância do scatter falhou) ou erro sem relação com a saúde do
+                # GenieACS: libera a chamada de prova do half-open antes de propagar
+                breaker.release()
+                raise
+            else:
+                if response.status_code < 500:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if attempt == attempts - 1:
+                    return response
+                error = None
+            
+            delay = backoff_delay(attempt)
+            remaining = deadline_remaining()
+            if remaining is not None and delay >= remaining:
+                if error is not None:
+                    raise error
+                return response
+            record_genieacs_retry()
+            logger.warning(f"🔁 Repetindo {method} {url} em {delay:.2f}s (tentativa {attempt + 2}/{attempts})")
+            await asyncio.sleep(delay)
+
+    async def _get_json(self, shard: GenieACSShard, path: str, params: Dict[str, Any] = None) -> Any:
+        response = await self._request(shard, "GET", path, idempotent=True, params=params or {})
+        response.raise_for_status()
+        return response.json()
+
+    async def _scatter(self, path: str, params: Dict[str, Any] = None, raise_errors: bool = False,
+                       shards: List[GenieACSShard] = None) -> List[Tuple[GenieACSShard, Any]]:
+        """
+        Faz a mesma leitura em todas as instâncias ao mesmo tempo
+
+        Args:
+            path: Caminho na NBI (ex: "/devices")
+            params: Parâmetros da consulta
+            raise_errors: Se True, a falha de qualquer instância é propagada; senão
+                a resposta segue parcial e marcada como degradada
+            shards: Instâncias consultadas (padrão: todas)
+
+        Returns:
+            Lista de (instância, resultado) das instâncias que responderam
+
+        Raises:
+            Exception: Erro da primeira instância que falhou (com raise_errors ou
+                se nenhuma respondeu)
+        """
+        shards = self.shards if shards is None else shards
+        results = await asyncio.gather(*[
+            self._get_json(shard, path, params) for shard in shards
+        ], return_exceptions=True)
+        answered, errors = [], []
+        for shard, result in zip(shards, results):
+            if isinstance(result, BaseException):
+                errors.append(result)
+                if len(shards) > 1:
+                    logger.warning(f"⚠️ Instância {shard.name} do GenieACS falhou em {path}: {result}")
+            else:
+                answered.append((shard, result))
+        if errors and (raise_errors or not answered):
+            raise errors[0]
+        if errors:
+            mark_degraded("genieacs_shard_unavailable")
+        return answered
+
+    def _learn(self, shard: GenieACSShard, device_ids: List[str]) -> None:
+        """Registra a instância dona dos dispositivos vistos numa leitura"""
+        if len(self.shards) > 1:
+            for device_id in device_ids:
+                if device_id:
+                    self._device_shards[device_id] = shard
+
+    @staticmethod
+    def _page_params(params: Dict[str, Any], sort: Optional[Dict[str, int]],
+                     skip: Optional[int], limit: Optional[int]) -> Dict[str, Any]:
+        # Cada instância devolve as primeiras skip + limit linhas; o corte acontece na mescla
+        if sort:
+            params["sort"] = json.dumps(sort)
+        if limit is not None:
+            params["limit"] = str((skip or 0) + limit)
+        return params
+
+    @staticmethod
+    def _merge(batches: List[List[Dict[str, Any]]], sort: Optional[Dict[str, int]],
+               skip: Optional[int], limit: Optional[int]) -> List[Dict[str, Any]]:
+        if len(batches) == 1 and not sort:
+            documents = batches[0]
+        else:
+            documents = [document for batch in batches for document in batch]
+            if sort:
+                documents = sort_documents(documents, sort)
+        if skip:
+            documents = documents[skip:]
+        if limit is not None:
+            documents = documents[:limit]
+        return documents
+
+    async def _find_device(self, device_id: str,
+                           projection: str = None) -> Optional[Tuple[GenieACSShard, Dict[str, Any]]]:
+        """
+        Localiza o dispositivo: primeiro na instância conhecida, depois nas demais
+
+        Returns:
+            (instância, documento) ou None se nenhuma instância tem o dispositivo
+        """
+        # GenieACS não suporta /devices/{id}, então fazemos query na lista completa
+        params = {"query": json.dumps({"_id": device_id})}
+        if projection:
+            params["projection"] = projection
+
+        known = self._device_shards.get(device_id) or (self.shards[0] if len(self.shards) == 1 else None)
+        if known is not None:
+            devices = await self._get_json(known, "/devices", params)
+            if devices:
+                return known, devices[0]
+            # Dispositivo migrou de instância (ou foi removido)
+            self._device_shards.pop(device_id, None)
+        others = [shard for shard in self.shards if shard is not known]
+        if not others:
+            return None
+        for shard, devices in await self._scatter("/devices", params, shards=others):
+            if devices:
+                self._learn(shard, [device_id])
+                return shard, devices[0]
+        return None
+
+    async def _shard_for(self, device_id: str) -> GenieACSShard:
+        """
+        Instância dona do dispositivo (tasks precisam ir para a instância onde ele está)
+
+        Raises:
+            ShardNotFoundError: Nenhuma instância tem o dispositivo
+        """
+        if len(self.shards) == 1:
+            return self.shards[0]
+        shard = self._device_shards.get(device_id)
+        if shard is not None:
+            return shard
+        found = await self._find_device(device_id, projection="_id")
+        if found is None:
+            raise ShardNotFoundError(f"Dispositivo {device_id} não encontrado em nenhuma instância do GenieACS")
+        return found[0]
+    
+    async def _post_task(self, device_id: str, data: Dict[str, Any], connection_request: bool = True) -> httpx.Response:
+        """
+        Cria uma task para o dispositivo na instância dona, passando pelo controle
+        de admissão quando há connection request
+        
+        Raises:
+            AdmissionRejected: Se o controle de admissão descartar o pedido
+            ShardNotFoundError: Se nenhuma instância tem o dispositivo
+        """
+        shard = await self._shard_for(device_id)
+        path = f"/devices/{device_id}/tasks"
+        if connection_request:
+            await self.admission.acquire()
+            path += "?connection_request"
+        return await self._request(shard, "POST", path, json=data)
+    
+    @instrument_genieacs("get_devices")
+    async def get_devices(self, query: Dict[str, Any] = None, projection: Dict[str, Any] = None,
+                          raise_errors: bool = False, sort: Dict[str, int] = None,
+                          skip: int = None, limit: int = None) -> List[Dict[str, Any]]:
+        """
+        Busca dispositivos em todas as instâncias do GenieACS
         
         Args:
             query: Filtro de busca MongoDB-style
             projection: Campos a serem retornados
+            raise_errors: Se True, propaga erros (inclusive de uma única instância)
+                em vez de retornar lista vazia ou parcial (usado pelo sync, que
+                precisa distinguir "sem dispositivos" de "falha")
+            sort: Ordenação MongoDB-style ({campo: 1 | -1}), aplicada à mescla
+            skip: Dispositivos a pular no resultado mesclado
+            limit: Máximo de dispositivos no resultado mesclado
             
         Returns:
             Lista de dispositivos
@@ -51,20 +515,30 @@ class GenieACSClient:
             if projection:
                 params["projection"] = ",".join(projection) if isinstance(projection, list) else projection
             
-            response = await self.client.get(f"{self.base_url}/devices", params=params)
-            response.raise_for_status()
+            self._page_params(params, sort, skip, limit)
+            batches = []
+            for shard, devices in await self._scatter("/devices", params, raise_errors=raise_errors):
+                self._learn(shard, [device.get("_id") for device in devices])
+                if not query and limit is None:
+                    shard.record_devices(len(devices))
+                batches.append(devices)
             
-            devices = response.json()
+            devices = self._merge(batches, sort, skip, limit)
             logger.info(f"Recuperados {len(devices)} dispositivos do GenieACS")
             return devices
             
         except httpx.HTTPError as e:
             logger.error(f"Erro ao buscar dispositivos: {e}")
+            if raise_errors:
+                raise
             return []
         except Exception as e:
             logger.error(f"Erro inesperado ao buscar dispositivos: {e}")
+            if raise_errors:
+                raise
             return []
     
+    @instrument_genieacs("get_device_by_id")
     async def get_device_by_id(self, device_id: str) -> Optional[Dict[str, Any]]:
         """
         Busca um dispositivo específico por ID
@@ -75,18 +549,26 @@ class GenieACSClient:
         Returns:
             Dados do dispositivo ou None se não encontrado
         """
+        cache = get_shared_cache()
+        cache_name = f"device:{device_id}"
         try:
-            # GenieACS não suporta /devices/{id}, então fazemos query na lista completa
-            query = {"_id": device_id}
-            params = {"query": json.dumps(query)}
-            
-            response = await self.client.get(f"{self.base_url}/devices", params=params)
-            response.raise_for_status()
-            devices = response.json()
+            cached = await cache.get_json(cache_name)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao ler cache do dispositivo {device_id}: {e}")
+        
+        try:
+            found = await self._find_device(device_id)
             
-            if devices and len(devices) > 0:
+            if found is not None:
+                device = found[1]
                 logger.info(f"Dispositivo {device_id} encontrado")
-                return devices[0]
+                try:
+                    await cache.put_json(cache_name, device, ttl=DEVICE_CACHE_TTL)
+                except Exception as e:
+                    logger.warning(f"⚠️ Falha ao gravar cache do dispositivo {device_id}: {e}")
+                return device
             else:
                 logger.warning(f"Dispositivo {device_id} não encontrado")
                 return None
@@ -98,55 +580,81 @@ class GenieACSClient:
             logger.error(f"Erro inesperado ao buscar dispositivo {device_id}: {e}")
             return None
     
-    async def get_faults(self, query: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    @instrument_genieacs("get_faults")
+    async def get_faults(self, query: Dict[str, Any] = None, raise_errors: bool = False,
+                         use_cache: bool = True, projection: List[str] = None) -> List[Dict[str, Any]]:
         """
-        Busca faults/alertas do GenieACS
+        Busca faults/alertas em todas as instâncias do GenieACS
         
         Args:
             query: Filtro de busca MongoDB-style
+            raise_errors: Se True, propaga erros (inclusive de uma única instância)
+                em vez de retornar lista vazia ou parcial
+            use_cache: Se True, a lista completa (sem query) é lida/gravada no cache compartilhado
+            projection: Campos a serem retornados (ex: ["_id"])
             
         Returns:
             Lista de faults
         """
+        cache = get_shared_cache() if use_cache and not query and not projection else None
+        if cache is not None:
+            try:
+                cached = await cache.get_json("faults")
+                if cached is not None:
+                    return cached
+            except Exception as e:
+                logger.warning(f"⚠️ Falha ao ler cache de faults: {e}")
+        
         try:
             params = {}
             if query:
                 params["query"] = json.dumps(query)
+            if projection:
+                params["projection"] = ",".join(projection)
                 
-            response = await self.client.get(f"{self.base_url}/faults", params=params)
-            response.raise_for_status()
+            answered = await self._scatter("/faults", params, raise_errors=raise_errors)
+            for shard, batch in answered:
+                self._learn(shard, [fault.get("device") for fault in batch])
             
-            faults = response.json()
+            faults = self._merge([batch for _, batch in answered], None, None, None)
             logger.info(f"Recuperados {len(faults)} faults do GenieACS")
+            # Resposta parcial (instância fora) não vai para o cache compartilhado
+            if cache is not None and len(answered) == len(self.shards):
+                try:
+                    await cache.put_json("faults", faults, ttl=FAULTS_CACHE_TTL)
+                except Exception as e:
+                    logger.warning(f"⚠️ Falha ao gravar cache de faults: {e}")
             return faults
             
         except httpx.HTTPError as e:
             logger.error(f"Erro ao buscar faults: {e}")
+            if raise_errors:
+                raise
             return []
         except Exception as e:
             logger.error(f"Erro inesperado ao buscar faults: {e}")
+            if raise_errors:
+                raise
             return []
     
+    @instrument_genieacs("get_tasks")
     async def get_tasks(self, device_id: str = None) -> List[Dict[str, Any]]:
         """
         Busca tasks do GenieACS
         
         Args:
-            device_id: ID do dispositivo (opcional)
+            device_id: ID do dispositivo (opcional; sem ele, tasks de todas as instâncias)
             
         Returns:
             Lista de tasks
         """
         try:
             if device_id:
-                endpoint = f"{self.base_url}/devices/{device_id}/tasks"
+                shard = await self._shard_for(device_id)
+                tasks = await self._get_json(shard, f"/devices/{device_id}/tasks")
             else:
-                endpoint = f"{self.base_url}/tasks"
-                
-            response = await self.client.get(endpoint)
-            response.raise_for_status()
+                tasks = self._merge([batch for _, batch in await self._scatter("/tasks")], None, None, None)
             
-            tasks = response.json()
             logger.info(f"Recuperadas {len(tasks)} tasks do GenieACS")
             return tasks
             
@@ -167,51 +675,61 @@ class GenieACSClient:
             value: Valor a ser definido
             immediate: Se True, força connection request imediato (padrão: True)
             
+        Returns:
+            True se sucesso, False caso contrário
+        """
+        return await self.set_parameters(device_id, [[parameter, value]], immediate)
+    
+    @instrument_genieacs("set_parameters")
+    async def set_parameters(self, device_id: str, parameter_values: List[List[Any]], immediate: bool = True) -> bool:
+        """
+        Define vários parâmetros em uma única task setParameterValues
+        (uma única sessão CWMP aplica todas as alterações)
+        
+        Args:
+            device_id: ID do dispositivo
+            parameter_values: Lista de [parâmetro TR-069, valor]
+            immediate: Se True, força connection request imediato (padrão: True)
+            
         Returns:
             True se sucesso, False caso contrário
         """
         try:
             data = {
                 "name": "setParameterValues",
-                "parameterValues": [[parameter, value]]
+                "parameterValues": parameter_values
             }
             
             logger.info(f"🔧 ENVIANDO TASK para GenieACS:")
             logger.info(f"   Device ID: {device_id}")
-            logger.info(f"   Parameter: {parameter}")
-            logger.info(f"   Value: {value}")
+            logger.info(f"   Parameters: {parameter_values}")
             
-            # Construir URL com connection_request se immediate=True
-            url = f"{self.base_url}/devices/{device_id}/tasks"
             if immediate:
-                url += "?connection_request"
                 logger.info(f"🚀 USANDO CONNECTION REQUEST IMEDIATO")
             
-            logger.info(f"   URL: {url}")
-            logger.info(f"   Data: {data}")
-            
-            response = await self.client.post(url, json=data)
+            response = await self._post_task(device_id, data, connection_request=immediate)
             
-            logger.info(f"📨 RESPOSTA do GenieACS:")
-            logger.info(f"   Status Code: {response.status_code}")
-            logger.info(f"   Headers: {dict(response.headers)}")
-            logger.info(f"   Content: {response.text}")
+            logger.info(f"📨 RESPOSTA do GenieACS: {response.status_code} {response.text}")
             
             response.raise_for_status()
+            await self._invalidate_device(device_id)
             
-            logger.info(f"✅ Parâmetro {parameter} definido para {value} no dispositivo {device_id}")
+            logger.info(f"✅ {len(parameter_values)} parâmetro(s) definidos no dispositivo {device_id}")
             return True
             
+        except AdmissionRejected:
+            raise
         except httpx.HTTPError as e:
-            logger.error(f"❌ ERRO HTTP ao definir parâmetro {parameter}: {e}")
+            logger.error(f"❌ ERRO HTTP ao definir parâmetros {[p[0] for p in parameter_values]}: {e}")
             if hasattr(e, 'response') and e.response:
                 logger.error(f"   Response status: {e.response.status_code}")
                 logger.error(f"   Response body: {e.response.text}")
             return False
         except Exception as e:
-            logger.error(f"❌ ERRO inesperado ao definir parâmetro {parameter}: {e}")
+            logger.error(f"❌ ERRO inesperado ao definir parâmetros {[p[0] for p in parameter_values]}: {e}")
             return False
     
+    @instrument_genieacs("refresh_wifi_passwords")
     async def refresh_wifi_passwords(self, device_id: str) -> bool:
         """
         Força refresh específico dos parâmetros de senha WiFi
@@ -239,24 +757,29 @@ class GenieACSClient:
                         "objectName": obj_name
                     }
                     
-                    url = f"{self.base_url}/devices/{device_id}/tasks?connection_request"
-                    
                     logger.info(f"🔄 REFRESH WiFi passwords - {obj_name}")
                     
-                    response = await self.client.post(url, json=data)
+                    response = await self._post_task(device_id, data)
                     response.raise_for_status()
                     success_count += 1
                     
+                except AdmissionRejected:
+                    raise
                 except Exception as e:
                     logger.warning(f"⚠️ Falha ao refresh {obj_name}: {e}")
             
             logger.info(f"✅ Refresh WiFi passwords: {success_count}/{len(wifi_password_objects)} sucessos")
+            if success_count > 0:
+                await self._invalidate_device(device_id)
             return success_count > 0
             
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logger.error(f"❌ ERRO no refresh WiFi passwords: {e}")
             return False
 
+    @instrument_genieacs("summon_device")
     async def summon_device(self, device_id: str) -> bool:
         """
         Força um 'summon' imediato do dispositivo (equivalente ao botão Summon no GenieACS UI)
@@ -273,24 +796,24 @@ class GenieACSClient:
                 "objectName": ""  # Root refresh - força refresh de todos os parâmetros
             }
             
-            url = f"{self.base_url}/devices/{device_id}/tasks?connection_request"
-            
             logger.info(f"🌟 SUMMON DEVICE (como botão GenieACS UI):")
             logger.info(f"   Device ID: {device_id}")
-            logger.info(f"   URL: {url}")
             logger.info(f"   Data: {data}")
             
-            response = await self.client.post(url, json=data)
+            response = await self._post_task(device_id, data)
             
             logger.info(f"📨 RESPOSTA SUMMON:")
             logger.info(f"   Status Code: {response.status_code}")
             logger.info(f"   Content: {response.text}")
             
             response.raise_for_status()
+            await self._invalidate_device(device_id)
             
             logger.info(f"✅ Dispositivo {device_id} summonado com sucesso!")
             return True
             
+        except AdmissionRejected:
+            raise
         except httpx.HTTPError as e:
             logger.error(f"❌ ERRO HTTP ao summonar dispositivo {device_id}: {e}")
             if hasattr(e, 'response') and e.response:
@@ -301,6 +824,7 @@ class GenieACSClient:
             logger.error(f"❌ ERRO inesperado ao summonar dispositivo {device_id}: {e}")
             return False
     
+    @instrument_genieacs("refresh_ip_parameters")
     async def refresh_ip_parameters(self, device_id: str) -> bool:
         """
         Força refresh específico dos parâmetros de IP (ExternalIPAddress)
@@ -331,24 +855,29 @@ class GenieACSClient:
                         "objectName": param
                     }
                     
-                    url = f"{self.base_url}/devices/{device_id}/tasks?connection_request"
-                    
-                    response = await self.client.post(url, json=data)
+                    response = await self._post_task(device_id, data)
                     if response.status_code in [200, 202]:
                         success_count += 1
                         logger.info(f"✅ Refresh IP parameter: {param}")
                     
+                except AdmissionRejected:
+                    raise
                 except Exception as e:
                     logger.warning(f"⚠️ Falha ao refresh {param}: {e}")
                     continue
             
             logger.info(f"🌐 IP Parameters refresh: {success_count}/{len(ip_parameters)} sucessos")
+            if success_count > 0:
+                await self._invalidate_device(device_id)
             return success_count > 0
             
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logger.error(f"❌ ERRO ao fazer refresh de parâmetros IP: {e}")
             return False
 
+    @instrument_genieacs("refresh_device")
     async def refresh_device(self, device_id: str) -> bool:
         """
         Força uma atualização de um dispositivo
@@ -362,11 +891,9 @@ class GenieACSClient:
         try:
             data = {"name": "refreshObject", "objectName": ""}
             
-            response = await self.client.post(
-                f"{self.base_url}/devices/{device_id}/tasks",
-                json=data
-            )
+            response = await self._post_task(device_id, data, connection_request=False)
             response.raise_for_status()
+            await self._invalidate_device(device_id)
             
             logger.info(f"Refresh solicitado para dispositivo {device_id}")
             return True
@@ -388,4 +915,21 @@ async def get_genieacs_client() -> GenieACSClient:
     global _genieacs_client
     if _genieacs_client is None:
         _genieacs_client = GenieACSClient()
-    return _genieacs_client
\ No newline at end of file
+    return _genieacs_client
+
+async def close_genieacs_client() -> None:
+    """
+    Fecha o cliente singleton (chamado no shutdown da aplicação)
+    """
+    global _genieacs_client
+    if _genieacs_client is not None:
+        await _genieacs_client.close()
+        _genieacs_client = None
+
+
+def genieacs_shards_status() -> List[Dict[str, Any]]:
+    """
+    Saúde das instâncias do GenieACS do cliente singleton (vazio antes do startup
+    e após o shutdown)
+    """
+    return _genieacs_client.shards_status() if _genieacs_client is not None else []
@@ -0,0 +1,260 @@
+"""
+GenieACS MongoDB Reader
+Leitura direta, somente leitura, das coleções devices e faults do MongoDB do
+GenieACS para o sync de inventário, sem a camada HTTP e a recodificação JSON da
+NBI. Escritas e tasks continuam sempre pela NBI.
+
+Depende do motor (requirements-mongo.txt); sem ele, ou sem GENIEACS_MONGODB_URL,
+o sync lê pela NBI.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Union
+
+from app.services.metrics import instrument_genieacs
+
+logger = logging.getLogger(__name__)
+
+# Raízes do documento usadas pelos transformadores (projeção feita no servidor)
+SYNC_PROJECTION = [
+    "_id",
+    "_deviceId",
+    "_lastInform",
+    "_tags",
+    "InternetGatewayDevice",
+    "Device",
+    "VirtualParameters"
+]
+
+# Campos gravados como Date pelo GenieACS (a NBI os devolve como texto ISO)
+DATE_FIELDS = {"_lastInform", "_registered", "_lastBoot", "_lastBootstrap", "timestamp", "expiry"}
+
+
+def _motor():
+    """motor é opcional: importado só quando a leitura direta é configurada"""
+    try:
+        from motor import motor_asyncio
+    except ImportError:
+        return None
+    return motor_asyncio
+
+
+def _as_utc(value: datetime) -> datetime:
+    # O pymongo devolve datas sem fuso (UTC) por padrão
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def to_nbi(value: Any) -> Any:
+    """
+    Converte um documento do MongoDB para o formato devolvido pela NBI
+    (datas como texto ISO em UTC com milissegundos, igual ao JSON do GenieACS)
+    """
+    if isinstance(value, dict):
+        return {key: to_nbi(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_nbi(item) for item in value]
+    if isinstance(value, datetime):
+        return _as_utc(value).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+    return value
+
+
+def _parse_date(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return value
+    return value
+
+
+def to_mongo_query(query: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converte uma query no formato da NBI para o MongoDB: datas em texto nos campos
+    de data viram datetime (como a NBI faz antes de consultar)
+    """
+    result = {}
+    for key, value in query.items():
+        if key in ("$and", "$or", "$nor") and isinstance(value, list):
+            result[key] = [to_mongo_query(item) for item in value]
+        elif key in DATE_FIELDS and isinstance(value, dict):
+            result[key] = {op: _parse_date(item) for op, item in value.items()}
+        elif key in DATE_FIELDS:
+            result[key] = _parse_date(value)
+        else:
+            result[key] = value
+    return result
+
+
+def to_mongo_projection(projection: Union[List[str], str, None]) -> Optional[Dict[str, int]]:
+    """Projeção da NBI (lista ou texto separado por vírgula) no formato do MongoDB"""
+    if not projection:
+        return None
+    fields = projection.split(",") if isinstance(projection, str) else projection
+    return {field.strip(): 1 for field in fields if field.strip()}
+
+
+class GenieACSMongoReader:
+    """
+    Leitor direto das coleções do GenieACS com varredura incremental
+
+    O sync mantém os documentos brutos em memória: a cada ciclo só os dispositivos
+    com `_lastInform` a partir do último inform visto (menos uma margem para
+    relógios e sessões em andamento) são relidos, e uma varredura só de `_id`
+    (atendida pelo índice) detecta os removidos. A cada `full_scan_interval`
+    ciclos a coleção é relida inteira, cobrindo alterações sem inform (ex: tags).
+    """
+
+    def __init__(self, url: str = None, databases: List[Any] = None,
+                 full_scan_interval: int = None, overlap: float = None):
+        """
+        Args:
+            url: URLs de conexão separadas por vírgula, uma por instância do GenieACS
+                (padrão: GENIEACS_MONGODB_URL; vazio desativa a leitura direta)
+            databases: Bancos já abertos com a API do motor (ex: mongomock_motor),
+                usados no lugar de `url`
+            full_scan_interval: Ciclos entre varreduras completas
+            overlap: Margem em segundos sobre o último `_lastInform` visto
+        """
+        self.url = url if url is not None else os.getenv("GENIEACS_MONGODB_URL", "")
+        self.full_scan_interval = full_scan_interval or int(os.getenv("GENIEACS_MONGODB_FULL_SCAN_INTERVAL", "10"))
+        self.overlap = overlap if overlap is not None else float(os.getenv("GENIEACS_MONGODB_INFORM_OVERLAP", "120"))
+        self._databases = databases
+        self._clients: List[Any] = []
+
+        self.devices: Dict[str, Dict[str, Any]] = {}
+        self.last_inform: Optional[datetime] = None
+        self.scans = 0
+
+    @property
+    def active(self) -> bool:
+        return bool(self._databases)
+
+    def start(self) -> bool:
+        """
+        Abre as conexões se a leitura direta estiver configurada
+
+        Returns:
+            True se o sync deve ler do MongoDB
+        """
+        if self._databases:
+            return True
+        urls = [url.strip() for url in self.url.split(",") if url.strip()]
+        if not urls:
+            return False
+        motor = _motor()
+        if motor is None:
+            logger.warning("⚠️ GENIEACS_MONGODB_URL definido, mas o motor não está instalado "
+                           "(requirements-mongo.txt): sync continua pela NBI")
+            return False
+        # Sem I/O aqui: o motor conecta na primeira consulta
+        self._clients = [
+            motor.AsyncIOMotorClient(url, tz_aware=True, readPreference="secondaryPreferred")
+            for url in urls
+        ]
+        self._databases = [client.get_default_database("genieacs") for client in self._clients]
+        logger.info(f"🍃 Sync de inventário lendo direto do MongoDB do GenieACS ({len(urls)} banco(s))")
+        return True
+
+    def close(self) -> None:
+        for client in self._clients:
+            client.close()
+        self._clients = []
+        self._databases = None
+
+    async def _find(self, collection: str, query: Dict[str, Any] = None,
+                    projection: Union[List[str], str, None] = None,
+                    sort: Dict[str, int] = None, limit: int = None) -> List[Dict[str, Any]]:
+        """Consulta a coleção em todos os bancos ao mesmo tempo (documentos brutos)"""
+        async def find(database) -> List[Dict[str, Any]]:
+            cursor = database[collection].find(to_mongo_query(query or {}), to_mongo_projection(projection))
+            if sort:
+                cursor = cursor.sort(list(sort.items()))
+            if limit is not None:
+                cursor = cursor.limit(limit)
+            return await cursor.to_list(length=None)
+
+        batches = await asyncio.gather(*[find(database) for database in self._databases])
+        return [document for batch in batches for document in batch]
+
+    @instrument_genieacs("mongo_get_devices")
+    async def get_devices(self, query: Dict[str, Any] = None,
+                          projection: Union[List[str], str, None] = None) -> List[Dict[str, Any]]:
+        """
+        Busca dispositivos direto no MongoDB
+
+        Args:
+            query: Filtro MongoDB-style no formato da NBI
+            projection: Campos a serem retornados
+
+        Returns:
+            Dispositivos no formato da NBI
+        """
+        return to_nbi(await self._find("devices", query, projection))
+
+    @instrument_genieacs("mongo_get_faults")
+    async def get_faults(self, query: Dict[str, Any] = None,
+                         projection: Union[List[str], str, None] = None) -> List[Dict[str, Any]]:
+        """
+        Busca faults direto no MongoDB
+
+        Args:
+            query: Filtro MongoDB-style no formato da NBI
+            projection: Campos a serem retornados
+
+        Returns:
+            Faults no formato da NBI
+        """
+        return to_nbi(await self._find("faults", query, projection))
+
+    @instrument_genieacs("mongo_scan_devices")
+    async def scan_devices(self) -> List[Dict[str, Any]]:
+        """
+        Inventário completo de dispositivos para o sync, relendo só o que mudou
+
+        Returns:
+            Todos os dispositivos no formato da NBI
+        """
+        full = self.last_inform is None or self.scans % self.full_scan_interval == 0
+        if full:
+            documents = await self._find("devices", projection=SYNC_PROJECTION)
+            devices = {}
+        else:
+            since = self.last_inform - timedelta(seconds=self.overlap)
+            documents, present = await asyncio.gather(
+                self._find("devices", {"_lastInform": {"$gte": since}}, SYNC_PROJECTION),
+                self._find("devices", projection=["_id"])
+            )
+            present_ids = {document["_id"] for document in present}
+            devices = {device_id: device for device_id, device in self.devices.items() if device_id in present_ids}
+
+        last_inform = self.last_inform
+        for document in documents:
+            inform = document.get("_lastInform")
+            if isinstance(inform, datetime):
+                inform = _as_utc(inform)
+                if last_inform is None or inform > last_inform:
+                    last_inform = inform
+            devices[document["_id"]] = to_nbi(document)
+
+        logger.debug(f"🍃 Varredura {'completa' if full else 'incremental'}: "
+                     f"{len(documents)} relidos, {len(devices)} dispositivos")
+        self.devices = devices
+        self.last_inform = last_inform
+        self.scans += 1
+        return list(devices.values())
+
+
+# Singleton global para reutilização
+_genieacs_mongo: Optional[GenieACSMongoReader] = None
+
+def get_genieacs_mongo() -> GenieACSMongoReader:
+    """
+    Retorna uma instância singleton do leitor direto do MongoDB do GenieACS
+    """
+    global _genieacs_mongo
+    if _genieacs_mongo is None:
+        _genieacs_mongo = GenieACSMongoReader()
+    return _genieacs_mongo
@@ -94,6 +94,90 @@ def extract_manufacturer_model(device_data: Dict[str, Any]) -> tuple[str, str]:
     
     return manufacturer, model
 
+# Caminhos de potência óptica (RX, TX) por fabricante e fator de escala para dBm
+# (TR-181 reporta em milésimos de dBm)
+OPTICAL_POWER_PATHS = [
+    ("InternetGatewayDevice.WANDevice.1.X_GponInterafceConfig.RXPower._value",  # Huawei (grafia do firmware)
+     "InternetGatewayDevice.WANDevice.1.X_GponInterafceConfig.TXPower._value", 1.0),
+    ("InternetGatewayDevice.WANDevice.1.X_GponInterfaceConfig.RXPower._value",
+     "InternetGatewayDevice.WANDevice.1.X_GponInterfaceConfig.TXPower._value", 1.0),
+    ("InternetGatewayDevice.WANDevice.1.X_ZTE-COM_WANPONInterfaceConfig.RXPower._value",
+     "InternetGatewayDevice.WANDevice.1.X_ZTE-COM_WANPONInterfaceConfig.TXPower._value", 1.0),
+    ("Device.Optical.Interface.1.OpticalSignalLevel._value",
+     "Device.Optical.Interface.1.TransmitOpticalLevel._value", 0.001),
+]
+
+def _parse_optical_power(value: Any, scale: float) -> Optional[float]:
+    try:
+        power = float(value) * scale
+    except (TypeError, ValueError):
+        return None
+    # Faixa plausível para GPON/EPON em dBm; fora dela o valor é lixo do firmware
+    return round(power, 2) if -50.0 <= power <= 10.0 else None
+
+def extract_optical_power(device_data: Dict[str, Any]) -> tuple[Optional[float], Optional[float]]:
+    """
+    Extrai as potências ópticas RX/TX reportadas pelo dispositivo
+    
+    Args:
+        device_data: Dados raw do dispositivo do GenieACS
+        
+    Returns:
+        Tupla (rx_power, tx_power) em dBm, None quando não disponível
+    """
+    for rx_path, tx_path, scale in OPTICAL_POWER_PATHS:
+        rx_power = _parse_optical_power(safe_get_nested(device_data, rx_path), scale)
+        tx_power = _parse_optical_power(safe_get_nested(device_data, tx_path), scale)
+        if rx_power is not None or tx_power is not None:
+            return rx_power, tx_power
+    return None, None
+
+# Parâmetros de RSSI dos clientes associados ao WiFi (TR-098 e TR-181)
+ASSOCIATED_RSSI_FIELDS = ["AssociatedDeviceRSSI", "X_HUAWEI_RSSI", "SignalStrength", "X_HUAWEI_SignalStrength"]
+WIFI_ACCESS_POINT_PATHS = [
+    "InternetGatewayDevice.LANDevice.1.WLANConfiguration",
+    "Device.WiFi.AccessPoint",
+]
+
+def extract_wifi_rssi(device_data: Dict[str, Any]) -> Optional[float]:
+    """
+    RSSI medido dos clientes WiFi associados (mediana entre todos os rádios)
+    
+    Args:
+        device_data: Dados raw do dispositivo do GenieACS
+        
+    Returns:
+        RSSI em dBm, None quando o dispositivo não reporta clientes associados
+        (sem valor simulado, ao contrário do signal_strength do CPE)
+    """
+    readings = []
+    for base_path in WIFI_ACCESS_POINT_PATHS:
+        access_points = safe_get_nested(device_data, base_path)
+        if not isinstance(access_points, dict):
+            continue
+        for access_point in access_points.values():
+            associated = access_point.get("AssociatedDevice") if isinstance(access_point, dict) else None
+            if not isinstance(associated, dict):
+                continue
+            for client in associated.values():
+                if not isinstance(client, dict):
+                    continue
+                for field in ASSOCIATED_RSSI_FIELDS:
+                    value = safe_get_nested(client, f"{field}._value")
+                    try:
+                        rssi = float(value)
+                    except (TypeError, ValueError):
+                        continue
+                    if -100.0 <= rssi < 0.0:
+                        readings.append(rssi)
+                        break
+    if not readings:
+        return None
+    readings.sort()
+    middle = len(readings) // 2
+    median = readings[middle] if len(readings) % 2 else (readings[middle - 1] + readings[middle]) / 2
+    return round(median, 1)
+
 def transform_genieacs_to_cpe(device_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Transforma dados do GenieACS em estrutura CPE compatível com o frontend
@@ -168,6 +252,9 @@ def transform_genieacs_to_cpe(device_data: Dict[str, Any]) -> Dict[str, Any]:
             "InternetGatewayDevice.DeviceInfo.SoftwareVersion._value"
         )
         
+        # ONU à qual o roteador está ligado (ONUs em bridge), informada pelo provisionamento
+        uplink_onu_id = safe_get_nested(device_data, "VirtualParameters.OnuId._value") or None
+        
         # Signal strength (simulado baseado no status)
         signal_strength = -45.0 if status == "online" else None
         
@@ -202,7 +289,8 @@ def transform_genieacs_to_cpe(device_data: Dict[str, Any]) -> Dict[str, Any]:
                 "software_version": sw_version,
                 "oui": oui,
                 "product_class": device_id.get("_ProductClass"),
-                "last_inform_raw": last_inform
+                "last_inform_raw": last_inform,
+                "uplink_onu_id": uplink_onu_id
             }
         }
         
@@ -213,16 +301,59 @@ def transform_genieacs_to_cpe(device_data: Dict[str, Any]) -> Dict[str, Any]:
         logger.error(f"Dados do dispositivo: {device_data}")
         return None
 
-def transform_genieacs_to_onu(device_data: Dict[str, Any], olt_mapping: Dict[str, str] = None) -> Dict[str, Any]:
+# Localização PON informada pelo provisionamento do GenieACS (virtual parameters que
+# leem a OLT/porta do OMCI ou do inventário da rede)
+PON_LOCATION_PATHS = {
+    "olt_id": "VirtualParameters.OltId._value",
+    "pon_port": "VirtualParameters.PonPort._value",
+    "distance": "VirtualParameters.OnuDistance._value",  # metros
+}
+
+# ONUs ópticas sem OLT/porta conhecida ficam agrupadas aqui no índice
+UNASSIGNED_OLT = "unassigned"
+UNKNOWN_PON_PORT = "unknown"
+
+def extract_pon_location(device_data: Dict[str, Any],
+                         olt_mapping: Dict[str, Dict[str, Any]] = None) -> tuple[Optional[str], Optional[str]]:
+    """
+    Extrai a OLT e a porta PON de uma ONU
+
+    O mapeamento explícito (por ID do dispositivo ou serial) tem precedência sobre
+    os virtual parameters do GenieACS.
+
+    Args:
+        device_data: Dados raw do dispositivo do GenieACS
+        olt_mapping: {device_id ou serial: {"olt_id": ..., "pon_port": ...}}
+
+    Returns:
+        Tupla (olt_id, pon_port), None quando não disponível
+    """
+    olt_id = safe_get_nested(device_data, PON_LOCATION_PATHS["olt_id"])
+    pon_port = safe_get_nested(device_data, PON_LOCATION_PATHS["pon_port"])
+
+    if olt_mapping:
+        serial_number = device_data.get("_deviceId", {}).get("_SerialNumber")
+        mapped = olt_mapping.get(device_data.get("_id")) or olt_mapping.get(serial_number)
+        if mapped:
+            olt_id = mapped.get("olt_id") or olt_id
+            pon_port = mapped.get("pon_port") or pon_port
+
+    olt_id = str(olt_id).strip() if olt_id not in (None, "") else None
+    pon_port = str(pon_port).strip() if pon_port not in (None, "") else None
+    return olt_id, pon_port
+
+def transform_genieacs_to_onu(device_data: Dict[str, Any],
+                              olt_mapping: Dict[str, Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
     """
     Transforma dados do GenieACS em estrutura ONU
     
     Args:
         device_data: Dados raw do dispositivo do GenieACS
-        olt_mapping: Mapeamento de dispositivos para OLTs
+        olt_mapping: Mapeamento de dispositivos para OLT/porta PON (ver extract_pon_location)
         
     Returns:
-        Dados da ONU formatados
+        Dados da ONU formatados, ou None se o dispositivo não é uma ONU (sem
+        potência óptica nem localização PON)
     """
     try:
         device_id = device_data.get("_deviceId", {})
@@ -231,20 +362,23 @@ def transform_genieacs_to_onu(device_data: Dict[str, Any], olt_mapping: Dict[str
         
         onu_id = device_data.get("_id", f"{oui}-{device_id.get('_ProductClass', '')}-{serial_number}")
         
+        olt_id, pon_port = extract_pon_location(device_data, olt_mapping)
+        rx_power, tx_power = extract_optical_power(device_data)
+        if olt_id is None and rx_power is None and tx_power is None:
+            return None
+        
         manufacturer, model = extract_manufacturer_model(device_data)
         
         last_inform = device_data.get("_lastInform")
         status = determine_device_status(last_inform)
         
-        # Para ONUs, podemos tentar extrair informações de PON
-        # Isso dependeria do modelo específico e parâmetros TR-069 disponíveis
-        olt_id = "olt-001"  # Simulado - seria mapeado baseado na rede
-        pon_port = "1/1"    # Simulado - extraído de parâmetros específicos
-        
-        # Potências RX/TX (simuladas - dependem do modelo)
-        rx_power = -18.5 if status == "online" else None
-        tx_power = 2.5 if status == "online" else None
-        distance = 1.2 if status == "online" else None
+        distance = None
+        try:
+            raw_distance = safe_get_nested(device_data, PON_LOCATION_PATHS["distance"])
+            if raw_distance not in (None, ""):
+                distance = round(float(raw_distance) / 1000, 3)  # km
+        except (TypeError, ValueError):
+            pass
         
         last_seen_dt = None
         if last_inform:
@@ -258,8 +392,8 @@ def transform_genieacs_to_onu(device_data: Dict[str, Any], olt_mapping: Dict[str
             "serial_number": serial_number,
             "model": model,
             "status": status,
-            "olt_id": olt_id,
-            "pon_port": pon_port,
+            "olt_id": olt_id or UNASSIGNED_OLT,
+            "pon_port": pon_port or UNKNOWN_PON_PORT,
             "rx_power": rx_power,
             "tx_power": tx_power,
             "distance": distance,
@@ -280,6 +414,18 @@ def transform_genieacs_to_onu(device_data: Dict[str, Any], olt_mapping: Dict[str
         logger.error(f"Erro ao transformar dispositivo GenieACS em ONU: {e}")
         return None
 
+# Severidade dos alertas por código de fault CWMP
+FAULT_SEVERITY = {
+    "9001": "critical",  # Invalid parameter name
+    "9002": "warning",   # Invalid parameter type
+    "9003": "warning",   # Invalid parameter value
+    "9004": "critical",  # Attempt to set non-writable parameter
+    "9005": "info",      # Notification request rejected
+    "8001": "critical",  # Method not supported
+    "8002": "critical",  # Request denied
+    "8003": "critical",  # Internal error
+}
+
 def transform_genieacs_fault_to_alert(fault_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Transforma fault do GenieACS em alerta do sistema
@@ -296,18 +442,7 @@ def transform_genieacs_fault_to_alert(fault_data: Dict[str, Any]) -> Dict[str, A
         
         # Mapear tipos de fault para severidade
         fault_code = fault_data.get("code", "")
-        severity_map = {
-            "9001": "critical",  # Invalid parameter name
-            "9002": "warning",   # Invalid parameter type
-            "9003": "warning",   # Invalid parameter value
-            "9004": "critical",  # Attempt to set non-writable parameter
-            "9005": "info",      # Notification request rejected
-            "8001": "critical",  # Method not supported
-            "8002": "critical",  # Request denied
-            "8003": "critical",  # Internal error
-        }
-        
-        severity = severity_map.get(str(fault_code), "warning")
+        severity = FAULT_SEVERITY.get(str(fault_code), "warning")
         
         # Título e descrição baseados no fault
         title = fault_data.get("detail", {}).get("faultString", f"Fault {fault_code}")
@@ -334,7 +469,7 @@ def transform_genieacs_fault_to_alert(fault_data: Dict[str, Any]) -> Dict[str, A
             
             "_genieacs_metadata": {
                 "fault_code": fault_code,
-                "fault_raw": fault_data
+                "fault_id": fault_id
             }
         }
         
@@ -837,4 +972,41 @@ def format_wifi_configs_for_frontend(wifi_configs: List[Dict[str, Any]]) -> Dict
                 "avg_signal": -50.0,
                 "total_connections": 0
             }
-        }
\ No newline at end of file
+        }
+
+def calculate_wifi_stats(devices: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Estatísticas WiFi a partir dos CPEs já transformados (sem reprocessar os
+    documentos raw do GenieACS)
+    
+    Args:
+        devices: Lista de dispositivos processados
+        
+    Returns:
+        Estatísticas no mesmo formato de format_wifi_configs_for_frontend
+    """
+    ssids = set()
+    active_ssids = set()
+    enabled_devices = 0
+    signal_strengths = []
+    
+    for device in devices:
+        ssid = device.get("wifi_ssid")
+        enabled = bool(device.get("wifi_enabled"))
+        if ssid:
+            ssids.add(ssid)
+            if enabled:
+                active_ssids.add(ssid)
+        if enabled:
+            enabled_devices += 1
+        if device.get("signal_strength") is not None and device.get("status") == "online":
+            signal_strengths.append(device["signal_strength"])
+    
+    return {
+        "total_profiles": len(ssids),
+        "active_profiles": len(active_ssids),
+        "total_devices": len(devices),
+        "online_devices": enabled_devices,
+        "avg_signal": round(sum(signal_strengths) / len(signal_strengths), 1) if signal_strengths else -50.0,
+        "total_connections": 0  # Placeholder - seria obtido de estatísticas
+    }
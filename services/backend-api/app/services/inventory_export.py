@@ -0,0 +1,224 @@
+"""
+Inventory Export
+Exportação do inventário (CPEs e ONUs) em CSV ou NDJSON como stream: as linhas
+são serializadas em blocos à medida que são lidas do snapshot do sync, do índice
+de ONUs ou de páginas da NBI, sem montar a lista inteira nem o arquivo em memória
+"""
+
+import csv
+import json
+import logging
+import os
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence
+
+from app.services.genieacs_client import get_genieacs_client
+from app.services.genieacs_transformers import transform_genieacs_to_cpe
+from app.services.inventory_sync import get_inventory_sync
+from app.services.metrics import observe_transform
+from app.services.onu_inventory import get_onu_inventory
+from app.services.resilience import deadline_scope
+from app.services.tracing import mark_degraded
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Campos exportáveis por tipo (padrão: todos, nesta ordem)
+CPE_EXPORT_FIELDS = [
+    "id", "serial_number", "model", "manufacturer", "status", "ip_address",
+    "last_seen", "wifi_enabled", "wifi_ssid", "signal_strength", "customer_name",
+    "hardware_version", "software_version"
+]
+ONU_EXPORT_FIELDS = [
+    "id", "serial_number", "model", "manufacturer", "status", "olt_id", "pon_port",
+    "rx_power", "tx_power", "distance", "last_seen"
+]
+
+# Campos que vêm dos metadados do GenieACS do registro transformado
+METADATA_FIELDS = {"manufacturer", "hardware_version", "software_version"}
+
+# Linhas por bloco enviado (cada bloco é um write no socket)
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "500"))
+
+# Dispositivos por página quando o inventário é lido direto da NBI
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+
+
+def select_fields(requested: Optional[str], available: Sequence[str]) -> List[str]:
+    """
+    Campos pedidos na exportação
+
+    Args:
+        requested: Campos separados por vírgula (None = todos)
+        available: Campos exportáveis do tipo
+
+    Raises:
+        ValueError: Campo desconhecido
+    """
+    if not requested:
+        return list(available)
+    fields = [field.strip() for field in requested.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(f"Campos inválidos: {', '.join(unknown)} (disponíveis: {', '.join(available)})")
+    return fields
+
+
+def record_filter(filters: Dict[str, Optional[str]]) -> Callable[[Dict[str, Any]], bool]:
+    """Filtro por igualdade dos campos informados (os None são ignorados)"""
+    active = {field: value for field, value in filters.items() if value is not None}
+
+    def matches(record: Dict[str, Any]) -> bool:
+        return all(record.get(field) == value for field, value in active.items())
+    return matches
+
+
+def _value(record: Dict[str, Any], field: str) -> Any:
+    if field in METADATA_FIELDS:
+        return (record.get("_genieacs_metadata") or {}).get(field)
+    return record.get(field)
+
+
+async def iter_nbi_cpes(page_size: int = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    CPEs lidos da NBI em páginas por ordem de _id (paginação por chave: cada
+    página pede os _id maiores que o último visto, com custo constante mesmo
+    com várias instâncias do GenieACS)
+
+    Só a primeira página respeita o deadline da requisição (ela decide entre o
+    stream e o 503); as demais são lidas depois do envio dos headers, enquanto
+    o corpo é transmitido, e não podem ser cortadas por esse orçamento
+    """
+    page_size = page_size or EXPORT_PAGE_SIZE
+    client = await get_genieacs_client()
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else None
+        with nullcontext() if last_id is None else deadline_scope(None):
+            page = await client.get_devices(query=query, sort={"_id": 1}, limit=page_size, raise_errors=True)
+        if not page:
+            return
+        with observe_transform("cpe_batch"):
+            cpes = [cpe for cpe in map(transform_genieacs_to_cpe, page) if cpe]
+        for cpe in cpes:
+            yield cpe
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["_id"]
+
+
+async def _iterate(records: Iterable[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    for record in records:
+        yield record
+
+
+async def cpe_records() -> AsyncIterator[Dict[str, Any]]:
+    """
+    Fonte dos CPEs: snapshot do sync (iterado direto; o sync troca o dicionário a
+    cada ciclo em vez de alterá-lo) ou páginas da NBI; com o GenieACS fora antes
+    da primeira página, o último snapshot mesmo antigo
+    """
+    snapshot = get_inventory_sync().get_snapshot()
+    if snapshot is not None:
+        return _iterate(snapshot["devices"].values())
+
+    pages = iter_nbi_cpes()
+    try:
+        first = await pages.__anext__()
+    except StopAsyncIteration:
+        return _iterate(())
+    except Exception as e:
+        snapshot = get_inventory_sync().get_snapshot(allow_stale=True)
+        if snapshot is None:
+            raise
+        logger.warning(f"⚠️ Exportação usando snapshot antigo, GenieACS indisponível: {e}")
+        mark_degraded("genieacs_unavailable")
+        return _iterate(snapshot["devices"].values())
+
+    async def chained() -> AsyncIterator[Dict[str, Any]]:
+        yield first
+        async for cpe in pages:
+            yield cpe
+    return chained()
+
+
+async def onu_records(olt_id: str = None, pon_port: str = None,
+                      status: str = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Fonte das ONUs: índice de ONUs (filtros por OLT/porta usam o próprio índice;
+    a lista copiada tem só referências, porque o índice é alterado no lugar)
+    """
+    onu_inventory = get_onu_inventory()
+    await onu_inventory.refresh()
+    return _iterate(onu_inventory.query(olt_id=olt_id, pon_port=pon_port, status=status))
+
+
+class _Buffer:
+    """Destino do csv.writer reaproveitado entre blocos"""
+
+    def __init__(self):
+        self.parts: List[str] = []
+
+    def write(self, text: str) -> None:
+        self.parts.append(text)
+
+    def drain(self) -> bytes:
+        data = "".join(self.parts).encode("utf-8")
+        self.parts.clear()
+        return data
+
+
+async def serialize(records: AsyncIterator[Dict[str, Any]], fields: List[str], fmt: str,
+                    matches: Callable[[Dict[str, Any]], bool] = None) -> AsyncIterator[bytes]:
+    """
+    Serializa os registros em blocos de EXPORT_CHUNK_ROWS linhas
+
+    Args:
+        records: Registros (CPE/ONU transformados)
+        fields: Colunas, na ordem
+        fmt: "csv" (com cabeçalho) ou "ndjson" (um objeto JSON por linha)
+        matches: Filtro aplicado antes de serializar
+
+    Yields:
+        Blocos de bytes; o cabeçalho CSV sai antes da leitura da primeira linha
+
+    Raises:
+        Exception: Falha na leitura no meio do stream, propagada depois do último
+            bloco completo (e, no NDJSON, de uma linha {"error": ...}) para que o
+            servidor aborte a conexão em vez de encerrar o arquivo como completo
+    """
+    buffer = _Buffer()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(fields)
+        yield buffer.drain()
+
+    rows = 0
+    pending = 0
+    try:
+        async for record in records:
+            if matches is not None and not matches(record):
+                continue
+            values = [_value(record, field) for field in fields]
+            if writer is not None:
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(fields, values)), ensure_ascii=False, default=str) + "\n")
+            rows += 1
+            pending += 1
+            if pending >= EXPORT_CHUNK_ROWS:
+                yield buffer.drain()
+                pending = 0
+    except Exception as e:
+        logger.error(f"Exportação {fmt} interrompida após {rows} linhas: {e}")
+        if writer is None:
+            buffer.write(json.dumps({"error": "Exportação interrompida", "rows": rows}) + "\n")
+        yield buffer.drain()
+        raise
+    if pending:
+        yield buffer.drain()
+    logger.info(f"📤 Exportação {fmt}: {rows} linhas")
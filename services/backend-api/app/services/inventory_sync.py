@@ -0,0 +1,331 @@
+"""
+Inventory Sync
+Loop de sincronização periódica com o GenieACS que mantém o snapshot do inventário
+e calcula os deltas (status, métricas e faults) entre dois ciclos consecutivos
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from app.services.genieacs_client import get_genieacs_client
+from app.services.genieacs_mongo import get_genieacs_mongo
+from app.services.metrics import observe_transform
+from app.services.shared_cache import LeaderElection, SharedCache, get_shared_cache
+from app.services.genieacs_transformers import (
+    transform_genieacs_to_cpe,
+    transform_genieacs_fault_to_alert
+)
+
+logger = logging.getLogger(__name__)
+
+# Campos do CPE cuja alteração gera um evento "device.metrics"
+# (last_seen e created_at mudam a cada inform e ficam de fora)
+TRACKED_METRIC_FIELDS = ["signal_strength", "ip_address", "wifi_ssid", "wifi_enabled"]
+
+# Nome do snapshot no cache compartilhado entre workers
+SNAPSHOT_NAME = "inventory"
+
+SyncListener = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+
+def compact_cpe(cpe_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Remove os metadados de debug de um CPE para envio em eventos
+
+    Args:
+        cpe_data: CPE transformado
+
+    Returns:
+        CPE sem o campo _genieacs_metadata
+    """
+    return {k: v for k, v in cpe_data.items() if k != "_genieacs_metadata"}
+
+
+def diff_devices(previous: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Calcula os deltas de dispositivos entre dois snapshots
+
+    Args:
+        previous: CPEs do ciclo anterior indexados por id
+        current: CPEs do ciclo atual indexados por id
+
+    Returns:
+        Lista de mudanças no formato {"type": ..., "data": ...}
+    """
+    changes = []
+
+    for device_id, cpe in current.items():
+        old = previous.get(device_id)
+        if old is None:
+            changes.append({"type": "device.added", "data": compact_cpe(cpe)})
+            continue
+
+        if old.get("status") != cpe.get("status"):
+            changes.append({
+                "type": "device.status",
+                "data": {
+                    "id": device_id,
+                    "from": old.get("status"),
+                    "to": cpe.get("status"),
+                    "last_seen": cpe.get("last_seen")
+                }
+            })
+
+        metric_changes = {
+            field: cpe.get(field)
+            for field in TRACKED_METRIC_FIELDS
+            if old.get(field) != cpe.get(field)
+        }
+        if metric_changes:
+            changes.append({
+                "type": "device.metrics",
+                "data": {"id": device_id, "changes": metric_changes}
+            })
+
+    for device_id in previous.keys() - current.keys():
+        changes.append({"type": "device.removed", "data": {"id": device_id}})
+
+    return changes
+
+
+def diff_faults(previous: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Calcula faults novos e resolvidos entre dois snapshots
+
+    Args:
+        previous: Faults raw do ciclo anterior indexados por _id
+        current: Faults raw do ciclo atual indexados por _id
+
+    Returns:
+        Lista de mudanças no formato {"type": ..., "data": ...}
+    """
+    changes = []
+
+    for fault_id in current.keys() - previous.keys():
+        alert = transform_genieacs_fault_to_alert(current[fault_id])
+        if alert:
+            alert.pop("_genieacs_metadata", None)
+            changes.append({"type": "fault.new", "data": alert})
+
+    for fault_id in previous.keys() - current.keys():
+        changes.append({
+            "type": "fault.cleared",
+            "data": {
+                "id": f"fault-{fault_id}",
+                "device_id": previous[fault_id].get("device")
+            }
+        })
+
+    return changes
+
+
+class InventorySync:
+    """Sincroniza periodicamente dispositivos e faults do GenieACS"""
+
+    def __init__(self, interval: float = None, shared_cache: SharedCache = None):
+        self.interval = interval or float(os.getenv("INVENTORY_SYNC_INTERVAL", "30"))
+        self.devices: Dict[str, Dict[str, Any]] = {}
+        self.faults: Dict[str, Dict[str, Any]] = {}
+        self.last_sync: Optional[datetime] = None
+        self.cycles = 0
+        self.max_snapshot_age = max(self.interval * 3, 90)
+        self._listeners: List[SyncListener] = []
+        self._task: Optional[asyncio.Task] = None
+        # Sinalizado quando o primeiro snapshot (próprio ou do líder) está disponível
+        self._populated = asyncio.Event()
+
+        # Com cache compartilhado, apenas o worker líder consulta o GenieACS;
+        # os demais recebem o snapshot via cache + invalidação pub/sub
+        self.shared_cache = shared_cache
+        self._election = LeaderElection(shared_cache, "inventory-sync", ttl=self.max_snapshot_age) if shared_cache else None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._election is None or self._election.is_leader
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def get_snapshot(self, allow_stale: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o snapshot atual se ainda estiver fresco
+
+        Args:
+            allow_stale: Retorna o último snapshot mesmo se antigo (resposta degradada
+                quando o GenieACS está indisponível)
+
+        Returns:
+            {"devices": ..., "faults": ..., "timestamp": ...} ou None se não houver
+            sync recente (nesse caso o chamador consulta o GenieACS diretamente)
+        """
+        if self.last_sync is None:
+            return None
+        if not allow_stale and (datetime.now() - self.last_sync).total_seconds() > self.max_snapshot_age:
+            return None
+        return {"devices": self.devices, "faults": self.faults, "timestamp": self.last_sync}
+
+    async def wait_populated(self) -> Dict[str, Any]:
+        """
+        Aguarda o primeiro snapshot do inventário (usado no aquecimento do startup)
+
+        Returns:
+            Resumo do snapshot carregado
+        """
+        await self._populated.wait()
+        return {"devices": len(self.devices), "faults": len(self.faults)}
+
+    def add_listener(self, listener: SyncListener) -> None:
+        """
+        Registra um consumidor chamado ao final de cada ciclo de sync
+
+        Args:
+            listener: Função (sync ou async) que recebe o dicionário do ciclo
+        """
+        self._listeners.append(listener)
+
+    async def _read_inventory(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Dispositivos e faults brutos do ciclo: direto do MongoDB do GenieACS quando
+        configurado (com a NBI como reserva se o banco falhar), senão pela NBI
+        """
+        mongo = get_genieacs_mongo()
+        if mongo.active:
+            try:
+                return await asyncio.gather(mongo.scan_devices(), mongo.get_faults())
+            except Exception as e:
+                logger.warning(f"⚠️ Leitura direta do MongoDB falhou, usando a NBI neste ciclo: {e}")
+
+        client = await get_genieacs_client()
+        raw_devices = await client.get_devices(raise_errors=True)
+        raw_faults = await client.get_faults(raise_errors=True, use_cache=False)
+        return raw_devices, raw_faults
+
+    async def sync_once(self) -> Dict[str, Any]:
+        """
+        Executa um ciclo de sincronização
+
+        Returns:
+            Dicionário do ciclo com timestamp, snapshots raw/transformados e mudanças
+        """
+        raw_devices, raw_faults = await self._read_inventory()
+
+        devices = {}
+        with observe_transform("cpe_batch"):
+            for device_data in raw_devices:
+                cpe_data = transform_genieacs_to_cpe(device_data)
+                if cpe_data:
+                    devices[cpe_data["id"]] = cpe_data
+
+        faults = {f["_id"]: f for f in raw_faults if f.get("_id")}
+
+        # No primeiro ciclo não há base de comparação: os clientes buscam as listas completas
+        changes = []
+        if self.last_sync is not None:
+            with observe_transform("inventory_diff"):
+                changes = diff_devices(self.devices, devices) + diff_faults(self.faults, faults)
+
+        self.devices = devices
+        self.faults = faults
+        self.last_sync = datetime.now()
+        self.cycles += 1
+        self._populated.set()
+
+        cycle = {
+            "timestamp": self.last_sync,
+            "raw_devices": raw_devices,
+            "devices": devices,
+            "faults": faults,
+            "changes": changes
+        }
+
+        for listener in self._listeners:
+            try:
+                result = listener(cycle)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Erro em listener do sync de inventário: {e}")
+
+        logger.info(f"🔁 Sync de inventário: {len(devices)} dispositivos, {len(faults)} faults, {len(changes)} mudanças")
+        return cycle
+
+    async def publish_snapshot(self) -> None:
+        """Grava o snapshot atual no cache compartilhado (executado pelo líder)"""
+        if self.shared_cache is None:
+            return
+        await self.shared_cache.put_json(SNAPSHOT_NAME, {
+            "timestamp": self.last_sync.isoformat(),
+            "devices": self.devices,
+            "faults": self.faults
+        }, ttl=self.max_snapshot_age)
+
+    async def load_snapshot(self, name: str = SNAPSHOT_NAME) -> bool:
+        """
+        Carrega o snapshot publicado pelo líder (executado pelos demais workers)
+
+        Returns:
+            True se um snapshot foi carregado
+        """
+        if self.shared_cache is None or self.is_leader:
+            return False
+        snapshot = await self.shared_cache.get_json(SNAPSHOT_NAME)
+        if not snapshot:
+            return False
+        self.devices = snapshot["devices"]
+        self.faults = snapshot["faults"]
+        self.last_sync = datetime.fromisoformat(snapshot["timestamp"])
+        self._populated.set()
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self._election is None or await self._election.ensure():
+                    await self.sync_once()
+                    await self.publish_snapshot()
+                elif self.get_snapshot() is None:
+                    # Invalidação perdida ou worker recém-iniciado
+                    await self.load_snapshot()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro no sync de inventário: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Inicia o loop de sincronização em background"""
+        if self.shared_cache is not None:
+            self.shared_cache.on_invalidate(SNAPSHOT_NAME, self.load_snapshot)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"🔁 Sync de inventário iniciado (intervalo {self.interval}s)")
+
+    async def stop(self) -> None:
+        """Interrompe o loop de sincronização"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._election is not None:
+            await self._election.release()
+
+
+# Singleton global para reutilização
+_inventory_sync: Optional[InventorySync] = None
+
+def get_inventory_sync() -> InventorySync:
+    """
+    Retorna uma instância singleton do sync de inventário
+    """
+    global _inventory_sync
+    if _inventory_sync is None:
+        _inventory_sync = InventorySync(shared_cache=get_shared_cache())
+    return _inventory_sync
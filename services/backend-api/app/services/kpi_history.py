@@ -0,0 +1,627 @@
+"""
+KPI History
+Histórico de KPIs por dispositivo (status, RSSI, potência óptica, mudanças de IP)
+gravado em lote a partir do sync de inventário, com consultas agregadas por intervalo de tempo
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.services.downsampling import lttb, merge_envelopes, minmax_buckets
+from app.services.genieacs_transformers import extract_optical_power, extract_wifi_rssi
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_COLUMNS = ["ts", "device_id", "online", "rssi", "rx_power", "tx_power", "ip_address"]
+
+# Limite de buckets por consulta (protege contra intervalos enormes com bucket pequeno)
+MAX_BUCKETS = 10000
+
+BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Tiers de rollup pré-computados na ingestão (segundos), para escopos agregados
+ROLLUP_TIERS = [60, 300, 3600]
+
+# Acumuladores por (tier, bucket, escopo), na ordem das colunas de kpi_rollups
+ROLLUP_FIELDS = ["samples", "online_sum", "rssi_sum", "rssi_count", "rssi_min", "rssi_max",
+                 "rx_sum", "rx_count", "rx_min", "rx_max", "tx_sum", "tx_count"]
+
+# Métricas disponíveis nos gráficos: coluna em kpi_samples e campos do rollup (soma, contagem, min, max)
+CHART_METRICS = {
+    "uptime": ("online", "online_sum", "samples", None, None),
+    "rssi": ("rssi", "rssi_sum", "rssi_count", "rssi_min", "rssi_max"),
+    "rx_power": ("rx_power", "rx_sum", "rx_count", "rx_min", "rx_max"),
+    "tx_power": ("tx_power", "tx_sum", "tx_count", None, None),
+}
+
+DOWNSAMPLING_METHODS = ["lttb", "minmax"]
+
+
+def parse_bucket(bucket: str) -> int:
+    """
+    Converte um tamanho de bucket ("30s", "5m", "1h", "1d" ou segundos) em segundos
+
+    Raises:
+        ValueError: Se o formato for inválido
+    """
+    bucket = bucket.strip().lower()
+    if bucket.isdigit():
+        seconds = int(bucket)
+    elif bucket[:-1].isdigit() and bucket[-1] in BUCKET_UNITS:
+        seconds = int(bucket[:-1]) * BUCKET_UNITS[bucket[-1]]
+    else:
+        raise ValueError(f"Bucket inválido: {bucket}")
+    if seconds <= 0:
+        raise ValueError(f"Bucket inválido: {bucket}")
+    return seconds
+
+
+def resolve_time_range(start: Optional[datetime], end: Optional[datetime],
+                       default_span: timedelta = timedelta(hours=24)) -> Tuple[datetime, datetime]:
+    """
+    Normaliza o intervalo de consulta para datetimes UTC com timezone
+
+    Args:
+        start: Início (None = end - default_span)
+        end: Fim (None = agora)
+
+    Returns:
+        Tupla (start, end) em UTC
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - default_span
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise ValueError("Intervalo inválido: start deve ser anterior a end")
+    return start, end
+
+
+def _rollup_row(bucket: datetime, row: Any) -> Dict[str, Any]:
+    def rounded(value):
+        return round(value, 2) if value is not None else None
+
+    return {
+        "bucket": bucket.isoformat(),
+        "samples": row[1],
+        "online_ratio": round(row[2], 4) if row[2] is not None else None,
+        "rssi_avg": rounded(row[3]),
+        "rssi_min": rounded(row[4]),
+        "rssi_max": rounded(row[5]),
+        "rx_power_avg": rounded(row[6]),
+        "rx_power_min": rounded(row[7]),
+        "rx_power_max": rounded(row[8]),
+        "tx_power_avg": rounded(row[9])
+    }
+
+
+def _accumulate(acc: List[Any], online: bool, rssi: Optional[float],
+                rx_power: Optional[float], tx_power: Optional[float]) -> None:
+    acc[0] += 1
+    acc[1] += int(online)
+    for value, offset in ((rssi, 2), (rx_power, 6)):
+        if value is not None:
+            acc[offset] += value
+            acc[offset + 1] += 1
+            acc[offset + 2] = value if acc[offset + 2] is None else min(acc[offset + 2], value)
+            acc[offset + 3] = value if acc[offset + 3] is None else max(acc[offset + 3], value)
+    if tx_power is not None:
+        acc[10] += tx_power
+        acc[11] += 1
+
+
+def _merge_rollup(acc: List[Any], other: List[Any]) -> None:
+    """Soma outro acumulador do mesmo bucket (contagens e somas somadas, extremos combinados)"""
+    for offset in (0, 1, 2, 3, 6, 7, 10, 11):
+        acc[offset] += other[offset]
+    for offset, pick in ((4, min), (5, max), (8, min), (9, max)):
+        if other[offset] is not None:
+            acc[offset] = other[offset] if acc[offset] is None else pick(acc[offset], other[offset])
+
+
+def _chart_value(row: Dict[str, Any], metric: str) -> Optional[Tuple[float, Optional[float], Optional[float]]]:
+    _, sum_field, count_field, min_field, max_field = CHART_METRICS[metric]
+    if not row[count_field]:
+        return None
+    avg = row[sum_field] / row[count_field]
+    if metric == "uptime":
+        avg *= 100
+    low = row[min_field] if min_field else avg
+    high = row[max_field] if max_field else avg
+    return avg, low, high
+
+
+def _rollup_upsert_sql(placeholder: Callable[[int], str], least: str, greatest: str) -> str:
+    columns = ["tier", "bucket", "scope"] + ROLLUP_FIELDS
+    values = ", ".join(placeholder(i + 1) for i in range(len(columns)))
+    updates = []
+    for field in ROLLUP_FIELDS:
+        if field.endswith("_min"):
+            updates.append(f"{field} = {least}(COALESCE(kpi_rollups.{field}, excluded.{field}), "
+                           f"COALESCE(excluded.{field}, kpi_rollups.{field}))")
+        elif field.endswith("_max"):
+            updates.append(f"{field} = {greatest}(COALESCE(kpi_rollups.{field}, excluded.{field}), "
+                           f"COALESCE(excluded.{field}, kpi_rollups.{field}))")
+        else:
+            updates.append(f"{field} = kpi_rollups.{field} + excluded.{field}")
+    return (f"INSERT INTO kpi_rollups ({', '.join(columns)}) VALUES ({values}) "
+            f"ON CONFLICT (tier, scope, bucket) DO UPDATE SET {', '.join(updates)}")
+
+
+ROLLUP_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS kpi_rollups (
+        tier INTEGER NOT NULL,
+        bucket {ts_type} NOT NULL,
+        scope TEXT NOT NULL,
+        samples BIGINT NOT NULL,
+        online_sum BIGINT NOT NULL,
+        rssi_sum DOUBLE PRECISION NOT NULL,
+        rssi_count BIGINT NOT NULL,
+        rssi_min DOUBLE PRECISION,
+        rssi_max DOUBLE PRECISION,
+        rx_sum DOUBLE PRECISION NOT NULL,
+        rx_count BIGINT NOT NULL,
+        rx_min DOUBLE PRECISION,
+        rx_max DOUBLE PRECISION,
+        tx_sum DOUBLE PRECISION NOT NULL,
+        tx_count BIGINT NOT NULL,
+        PRIMARY KEY (tier, scope, bucket)
+    )
+"""
+
+
+class PostgresKPIStore:
+    """Store em PostgreSQL/TimescaleDB com ingestão via COPY (asyncpg)"""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.pool = None
+        self.timescale = False
+
+    async def init(self) -> None:
+        import asyncpg
+
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=4)
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS kpi_samples (
+                    ts TIMESTAMPTZ NOT NULL,
+                    device_id TEXT NOT NULL,
+                    online BOOLEAN NOT NULL,
+                    rssi DOUBLE PRECISION,
+                    rx_power DOUBLE PRECISION,
+                    tx_power DOUBLE PRECISION,
+                    ip_address TEXT
+                )
+            """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS kpi_samples_device_ts ON kpi_samples (device_id, ts DESC)")
+            self.timescale = bool(await conn.fetchval("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'"))
+            if self.timescale:
+                await conn.execute("SELECT create_hypertable('kpi_samples', 'ts', if_not_exists => TRUE)")
+            else:
+                await conn.execute("CREATE INDEX IF NOT EXISTS kpi_samples_ts ON kpi_samples (ts DESC)")
+            await conn.execute(ROLLUP_TABLE_SQL.format(ts_type="TIMESTAMPTZ"))
+        logger.info(f"📈 Histórico de KPIs em PostgreSQL (TimescaleDB: {self.timescale})")
+
+    async def insert_many(self, rows: List[tuple]) -> None:
+        async with self.pool.acquire() as conn:
+            await conn.copy_records_to_table("kpi_samples", records=rows, columns=SAMPLE_COLUMNS)
+
+    async def query_rollup(self, start: datetime, end: datetime, bucket_seconds: int,
+                           device_id: str = None) -> List[Dict[str, Any]]:
+        if self.timescale:
+            bucket_expr = "time_bucket(make_interval(secs => $1::integer), ts)"
+        else:
+            bucket_expr = "to_timestamp(floor(extract(epoch FROM ts) / $1::integer) * $1::integer)"
+        device_filter = "AND device_id = $4" if device_id else ""
+        sql = f"""
+            SELECT {bucket_expr} AS bucket, count(*),
+                   avg(online::int), avg(rssi), min(rssi), max(rssi),
+                   avg(rx_power), min(rx_power), max(rx_power), avg(tx_power)
+            FROM kpi_samples
+            WHERE ts >= $2 AND ts < $3 {device_filter}
+            GROUP BY bucket ORDER BY bucket
+        """
+        args = [bucket_seconds, start, end] + ([device_id] if device_id else [])
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(sql, *args)
+        return [_rollup_row(row[0], row) for row in rows]
+
+    async def upsert_rollups(self, rows: List[tuple]) -> None:
+        sql = _rollup_upsert_sql(lambda i: f"${i}", "LEAST", "GREATEST")
+        rows = [(tier, datetime.fromtimestamp(bucket, timezone.utc), scope, *acc)
+                for tier, bucket, scope, *acc in rows]
+        async with self.pool.acquire() as conn:
+            await conn.executemany(sql, rows)
+
+    async def query_tier(self, tier: int, scope: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(f"""
+                SELECT bucket, {', '.join(ROLLUP_FIELDS)} FROM kpi_rollups
+                WHERE tier = $1 AND scope = $2 AND bucket >= $3 AND bucket < $4
+                ORDER BY bucket
+            """, tier, scope, start, end)
+        return [{"bucket": row[0].timestamp(), **dict(zip(ROLLUP_FIELDS, row[1:]))} for row in rows]
+
+    async def query_raw(self, device_id: str, column: str, start: datetime, end: datetime) -> List[Tuple[float, float]]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(f"""
+                SELECT extract(epoch FROM ts)::double precision, {column}::double precision FROM kpi_samples
+                WHERE device_id = $1 AND ts >= $2 AND ts < $3 AND {column} IS NOT NULL
+                ORDER BY ts
+            """, device_id, start, end)
+        return [(row[0], row[1]) for row in rows]
+
+    async def ip_changes(self, device_id: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT ts, ip_address FROM kpi_samples
+                WHERE device_id = $1 AND ts >= $2 AND ts < $3 AND ip_address IS NOT NULL
+                ORDER BY ts
+            """, device_id, start, end)
+        return [{"timestamp": row[0].isoformat(), "ip_address": row[1]} for row in rows]
+
+    async def close(self) -> None:
+        if self.pool:
+            await self.pool.close()
+
+
+class SQLiteKPIStore:
+    """Stand-in em SQLite para desenvolvimento e testes locais"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+
+    def _init(self) -> None:
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS kpi_samples (
+                ts REAL NOT NULL,
+                device_id TEXT NOT NULL,
+                online INTEGER NOT NULL,
+                rssi REAL,
+                rx_power REAL,
+                tx_power REAL,
+                ip_address TEXT
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS kpi_samples_device_ts ON kpi_samples (device_id, ts)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS kpi_samples_ts ON kpi_samples (ts)")
+        self.conn.execute(ROLLUP_TABLE_SQL.format(ts_type="REAL"))
+        self.conn.commit()
+
+    async def init(self) -> None:
+        await asyncio.to_thread(self._init)
+        logger.info(f"📈 Histórico de KPIs em SQLite ({self.path})")
+
+    def _insert_many(self, rows: List[tuple]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO kpi_samples ({', '.join(SAMPLE_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(row[0].timestamp(), row[1], int(row[2]), *row[3:]) for row in rows]
+            )
+
+    async def insert_many(self, rows: List[tuple]) -> None:
+        await asyncio.to_thread(self._insert_many, rows)
+
+    def _query_rollup(self, start: datetime, end: datetime, bucket_seconds: int,
+                      device_id: str = None) -> List[Dict[str, Any]]:
+        device_filter = "AND device_id = ?" if device_id else ""
+        sql = f"""
+            SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, count(*),
+                   avg(online), avg(rssi), min(rssi), max(rssi),
+                   avg(rx_power), min(rx_power), max(rx_power), avg(tx_power)
+            FROM kpi_samples
+            WHERE ts >= ? AND ts < ? {device_filter}
+            GROUP BY bucket ORDER BY bucket
+        """
+        args = [bucket_seconds, bucket_seconds, start.timestamp(), end.timestamp()] + ([device_id] if device_id else [])
+        rows = self.conn.execute(sql, args).fetchall()
+        return [_rollup_row(datetime.fromtimestamp(row[0], timezone.utc), row) for row in rows]
+
+    async def query_rollup(self, start: datetime, end: datetime, bucket_seconds: int,
+                           device_id: str = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._query_rollup, start, end, bucket_seconds, device_id)
+
+    def _upsert_rollups(self, rows: List[tuple]) -> None:
+        with self.conn:
+            self.conn.executemany(_rollup_upsert_sql(lambda i: "?", "min", "max"), rows)
+
+    async def upsert_rollups(self, rows: List[tuple]) -> None:
+        await asyncio.to_thread(self._upsert_rollups, rows)
+
+    def _query_tier(self, tier: int, scope: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(f"""
+            SELECT bucket, {', '.join(ROLLUP_FIELDS)} FROM kpi_rollups
+            WHERE tier = ? AND scope = ? AND bucket >= ? AND bucket < ?
+            ORDER BY bucket
+        """, (tier, scope, start.timestamp(), end.timestamp())).fetchall()
+        return [{"bucket": row[0], **dict(zip(ROLLUP_FIELDS, row[1:]))} for row in rows]
+
+    async def query_tier(self, tier: int, scope: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._query_tier, tier, scope, start, end)
+
+    def _query_raw(self, device_id: str, column: str, start: datetime, end: datetime) -> List[Tuple[float, float]]:
+        return self.conn.execute(f"""
+            SELECT ts, {column} FROM kpi_samples
+            WHERE device_id = ? AND ts >= ? AND ts < ? AND {column} IS NOT NULL
+            ORDER BY ts
+        """, (device_id, start.timestamp(), end.timestamp())).fetchall()
+
+    async def query_raw(self, device_id: str, column: str, start: datetime, end: datetime) -> List[Tuple[float, float]]:
+        return await asyncio.to_thread(self._query_raw, device_id, column, start, end)
+
+    def _ip_changes(self, device_id: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        rows = self.conn.execute("""
+            SELECT ts, ip_address FROM kpi_samples
+            WHERE device_id = ? AND ts >= ? AND ts < ? AND ip_address IS NOT NULL
+            ORDER BY ts
+        """, (device_id, start.timestamp(), end.timestamp())).fetchall()
+        return [{"timestamp": datetime.fromtimestamp(row[0], timezone.utc).isoformat(), "ip_address": row[1]}
+                for row in rows]
+
+    async def ip_changes(self, device_id: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._ip_changes, device_id, start, end)
+
+    async def close(self) -> None:
+        if self.conn:
+            self.conn.close()
+
+
+def create_kpi_store(dsn: str = None):
+    """
+    Cria o store a partir de KPI_HISTORY_DSN (ou DATABASE_URL)
+
+    Args:
+        dsn: "postgresql://..." para PostgreSQL/TimescaleDB ou "sqlite:///caminho.db"
+
+    Returns:
+        PostgresKPIStore ou SQLiteKPIStore
+    """
+    dsn = dsn or os.getenv("KPI_HISTORY_DSN") or os.getenv("DATABASE_URL") or "sqlite:///kpi_history.db"
+    if dsn.startswith("sqlite://"):
+        return SQLiteKPIStore(dsn[len("sqlite:///"):] or ":memory:")
+    # URLs no formato SQLAlchemy (postgresql+psycopg2://) não são aceitas pelo asyncpg
+    scheme, _, rest = dsn.partition("://")
+    return PostgresKPIStore(f"{scheme.split('+')[0]}://{rest}")
+
+
+class KPIHistory:
+    """Coleta amostras do sync de inventário e grava em lote no store"""
+
+    def __init__(self, store, batch_size: int = None, flush_interval: float = None, max_buffer: int = None):
+        self.store = store
+        self.batch_size = batch_size or int(os.getenv("KPI_BATCH_SIZE", "5000"))
+        self.flush_interval = flush_interval or float(os.getenv("KPI_FLUSH_INTERVAL", "10"))
+        self.max_buffer = max_buffer or int(os.getenv("KPI_MAX_BUFFER", "200000"))
+        self.ready = False
+        self._buffer: List[tuple] = []
+        self._rollups: Dict[Tuple[int, int, str], List[Any]] = {}
+        self._last_ip: Dict[str, Optional[str]] = {}
+
+        # Resolve o escopo de agregação adicional de um dispositivo (ex: "olt:<id>")
+        self.scope_resolver: Optional[Callable[[str], Optional[str]]] = None
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def record_cycle(self, cycle: Dict[str, Any]) -> None:
+        """
+        Listener do sync de inventário: converte o ciclo em amostras
+
+        Args:
+            cycle: Dicionário do ciclo de sync (usa raw_devices e devices)
+        """
+        if not self.ready:
+            return
+
+        ts = cycle["timestamp"].astimezone(timezone.utc)
+        epoch = int(ts.timestamp())
+        tier_buckets = [(tier, epoch - epoch % tier) for tier in ROLLUP_TIERS]
+        devices = cycle["devices"]
+        for device_data in cycle["raw_devices"]:
+            cpe = devices.get(device_data.get("_id"))
+            if cpe is None:
+                continue
+
+            device_id = cpe["id"]
+            rx_power, tx_power = extract_optical_power(device_data)
+
+            # IP gravado apenas quando muda: a coluna fica esparsa e vira o log de mudanças
+            ip_address = cpe.get("ip_address")
+            ip_changed = ip_address is not None and self._last_ip.get(device_id) != ip_address
+            self._last_ip[device_id] = ip_address
+
+            online = cpe.get("status") == "online"
+            rssi = extract_wifi_rssi(device_data)
+            self._buffer.append((
+                ts,
+                device_id,
+                online,
+                rssi,
+                rx_power,
+                tx_power,
+                ip_address if ip_changed else None
+            ))
+
+            scopes = ["fleet"]
+            if self.scope_resolver is not None:
+                extra_scope = self.scope_resolver(device_id)
+                if extra_scope:
+                    scopes.append(extra_scope)
+            for tier, bucket in tier_buckets:
+                for scope in scopes:
+                    acc = self._rollups.get((tier, bucket, scope))
+                    if acc is None:
+                        acc = self._rollups[(tier, bucket, scope)] = [0, 0, 0.0, 0, None, None, 0.0, 0, None, None, 0.0, 0]
+                    _accumulate(acc, online, rssi, rx_power, tx_power)
+
+        if len(self._buffer) > self.max_buffer:
+            dropped = len(self._buffer) - self.max_buffer
+            del self._buffer[:dropped]
+            logger.warning(f"⚠️ Buffer de KPIs cheio, {dropped} amostras antigas descartadas")
+
+    async def flush(self) -> int:
+        """
+        Grava as amostras pendentes em lotes de batch_size
+
+        Returns:
+            Número de amostras gravadas
+        """
+        async with self._flush_lock:
+            written = 0
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                try:
+                    await self.store.insert_many(batch)
+                except Exception as e:
+                    logger.error(f"Erro ao gravar {len(batch)} amostras de KPI: {e}")
+                    break
+                del self._buffer[:len(batch)]
+                written += len(batch)
+
+            if self._rollups:
+                # Os acumuladores são somados aos buckets já gravados (upsert)
+                rollups, self._rollups = self._rollups, {}
+                try:
+                    await self.store.upsert_rollups([(*key, *acc) for key, acc in rollups.items()])
+                except Exception as e:
+                    logger.error(f"Erro ao gravar {len(rollups)} rollups de KPI: {e}")
+                    # Buckets acumulados de novo durante o await recebem o que falhou
+                    for key, acc in rollups.items():
+                        current = self._rollups.get(key)
+                        if current is None:
+                            self._rollups[key] = acc
+                        else:
+                            _merge_rollup(current, acc)
+            return written
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self) -> None:
+        """Inicializa o store e o flush periódico"""
+        await self.store.init()
+        self.ready = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Grava as amostras pendentes e fecha o store"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.ready:
+            await self.flush()
+            await self.store.close()
+            self.ready = False
+
+    async def query(self, start: datetime, end: datetime, bucket_seconds: int,
+                    device_id: str = None) -> List[Dict[str, Any]]:
+        """
+        Consulta agregada por bucket de tempo (dispositivo ou frota inteira)
+
+        Args:
+            start: Início do intervalo (UTC)
+            end: Fim do intervalo (UTC)
+            bucket_seconds: Tamanho do bucket em segundos
+            device_id: Dispositivo (None = frota inteira)
+
+        Returns:
+            Lista de buckets com contagem, online_ratio e estatísticas de RSSI/potência
+        """
+        if (end - start).total_seconds() / bucket_seconds > MAX_BUCKETS:
+            raise ValueError(f"Intervalo excede {MAX_BUCKETS} buckets, use um bucket maior")
+        await self.flush()
+        return await self.store.query_rollup(start, end, bucket_seconds, device_id)
+
+    async def ip_changes(self, device_id: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        await self.flush()
+        return await self.store.ip_changes(device_id, start, end)
+
+    async def chart(self, metric: str, scope: str, start: datetime, end: datetime,
+                    points: int = 500, method: str = "lttb") -> Dict[str, Any]:
+        """
+        Série reduzida no servidor para gráficos
+
+        Escopos agregados ("fleet", "olt:<id>") leem o tier de rollup mais grosso que ainda
+        tenha pelo menos `points` buckets no intervalo; "device:<id>" lê as amostras brutas.
+
+        Args:
+            metric: "uptime", "rssi", "rx_power" ou "tx_power"
+            scope: "fleet", "olt:<id>" ou "device:<id>"
+            start: Início do intervalo (UTC)
+            end: Fim do intervalo (UTC)
+            points: Número máximo de pontos na resposta
+            method: "lttb" (pontos [ts_ms, valor]) ou "minmax" ([ts_ms, min, avg, max])
+
+        Returns:
+            Série compacta com metadados de tier/método
+        """
+        if metric not in CHART_METRICS:
+            raise ValueError(f"Métrica inválida: {metric}")
+        if method not in DOWNSAMPLING_METHODS:
+            raise ValueError(f"Método inválido: {method}")
+        points = max(3, min(points, 5000))
+        await self.flush()
+
+        span = (end - start).total_seconds()
+        if scope.startswith("device:"):
+            tier = None
+            column = CHART_METRICS[metric][0]
+            series = await self.store.query_raw(scope[len("device:"):], column, start, end)
+            if metric == "uptime":
+                series = [(ts, value * 100) for ts, value in series]
+            envelopes = None
+        else:
+            tier = next((t for t in reversed(ROLLUP_TIERS) if span / t >= points), ROLLUP_TIERS[0])
+            rows = await self.store.query_tier(tier, scope, start, end)
+            series = []
+            envelopes = []
+            for row in rows:
+                value = _chart_value(row, metric)
+                if value is not None:
+                    series.append((row["bucket"], value[0]))
+                    envelopes.append((row["bucket"], *value))
+
+        if method == "lttb":
+            data = [[int(ts * 1000), round(value, 2)] for ts, value in lttb(series, points)]
+        else:
+            # Rollups já têm min/max reais por bucket; amostras brutas são agrupadas aqui
+            reduced = merge_envelopes(envelopes, points) if envelopes is not None else minmax_buckets(series, points)
+            data = [[int(ts * 1000), round(low, 2), round(avg, 2), round(high, 2)]
+                    for ts, low, avg, high in reduced]
+
+        return {
+            "metric": metric,
+            "scope": scope,
+            "method": method,
+            "tier_seconds": tier,
+            "source_points": len(series),
+            "points": data
+        }
+
+
+# Singleton global para reutilização
+_kpi_history: Optional[KPIHistory] = None
+
+def get_kpi_history() -> KPIHistory:
+    """
+    Retorna uma instância singleton do histórico de KPIs
+    """
+    global _kpi_history
+    if _kpi_history is None:
+        _kpi_history = KPIHistory(create_kpi_store())
+    return _kpi_history
@@ -0,0 +1,293 @@
+"""
+Prometheus Metrics
+Métricas de latência dos endpoints, chamadas ao GenieACS, transformações,
+cache e lag do event loop
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+from app.services.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "rjchronos_http_request_duration_seconds",
+    "Latência das requisições HTTP por rota",
+    ["method", "route", "status"],
+)
+
+GENIEACS_CALL_DURATION = Histogram(
+    "rjchronos_genieacs_call_duration_seconds",
+    "Latência das chamadas do GenieACSClient por método",
+    ["method", "outcome"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+GENIEACS_CALLS = Counter(
+    "rjchronos_genieacs_calls_total",
+    "Chamadas do GenieACSClient por método e resultado",
+    ["method", "outcome"],
+)
+
+GENIEACS_PAYLOAD_BYTES = Counter(
+    "rjchronos_genieacs_payload_bytes_total",
+    "Bytes trafegados com a NBI do GenieACS",
+    ["method", "direction"],
+)
+
+TRANSFORM_DURATION = Histogram(
+    "rjchronos_transform_duration_seconds",
+    "Duração das transformações de dados do GenieACS",
+    ["transform"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+
+CACHE_REQUESTS = Counter(
+    "rjchronos_cache_requests_total",
+    "Leituras de cache por resultado (a razão de acerto é hit / total)",
+    ["cache", "result"],
+)
+
+ADMISSION_REQUESTS = Counter(
+    "rjchronos_admission_requests_total",
+    "Connection requests por prioridade e decisão do controle de admissão",
+    ["priority", "result"],
+)
+
+ADMISSION_WAIT = Histogram(
+    "rjchronos_admission_wait_seconds",
+    "Espera na fila do controle de admissão até liberar o connection request",
+    ["priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "rjchronos_admission_queue_depth",
+    "Connection requests aguardando token por prioridade",
+    ["priority"],
+    multiprocess_mode="livesum",
+)
+
+CIRCUIT_STATE = Gauge(
+    "rjchronos_circuit_state",
+    "Estado do circuit breaker (0 = fechado, 1 = meio-aberto, 2 = aberto)",
+    ["circuit"],
+    multiprocess_mode="max",
+)
+
+CIRCUIT_TRANSITIONS = Counter(
+    "rjchronos_circuit_transitions_total",
+    "Transições do circuit breaker por estado de destino",
+    ["circuit", "state"],
+)
+
+GENIEACS_RETRIES = Counter(
+    "rjchronos_genieacs_retries_total",
+    "Retentativas de leituras idempotentes no GenieACS",
+    ["method"],
+)
+
+GENIEACS_SHARD_REQUESTS = Counter(
+    "rjchronos_genieacs_shard_requests_total",
+    "Chamadas à NBI por instância do GenieACS e resultado (success, error, short_circuit)",
+    ["shard", "outcome"],
+)
+
+GENIEACS_SHARD_DEVICES = Gauge(
+    "rjchronos_genieacs_shard_devices",
+    "Dispositivos por instância do GenieACS na última leitura completa",
+    ["shard"],
+    multiprocess_mode="max",
+)
+
+REFRESH_REQUESTS = Counter(
+    "rjchronos_refresh_requests_total",
+    "Pedidos de refresh/summon por tipo e decisão (issued, joined, recent)",
+    ["kind", "result"],
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "rjchronos_event_loop_lag_seconds",
+    "Atraso do event loop em relação ao agendado",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+EVENT_LOOP_LAG_LAST = Gauge(
+    "rjchronos_event_loop_lag_last_seconds",
+    "Última medição do atraso do event loop",
+)
+
+# Estado da chamada do GenieACSClient em andamento (preenchido pelos hooks do httpx)
+_current_call: contextvars.ContextVar[Optional["GenieACSCallStats"]] = contextvars.ContextVar(
+    "genieacs_call", default=None
+)
+
+
+class GenieACSCallStats:
+    """Requisições HTTP observadas durante uma chamada do cliente"""
+
+    def __init__(self, method: str):
+        self.method = method
+        self.requests = 0
+        self.responses = 0
+        self.errors = 0
+
+    @property
+    def outcome(self) -> str:
+        # Os métodos do cliente tratam as próprias exceções; o resultado vem do que
+        # aconteceu no HTTP (status >= 400 ou requisição sem resposta = erro de transporte)
+        if self.errors or self.responses < self.requests:
+            return "error"
+        return "success"
+
+
+def instrument_genieacs(method: str) -> Callable:
+    """
+    Decorator que mede latência e resultado de um método do GenieACSClient
+
+    Args:
+        method: Nome do método usado no label das métricas
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            stats = GenieACSCallStats(method)
+            token = _current_call.set(stats)
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await func(*args, **kwargs)
+                outcome = stats.outcome
+                return result
+            except Exception as e:
+                # 429 = descartado pelo controle de admissão antes de chegar ao GenieACS
+                if getattr(e, "status_code", None) == 429:
+                    outcome = "rejected"
+                raise
+            finally:
+                _current_call.reset(token)
+                duration = time.perf_counter() - start
+                GENIEACS_CALL_DURATION.labels(method, outcome).observe(duration)
+                GENIEACS_CALLS.labels(method, outcome).inc()
+                record_span(f"genieacs.{method}", duration)
+        return wrapper
+    return decorator
+
+
+async def on_genieacs_request(request) -> None:
+    """Hook de requisição do httpx: conta bytes enviados"""
+    stats = _current_call.get()
+    method = stats.method if stats else "other"
+    if stats:
+        stats.requests += 1
+    GENIEACS_PAYLOAD_BYTES.labels(method, "sent").inc(len(request.content or b""))
+
+
+async def on_genieacs_response(response) -> None:
+    """Hook de resposta do httpx: conta bytes recebidos e erros HTTP"""
+    stats = _current_call.get()
+    method = stats.method if stats else "other"
+    # O cliente não usa streaming: ler o corpo aqui não custa uma leitura extra
+    await response.aread()
+    if stats:
+        stats.responses += 1
+        if response.status_code >= 400:
+            stats.errors += 1
+    GENIEACS_PAYLOAD_BYTES.labels(method, "received").inc(len(response.content))
+
+
+def record_genieacs_short_circuit() -> None:
+    """Marca a chamada atual como erro mesmo sem requisição HTTP (circuito aberto ou deadline)"""
+    stats = _current_call.get()
+    if stats:
+        stats.errors += 1
+
+
+def record_genieacs_shard(shard: str, outcome: str) -> None:
+    GENIEACS_SHARD_REQUESTS.labels(shard, outcome).inc()
+
+
+def record_genieacs_retry() -> None:
+    stats = _current_call.get()
+    GENIEACS_RETRIES.labels(stats.method if stats else "other").inc()
+
+
+@contextmanager
+def observe_transform(name: str) -> Iterator[None]:
+    """
+    Mede a duração de uma transformação (também registrada como span da requisição)
+
+    Args:
+        name: Nome da transformação (ex: "cpe_batch")
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        TRANSFORM_DURATION.labels(name).observe(duration)
+        record_span(f"transform.{name}", duration)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """
+    Mede continuamente o atraso do event loop (tempo além do sleep agendado)
+
+    Args:
+        interval: Intervalo entre medições em segundos
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+
+
+def route_label(scope: dict) -> str:
+    """
+    Label da rota (template do path) para evitar cardinalidade por id de dispositivo
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Gera a exposição das métricas
+
+    Com vários workers, PROMETHEUS_MULTIPROC_DIR ativa o modo multiprocess do
+    prometheus_client e agrega as métricas de todos os processos.
+
+    Returns:
+        Tupla (conteúdo, content-type)
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
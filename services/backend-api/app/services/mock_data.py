@@ -0,0 +1,104 @@
+"""
+Mock Data
+Dataset de demonstração (CPEs, ONUs, OLTs e alertas fictícios) usado como fallback
+quando DEMO_DATA_ENABLED=true; construído apenas no primeiro uso
+"""
+
+import functools
+import os
+from datetime import datetime
+from typing import Any, Dict, List
+
+# Modo demonstração: sem ele, as rotas respondem apenas com dados reais (ou erro)
+DEMO_DATA_ENABLED = os.getenv("DEMO_DATA_ENABLED", "false").lower() == "true"
+
+
+@functools.lru_cache(maxsize=None)
+def mock_cpes() -> List[Dict[str, Any]]:
+    now = datetime.now()
+    return [
+        {
+            "id": f"cpe-{i:03d}",
+            "serial_number": f"CPE{i:06d}",
+            "model": "Intelbras IWR 3000N" if i % 2 == 0 else "TP-Link Archer C6",
+            "status": "online" if i % 3 != 0 else "offline",
+            "ip_address": f"192.168.1.{i+100}",
+            "wifi_enabled": True,
+            "wifi_ssid": f"RJChronos_{i:03d}",
+            "signal_strength": -45.5 + (i % 20),
+            "customer_name": f"Cliente {i:03d}",
+            "last_seen": now,
+            "created_at": now
+        } for i in range(1, 51)
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def mock_onus() -> List[Dict[str, Any]]:
+    now = datetime.now()
+    return [
+        {
+            "id": f"onu-{i:03d}",
+            "serial_number": f"ONU{i:06d}",
+            "model": "Huawei HG8310M" if i % 2 == 0 else "ZTE F601",
+            "status": "online" if i % 4 != 0 else "offline",
+            "olt_id": f"olt-{(i-1)//4 + 1:03d}",
+            "pon_port": f"1/{(i-1)%4 + 1}",
+            "rx_power": -18.5 + (i % 10),
+            "tx_power": 2.5 + (i % 5),
+            "distance": 1.2 + (i % 10) * 0.1,
+            "last_seen": now,
+            "created_at": now
+        } for i in range(1, 21)
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def mock_olts() -> List[Dict[str, Any]]:
+    now = datetime.now()
+    onus_per_olt: Dict[str, int] = {}
+    for onu in mock_onus():
+        onus_per_olt[onu["olt_id"]] = onus_per_olt.get(onu["olt_id"], 0) + 1
+    return [
+        {
+            "id": f"olt-{i:03d}",
+            "serial_number": f"OLT{i:06d}",
+            "model": "Huawei MA5608T" if i % 2 == 0 else "ZTE C320",
+            "status": "online",
+            "location": f"Central {i}",
+            "pon_ports": 16,
+            "active_onus": onus_per_olt.get(f"olt-{i:03d}", 0),
+            "last_seen": now,
+            "created_at": now
+        } for i in range(1, 6)
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def mock_alerts() -> List[Dict[str, Any]]:
+    now = datetime.now()
+    return [
+        {
+            "id": f"alert-{i:03d}",
+            "device_id": f"cpe-{i:03d}" if i % 2 == 0 else f"onu-{i:03d}",
+            "severity": "critical" if i % 5 == 0 else "warning" if i % 3 == 0 else "info",
+            "title": f"Alerta {i:03d}",
+            "description": f"Descrição do alerta {i:03d}",
+            "acknowledged": i % 4 == 0,
+            "created_at": now
+        } for i in range(1, 16)
+    ]
+
+
+def mock_dashboard_metrics() -> Dict[str, Any]:
+    devices = mock_cpes() + mock_onus() + mock_olts()
+    return {
+        "total_devices": len(devices),
+        "online_devices": len([d for d in devices if d["status"] == "online"]),
+        "offline_devices": len([d for d in devices if d["status"] == "offline"]),
+        "critical_alerts": len([a for a in mock_alerts() if a["severity"] == "critical"]),
+        "uptime_percentage": 95.0,
+        "avg_signal_strength": -42.5,
+        "avg_latency": 15.2,
+        "sla_compliance": 99.8
+    }
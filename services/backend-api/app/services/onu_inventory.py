@@ -0,0 +1,391 @@
+"""
+ONU Inventory
+Inventário de ONUs construído dos parâmetros reais do GenieACS e indexado por
+OLT → porta PON → ONU, mantido de forma incremental para que contagens, ocupação e
+estatísticas ópticas por OLT e porta sejam leituras diretas
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from app.services.genieacs_client import get_genieacs_client
+from app.services.genieacs_transformers import (
+    OPTICAL_POWER_PATHS,
+    PON_LOCATION_PATHS,
+    UNASSIGNED_OLT,
+    determine_device_status,
+    transform_genieacs_to_onu
+)
+from app.services.inventory_sync import get_inventory_sync
+from app.services.metrics import observe_transform
+from app.services.shared_cache import SharedCache, get_shared_cache
+from app.services.tracing import mark_degraded
+
+logger = logging.getLogger(__name__)
+
+# Nome do inventário de ONUs no cache compartilhado (publicado pelo líder do sync)
+ONU_SNAPSHOT_NAME = "onu-inventory"
+
+# Campos necessários para montar uma ONU quando o GenieACS é consultado diretamente
+ONU_PROJECTION = sorted({"_id", "_deviceId", "_lastInform"} | {
+    path.rsplit(".", 2)[0] for pair in OPTICAL_POWER_PATHS for path in pair[:2]
+} | {path.rsplit(".", 1)[0] for path in PON_LOCATION_PATHS.values()})
+
+# Campos da ONU que entram nos agregados do índice
+INDEXED_FIELDS = ("status", "olt_id", "pon_port", "rx_power")
+
+
+def load_olt_mapping(path: Optional[str]) -> Dict[str, Any]:
+    """
+    Lê o arquivo de mapeamento de OLTs
+
+    Formato: {"olts": {olt_id: {"location", "model", "serial_number", "pon_ports"}},
+              "onus": {device_id ou serial: {"olt_id", "pon_port"}}}
+    """
+    if not path:
+        return {"olts": {}, "onus": {}}
+    try:
+        with open(path) as f:
+            mapping = json.load(f)
+        return {"olts": mapping.get("olts") or {}, "onus": mapping.get("onus") or {}}
+    except Exception as e:
+        logger.error(f"Erro ao ler mapeamento de OLTs {path}: {e}")
+        return {"olts": {}, "onus": {}}
+
+
+def _new_port() -> Dict[str, Any]:
+    return {"onus": set(), "online": 0, "rx_sum": 0.0, "rx_count": 0, "low_rx": 0}
+
+
+class OnuInventory:
+    """
+    ONUs indexadas por OLT e porta PON
+
+    Cada ONU contribui com contadores da sua OLT e porta (total, online, soma e
+    quantidade de leituras RX, RX abaixo do limite); uma atualização desfaz a
+    contribuição anterior e aplica a nova, então só as ONUs que mudaram custam algo.
+    A fonte é o ciclo do sync de inventário (o líder publica o resultado no cache
+    compartilhado para os demais workers) ou, sem sync, consultas ao GenieACS
+    projetando só os campos ópticos e de localização.
+    """
+
+    def __init__(self, refresh_interval: float = None, port_capacity: int = None,
+                 low_rx_threshold: float = None, mapping_file: str = None,
+                 shared_cache: SharedCache = None):
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else float(os.getenv("ONU_REFRESH_INTERVAL", "30"))
+        )
+        self.port_capacity = port_capacity or int(os.getenv("ONU_PON_PORT_CAPACITY", "128"))
+        self.low_rx_threshold = (
+            low_rx_threshold if low_rx_threshold is not None
+            else float(os.getenv("ONU_RX_LOW_THRESHOLD", "-27"))
+        )
+        mapping = load_olt_mapping(mapping_file or os.getenv("ONU_OLT_MAPPING_FILE"))
+        self.olt_catalog: Dict[str, Dict[str, Any]] = mapping["olts"]
+        self.onu_mapping: Dict[str, Dict[str, Any]] = mapping["onus"]
+        self.shared_cache = shared_cache
+
+        self._onus: Dict[str, Dict[str, Any]] = {}
+        # olt_id -> {"onus", "online", "last_seen", "ports": {pon_port -> agregados}}
+        self._olts: Dict[str, Dict[str, Any]] = {}
+        # OLTs cujo last_seen precisa ser recalculado (a ONU mais recente saiu)
+        self._stale_last_seen: Set[str] = set()
+        # Primeira vez que cada OLT apareceu (created_at das OLTs fora do catálogo)
+        self._olt_first_seen: Dict[str, str] = {}
+        # Incrementada quando alguma ONU muda (consumidores derivados, ex: topologia)
+        self.version = 0
+        self._last_refresh: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._onus)
+
+    # Índice
+
+    def _contribute(self, onu: Dict[str, Any], sign: int) -> None:
+        olt = self._olts.get(onu["olt_id"])
+        if olt is None:
+            olt = self._olts[onu["olt_id"]] = {"onus": 0, "online": 0, "last_seen": None, "ports": {}}
+            self._olt_first_seen.setdefault(onu["olt_id"], datetime.now().isoformat())
+        port = olt["ports"].get(onu["pon_port"])
+        if port is None:
+            port = olt["ports"][onu["pon_port"]] = _new_port()
+
+        online = onu["status"] == "online"
+        olt["onus"] += sign
+        olt["online"] += sign * online
+        if sign > 0:
+            port["onus"].add(onu["id"])
+            self._touch_olt(olt, onu)
+        else:
+            port["onus"].discard(onu["id"])
+            # Saiu a ONU mais recente: o máximo é recalculado na próxima leitura
+            if onu["last_seen"] and onu["last_seen"] == olt["last_seen"]:
+                self._stale_last_seen.add(onu["olt_id"])
+        port["online"] += sign * online
+
+        # Estatísticas ópticas consideram só a leitura atual (ONUs online)
+        rx_power = onu["rx_power"]
+        if online and rx_power is not None:
+            port["rx_sum"] += sign * rx_power
+            port["rx_count"] += sign
+            port["low_rx"] += sign * (rx_power < self.low_rx_threshold)
+
+        if not port["onus"]:
+            del olt["ports"][onu["pon_port"]]
+        if not olt["onus"]:
+            del self._olts[onu["olt_id"]]
+            self._stale_last_seen.discard(onu["olt_id"])
+
+    @staticmethod
+    def _touch_olt(olt: Dict[str, Any], onu: Dict[str, Any]) -> None:
+        if onu["last_seen"] and (olt["last_seen"] is None or onu["last_seen"] > olt["last_seen"]):
+            olt["last_seen"] = onu["last_seen"]
+
+    def _olt_last_seen(self, olt_id: str) -> Optional[str]:
+        """last_seen da OLT (inform mais recente das suas ONUs)"""
+        olt = self._olts.get(olt_id)
+        if olt is None:
+            return None
+        if olt_id in self._stale_last_seen:
+            self._stale_last_seen.discard(olt_id)
+            seen = [
+                self._onus[onu_id]["last_seen"]
+                for port in olt["ports"].values() for onu_id in port["onus"]
+                if self._onus[onu_id]["last_seen"]
+            ]
+            olt["last_seen"] = max(seen) if seen else None
+        return olt["last_seen"]
+
+    def _upsert(self, onu: Dict[str, Any]) -> bool:
+        old = self._onus.get(onu["id"])
+        self._onus[onu["id"]] = onu
+        if old is not None and all(old[f] == onu[f] for f in INDEXED_FIELDS):
+            if old["last_seen"] == onu["last_seen"]:
+                return False
+            self._touch_olt(self._olts[onu["olt_id"]], onu)
+            return True
+        if old is not None:
+            self._contribute(old, -1)
+        self._contribute(onu, 1)
+        return True
+
+    def _remove(self, onu_id: str) -> None:
+        old = self._onus.pop(onu_id, None)
+        if old is not None:
+            self._contribute(old, -1)
+
+    def apply_onus(self, onus: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Sincroniza o índice com o conjunto completo de ONUs
+
+        Args:
+            onus: ONUs transformadas indexadas por id
+
+        Returns:
+            Quantidade de ONUs adicionadas, alteradas ou removidas
+        """
+        with observe_transform("onu_index"):
+            changed = sum(1 for onu in onus.values() if self._upsert(onu))
+            removed = self._onus.keys() - onus.keys()
+            for onu_id in removed:
+                self._remove(onu_id)
+        if changed or removed:
+            self.version += 1
+        self._last_refresh = time.monotonic()
+        return changed + len(removed)
+
+    def transform_devices(self, raw_devices: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Transforma dispositivos raw em ONUs, reaproveitando as que não mudaram
+
+        Uma ONU só é transformada de novo quando há inform novo ou quando o status
+        calculado mudou (ex: ficou offline por falta de inform).
+        """
+        onus = {}
+        with observe_transform("onu_batch"):
+            for device_data in raw_devices:
+                current = self._onus.get(device_data.get("_id"))
+                last_inform = device_data.get("_lastInform")
+                if (current is not None
+                        and current["_genieacs_metadata"]["last_inform_raw"] == last_inform
+                        and current["status"] == determine_device_status(last_inform)):
+                    onus[current["id"]] = current
+                    continue
+                onu = transform_genieacs_to_onu(device_data, self.onu_mapping)
+                if onu:
+                    onus[onu["id"]] = onu
+        return onus
+
+    # Fontes
+
+    async def record_cycle(self, cycle: Dict[str, Any]) -> None:
+        """
+        Listener do sync de inventário (executado pelo líder): atualiza o índice e
+        publica as ONUs para os demais workers
+        """
+        onus = self.transform_devices(cycle["raw_devices"])
+        changed = self.apply_onus(onus)
+        if changed:
+            logger.info(f"📡 Inventário de ONUs: {changed} mudanças, {len(onus)} ONUs em {len(self._olts)} OLTs")
+        if self.shared_cache is not None:
+            try:
+                await self.shared_cache.put_json(ONU_SNAPSHOT_NAME, onus,
+                                                 ttl=get_inventory_sync().max_snapshot_age)
+            except Exception as e:
+                logger.error(f"Erro ao publicar inventário de ONUs: {e}")
+
+    async def load_snapshot(self, name: str = ONU_SNAPSHOT_NAME) -> bool:
+        """
+        Carrega as ONUs publicadas pelo líder (startup e invalidação)
+
+        Returns:
+            True se um inventário foi carregado
+        """
+        if self.shared_cache is None:
+            return False
+        onus = await self.shared_cache.get_json(ONU_SNAPSHOT_NAME)
+        if not onus:
+            return False
+        self.apply_onus(onus)
+        return True
+
+    async def _poll(self) -> None:
+        client = await get_genieacs_client()
+        raw_devices = await client.get_devices(projection=ONU_PROJECTION, raise_errors=True)
+        self.apply_onus(self.transform_devices(raw_devices))
+
+    async def refresh(self) -> None:
+        """
+        Garante um índice atualizado antes de uma consulta
+
+        Com o sync ativo o índice é mantido pelo ciclo/invalidação; sem ele, o GenieACS
+        é consultado no máximo a cada `refresh_interval` segundos.
+
+        Raises:
+            Exception: Falha ao consultar o GenieACS sem nenhum dado carregado
+        """
+        if get_inventory_sync().get_snapshot() is not None and self._last_refresh is not None:
+            return
+
+        async with self._refresh_lock:
+            if self._last_refresh is not None and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return
+            try:
+                if not await self.load_snapshot():
+                    await self._poll()
+            except Exception as e:
+                if self._last_refresh is None:
+                    raise
+                logger.warning(f"⚠️ Falha ao atualizar ONUs, servindo as já carregadas: {e}")
+                mark_degraded("genieacs_unavailable", time.monotonic() - self._last_refresh)
+
+    async def start(self) -> None:
+        """Carrega o inventário publicado e acompanha as atualizações do líder"""
+        if self.shared_cache is not None:
+            self.shared_cache.on_invalidate(ONU_SNAPSHOT_NAME, self.load_snapshot)
+            try:
+                await self.load_snapshot()
+            except Exception as e:
+                logger.error(f"Erro ao carregar inventário de ONUs: {e}")
+
+    # Consulta
+
+    def records(self) -> Dict[str, Dict[str, Any]]:
+        """ONUs indexadas por id (somente leitura)"""
+        return self._onus
+
+    def olt_of(self, device_id: str) -> Optional[str]:
+        """OLT de um dispositivo (None se não é ONU ou a OLT é desconhecida)"""
+        onu = self._onus.get(device_id)
+        if onu is None or onu["olt_id"] == UNASSIGNED_OLT:
+            return None
+        return onu["olt_id"]
+
+    def scope_of(self, device_id: str) -> Optional[str]:
+        """Escopo de agregação de KPIs do dispositivo ("olt:<id>")"""
+        olt_id = self.olt_of(device_id)
+        return f"olt:{olt_id}" if olt_id else None
+
+    def query(self, olt_id: str = None, pon_port: str = None, status: str = None) -> List[Dict[str, Any]]:
+        """
+        Lista ONUs usando o índice OLT → porta
+
+        Args:
+            olt_id: Filtra por OLT
+            pon_port: Filtra por porta PON (só com olt_id)
+            status: Filtra por status ("online"/"offline")
+        """
+        if olt_id is None:
+            onus = self._onus.values()
+        else:
+            ports = self._olts.get(olt_id, {}).get("ports", {})
+            if pon_port is not None:
+                ports = {pon_port: ports[pon_port]} if pon_port in ports else {}
+            onus = [self._onus[i] for port in ports.values() for i in port["onus"]]
+        if status is not None:
+            onus = [o for o in onus if o["status"] == status]
+        return list(onus)
+
+    def olts(self) -> List[Dict[str, Any]]:
+        """OLTs conhecidas (catálogo + OLTs vistas nas ONUs) com contagem de ONUs ativas"""
+        olts = []
+        for olt_id in sorted(self.olt_catalog.keys() | self._olts.keys()):
+            entry = self._olts.get(olt_id, {"onus": 0, "online": 0, "last_seen": None, "ports": {}})
+            info = self.olt_catalog.get(olt_id, {})
+            olts.append({
+                "id": olt_id,
+                "serial_number": info.get("serial_number", olt_id),
+                "model": info.get("model", "Unknown"),
+                "status": "online" if entry["online"] else "offline",
+                "location": info.get("location", ""),
+                "pon_ports": info.get("pon_ports", len(entry["ports"])),
+                "active_onus": entry["online"],
+                "total_onus": entry["onus"],
+                "last_seen": self._olt_last_seen(olt_id),
+                "created_at": info.get("created_at") or self._olt_first_seen.get(olt_id, datetime.now().isoformat())
+            })
+        return olts
+
+    def pon_ports(self, olt_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Ocupação e estatísticas ópticas por porta PON de uma OLT
+
+        Returns:
+            Lista por porta ou None se a OLT não é conhecida
+        """
+        entry = self._olts.get(olt_id)
+        if entry is None:
+            return [] if olt_id in self.olt_catalog else None
+        ports = []
+        for pon_port, port in sorted(entry["ports"].items()):
+            total = len(port["onus"])
+            ports.append({
+                "pon_port": pon_port,
+                "onus": total,
+                "online": port["online"],
+                "offline": total - port["online"],
+                "occupancy_percent": round(100 * total / self.port_capacity, 1),
+                "avg_rx_power": round(port["rx_sum"] / port["rx_count"], 2) if port["rx_count"] else None,
+                "low_rx_onus": port["low_rx"]
+            })
+        return ports
+
+
+# Singleton global para reutilização
+_onu_inventory: Optional[OnuInventory] = None
+
+def get_onu_inventory() -> OnuInventory:
+    """
+    Retorna uma instância singleton do inventário de ONUs
+    """
+    global _onu_inventory
+    if _onu_inventory is None:
+        _onu_inventory = OnuInventory(shared_cache=get_shared_cache())
+    return _onu_inventory
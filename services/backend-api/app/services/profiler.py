@@ -0,0 +1,114 @@
+"""
+Sampling Profiler
+Amostragem das pilhas do processo em execução, sem dependências externas,
+com saída no formato "collapsed" (flamegraph.pl, speedscope, inferno)
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+MAX_PROFILE_SECONDS = 60
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> str:
+    """
+    Converte uma pilha em uma linha "raiz;...;folha"
+    """
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def format_collapsed(samples: Dict[str, int]) -> str:
+    """
+    Formata as amostras como "pilha contagem" por linha
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(samples.items()))
+
+
+class SamplingProfiler:
+    """
+    Amostra periodicamente as pilhas das threads do processo a partir de uma thread
+    auxiliar; o event loop continua atendendo requisições durante o perfil
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, seconds: float, interval: float, thread_ids: Optional[Iterable[int]] = None) -> Dict[str, int]:
+        """
+        Coleta amostras de forma bloqueante (executado fora do event loop)
+
+        Args:
+            seconds: Duração do perfil
+            interval: Intervalo entre amostras em segundos
+            thread_ids: Threads amostradas (None = todas exceto a do profiler)
+
+        Returns:
+            Contagem de amostras por pilha colapsada
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Já existe um perfil em execução")
+        try:
+            own_id = threading.get_ident()
+            targets = set(thread_ids) if thread_ids is not None else None
+            names = {t.ident: t.name for t in threading.enumerate()}
+            samples: Counter = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id or (targets is not None and thread_id not in targets):
+                        continue
+                    thread_name = names.get(thread_id, str(thread_id))
+                    samples[f"{thread_name};{collapse_stack(frame)}"] += 1
+                time.sleep(interval)
+            return dict(samples)
+        finally:
+            self._lock.release()
+
+    async def profile(self, seconds: float, interval: float = 0.005, all_threads: bool = False) -> str:
+        """
+        Perfila o processo por alguns segundos
+
+        Args:
+            seconds: Duração do perfil (limitada a MAX_PROFILE_SECONDS)
+            interval: Intervalo entre amostras em segundos
+            all_threads: Se False, amostra apenas a thread do event loop
+
+        Returns:
+            Perfil no formato collapsed
+        """
+        seconds = min(seconds, MAX_PROFILE_SECONDS)
+        thread_ids = None if all_threads else [threading.get_ident()]
+        samples = await asyncio.to_thread(self.sample, seconds, interval, thread_ids)
+        return format_collapsed(samples)
+
+
+# Singleton global para reutilização
+_profiler: Optional[SamplingProfiler] = None
+
+def get_profiler() -> SamplingProfiler:
+    """
+    Retorna uma instância singleton do profiler
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler()
+    return _profiler
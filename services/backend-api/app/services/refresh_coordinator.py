@@ -0,0 +1,171 @@
+"""
+Refresh Coordinator
+Deduplicação de refresh/summon por dispositivo: pedidos repetidos entram no refresh
+em andamento ou reaproveitam um refresh recente em vez de enfileirar novas tasks
+refreshObject no CPE
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.services.metrics import REFRESH_REQUESTS
+from app.services.shared_cache import SharedCache, get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Tipos de refresh
+REFRESH_SUMMON = "summon"
+REFRESH_WIFI_PASSWORDS = "wifi_passwords"
+REFRESH_IP_PARAMETERS = "ip_parameters"
+
+# Refreshes que satisfazem cada tipo: o summon (refresh da raiz) atualiza tudo
+COVERED_BY = {
+    REFRESH_SUMMON: (REFRESH_SUMMON,),
+    REFRESH_WIFI_PASSWORDS: (REFRESH_WIFI_PASSWORDS, REFRESH_SUMMON),
+    REFRESH_IP_PARAMETERS: (REFRESH_IP_PARAMETERS, REFRESH_SUMMON),
+}
+
+# Como o pedido foi atendido
+RESULT_ISSUED = "issued"
+RESULT_JOINED = "joined"
+RESULT_RECENT = "recent"
+
+
+class RefreshOutcome:
+    """Resultado de um pedido de refresh"""
+
+    def __init__(self, kind: str, result: str, success: bool, requested_at: float):
+        self.kind = kind
+        self.result = result
+        self.success = success
+        # Instante (epoch) em que a task de refresh foi enviada ao GenieACS
+        self.requested_at = requested_at
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.requested_at)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "status": self.result,
+            "requested_at": datetime.fromtimestamp(self.requested_at).isoformat(),
+            "age_seconds": round(self.age, 1)
+        }
+
+
+class RefreshCoordinator:
+    """
+    Um refresh por dispositivo e tipo de cada vez, com cooldown
+
+    - Refresh equivalente em andamento: o pedido aguarda o mesmo resultado.
+    - Refresh equivalente bem-sucedido há menos de `cooldown` segundos: o pedido é
+      atendido sem nova task (o refresh recente é registrado também no cache
+      compartilhado, então vale para todos os workers).
+    - Falhas não entram no cooldown: o próximo pedido tenta de novo.
+    """
+
+    def __init__(self, cooldown: float = None, shared_cache: SharedCache = None):
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv("REFRESH_COOLDOWN", "30"))
+        self.shared_cache = shared_cache
+        self._in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._recent: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+    async def refresh(self, device_id: str, kind: str,
+                      request: Callable[[], Awaitable[bool]]) -> RefreshOutcome:
+        """
+        Executa (ou reaproveita) um refresh do dispositivo
+
+        Args:
+            device_id: ID do dispositivo
+            kind: REFRESH_SUMMON, REFRESH_WIFI_PASSWORDS ou REFRESH_IP_PARAMETERS
+            request: Função que envia as tasks ao GenieACS (ex: client.summon_device)
+
+        Returns:
+            RefreshOutcome (success=False se o refresh enviado falhou)
+
+        Raises:
+            AdmissionRejected: Propagado do controle de admissão a todos que aguardam
+        """
+        recent = await self._recent_refresh(device_id, kind)
+        if recent is not None:
+            REFRESH_REQUESTS.labels(kind, RESULT_RECENT).inc()
+            logger.info(f"♻️ Refresh {kind} de {device_id} reaproveitado ({time.time() - recent:.0f}s atrás)")
+            return RefreshOutcome(kind, RESULT_RECENT, True, recent)
+
+        for covering in COVERED_BY[kind]:
+            task = self._in_flight.get((device_id, covering))
+            if task is not None:
+                REFRESH_REQUESTS.labels(kind, RESULT_JOINED).inc()
+                logger.info(f"🔗 Refresh {kind} de {device_id} aguardando {covering} em andamento")
+                success, requested_at = await asyncio.shield(task)
+                return RefreshOutcome(kind, RESULT_JOINED, success, requested_at)
+
+        key = (device_id, kind)
+        task = asyncio.create_task(self._run(device_id, kind, request))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        REFRESH_REQUESTS.labels(kind, RESULT_ISSUED).inc()
+
+        # shield: quem desiste de esperar não cancela o refresh dos demais
+        success, requested_at = await asyncio.shield(task)
+        return RefreshOutcome(kind, RESULT_ISSUED, success, requested_at)
+
+    async def _run(self, device_id: str, kind: str,
+                   request: Callable[[], Awaitable[bool]]) -> Tuple[bool, float]:
+        requested_at = time.time()
+        success = await request()
+        if success:
+            self._remember(device_id, kind, requested_at)
+            if self.shared_cache is not None:
+                try:
+                    await self.shared_cache.put_json(f"refresh:{kind}:{device_id}", requested_at, ttl=self.cooldown)
+                except Exception as e:
+                    logger.error(f"Erro ao registrar refresh {kind} de {device_id}: {e}")
+        return success, requested_at
+
+    def _remember(self, device_id: str, kind: str, requested_at: float) -> None:
+        key = (device_id, kind)
+        self._recent[key] = requested_at
+        self._recent.move_to_end(key)
+        # Descarta os registros mais antigos que já saíram do cooldown
+        while self._recent:
+            oldest = next(iter(self._recent.values()))
+            if requested_at - oldest < self.cooldown:
+                break
+            self._recent.popitem(last=False)
+
+    async def _recent_refresh(self, device_id: str, kind: str) -> Optional[float]:
+        """
+        Instante do refresh bem-sucedido mais recente que satisfaz o tipo, se ainda em cooldown
+        """
+        now = time.time()
+        latest = None
+        for covering in COVERED_BY[kind]:
+            requested_at = self._recent.get((device_id, covering))
+            if requested_at is None and self.shared_cache is not None:
+                try:
+                    requested_at = await self.shared_cache.get_json(f"refresh:{covering}:{device_id}")
+                except Exception as e:
+                    logger.error(f"Erro ao consultar refresh {covering} de {device_id}: {e}")
+            if requested_at is not None and now - requested_at < self.cooldown:
+                latest = max(latest or 0.0, requested_at)
+        return latest
+
+
+# Singleton global para reutilização
+_refresh_coordinator: Optional[RefreshCoordinator] = None
+
+def get_refresh_coordinator() -> RefreshCoordinator:
+    """
+    Retorna uma instância singleton do coordenador de refresh
+    """
+    global _refresh_coordinator
+    if _refresh_coordinator is None:
+        _refresh_coordinator = RefreshCoordinator(shared_cache=get_shared_cache())
+    return _refresh_coordinator
@@ -0,0 +1,135 @@
+"""
+Resilience
+Circuit breaker para o GenieACS, orçamento de tempo (deadline) por requisição da API
+e backoff com jitter para retentativas de leituras idempotentes
+"""
+
+import contextvars
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import httpx
+
+from app.services.metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+# Instante (time.monotonic) em que a requisição atual da API deve ter respondido
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """Chamada recusada sem contato com o GenieACS porque o circuito está aberto"""
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """O orçamento de tempo da requisição acabou antes da chamada ao GenieACS"""
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Define o orçamento de tempo das chamadas feitas dentro do bloco
+
+    Args:
+        seconds: Tempo disponível (None = sem deadline, ex: tarefas em background)
+    """
+    token = _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def deadline_remaining() -> Optional[float]:
+    """
+    Tempo restante do orçamento da requisição atual
+
+    Returns:
+        Segundos restantes (pode ser negativo) ou None se não houver deadline
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def backoff_delay(attempt: int, base: float = 0.1, cap: float = 2.0) -> float:
+    """
+    Atraso da retentativa com "full jitter" (uniforme entre 0 e o exponencial)
+
+    Args:
+        attempt: Número da tentativa que falhou (0 = primeira)
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de três estados
+
+    Fechado: chamadas passam; `failure_threshold` falhas consecutivas abrem o circuito.
+    Aberto: chamadas falham imediatamente por `reset_timeout` segundos.
+    Meio-aberto: uma única chamada de prova passa; sucesso fecha, falha reabre.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv("GENIEACS_CIRCUIT_FAILURES", "5"))
+        self.reset_timeout = reset_timeout or float(os.getenv("GENIEACS_CIRCUIT_RESET_TIMEOUT", "30"))
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        CIRCUIT_STATE.labels(name).set(_STATE_VALUES[self.state])
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning(f"⚡ Circuito {self.name}: {self.state} -> {state}")
+        self.state = state
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(self.name, state).inc()
+
+    def before_call(self) -> None:
+        """
+        Verifica se a chamada pode ser feita
+
+        Raises:
+            CircuitOpenError: Circuito aberto ou prova de recuperação já em andamento
+        """
+        if self.state == CIRCUIT_OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuito {self.name} aberto: GenieACS indisponível")
+            self._transition(CIRCUIT_HALF_OPEN)
+
+        if self.state == CIRCUIT_HALF_OPEN:
+            if self._probe_in_flight:
+                raise CircuitOpenError(f"Circuito {self.name} em recuperação: aguardando a chamada de prova")
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self._probe_in_flight = False
+        self.failures = 0
+        self._transition(CIRCUIT_CLOSED)
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._transition(CIRCUIT_OPEN)
+
+    def release(self) -> None:
+        """Encerra uma chamada sem veredito sobre a saúde do GenieACS"""
+        self._probe_in_flight = False
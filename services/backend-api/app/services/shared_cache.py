@@ -0,0 +1,410 @@
+"""
+Shared Cache
+Cache compartilhado entre workers do uvicorn (Redis ou stand-in em memória)
+com chaves versionadas, invalidação via pub/sub e eleição de líder
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "invalidate"
+MAX_LOCAL_ENTRIES = 10000
+
+# Renova o lock apenas se ele ainda pertencer a este worker
+_EXTEND_IF_OWNER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+else
+    return 0
+end
+"""
+
+
+class InMemoryCacheBackend:
+    """Stand-in em memória com a mesma semântica do backend Redis (um único processo)"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._hashes: Dict[str, Tuple[Dict[str, str], Optional[float]]] = {}
+        self._listeners: List[Tuple[List[str], asyncio.Queue]] = []
+
+    def _alive(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._alive(key)
+
+    async def set(self, key: str, value: str, ttl_ms: int = None) -> None:
+        expires_at = time.monotonic() + ttl_ms / 1000 if ttl_ms else None
+        self._data[key] = (value, expires_at)
+
+    async def set_nx(self, key: str, value: str, ttl_ms: int = None) -> bool:
+        if self._alive(key) is not None:
+            return False
+        await self.set(key, value, ttl_ms)
+        return True
+
+    async def extend_if_owner(self, key: str, value: str, ttl_ms: int) -> bool:
+        if self._alive(key) != value:
+            return False
+        await self.set(key, value, ttl_ms)
+        return True
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        value = int(self._alive(key) or 0) + 1
+        self._data[key] = (str(value), self._data.get(key, (None, None))[1])
+        return value
+
+    def _hash(self, key: str) -> Dict[str, str]:
+        entry = self._hashes.get(key)
+        if entry is None:
+            return {}
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._hashes[key]
+            return {}
+        return entry[0]
+
+    async def hset(self, key: str, mapping: Dict[str, str], ttl_ms: int = None) -> None:
+        fields = {**self._hash(key), **mapping}
+        self._hashes[key] = (fields, time.monotonic() + ttl_ms / 1000 if ttl_ms else None)
+
+    async def hdel(self, key: str, fields: List[str]) -> None:
+        current = self._hash(key)
+        for field in fields:
+            current.pop(field, None)
+
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        return dict(self._hash(key))
+
+    async def publish(self, channel: str, message: str) -> None:
+        for channels, queue in self._listeners:
+            if channel in channels:
+                queue.put_nowait((channel, message))
+
+    async def listen(self, channels: List[str]) -> AsyncIterator[Tuple[str, str]]:
+        queue: asyncio.Queue = asyncio.Queue()
+        listener = (channels, queue)
+        self._listeners.append(listener)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._listeners.remove(listener)
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisCacheBackend:
+    """Backend Redis compartilhado por todos os workers"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis_asyncio
+
+        self.redis = redis_asyncio.from_url(url, decode_responses=True)
+        self._extend_script = self.redis.register_script(_EXTEND_IF_OWNER_SCRIPT)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.redis.get(key)
+
+    async def set(self, key: str, value: str, ttl_ms: int = None) -> None:
+        await self.redis.set(key, value, px=ttl_ms)
+
+    async def set_nx(self, key: str, value: str, ttl_ms: int = None) -> bool:
+        return bool(await self.redis.set(key, value, px=ttl_ms, nx=True))
+
+    async def extend_if_owner(self, key: str, value: str, ttl_ms: int) -> bool:
+        return bool(await self._extend_script(keys=[key], args=[value, ttl_ms]))
+
+    async def delete(self, key: str) -> None:
+        await self.redis.delete(key)
+
+    async def incr(self, key: str) -> int:
+        return await self.redis.incr(key)
+
+    async def hset(self, key: str, mapping: Dict[str, str], ttl_ms: int = None) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=mapping)
+            if ttl_ms:
+                pipe.pexpire(key, ttl_ms)
+            await pipe.execute()
+
+    async def hdel(self, key: str, fields: List[str]) -> None:
+        await self.redis.hdel(key, *fields)
+
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        return await self.redis.hgetall(key)
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self.redis.publish(channel, message)
+
+    async def listen(self, channels: List[str]) -> AsyncIterator[Tuple[str, str]]:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(*channels)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    yield message["channel"], message["data"]
+        finally:
+            await pubsub.unsubscribe(*channels)
+            await pubsub.aclose()
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+class SharedCache:
+    """
+    Cache de documentos JSON com chaves versionadas
+
+    Cada nome (ex: "inventory", "device:<id>") tem um contador de versão; o valor fica em
+    "<nome>:v<versão>". Escritas incrementam a versão e publicam uma invalidação, então
+    leitores nunca misturam versões e o cache local (L1) de cada worker é descartado via pub/sub.
+    """
+
+    def __init__(self, backend, namespace: str = "rjchronos", local_ttl: float = None):
+        self.backend = backend
+        self.namespace = namespace
+        self.instance_id = uuid.uuid4().hex
+        self.local_ttl = local_ttl if local_ttl is not None else float(os.getenv("SHARED_CACHE_LOCAL_TTL", "5"))
+        self._local: Dict[str, Tuple[float, Any]] = {}
+        self._invalidation_handlers: List[Tuple[str, Callable[[str], Awaitable[None]]]] = []
+        self._channel_handlers: Dict[str, List[Callable[[Any], Awaitable[None]]]] = {}
+        self._listener_task: Optional[asyncio.Task] = None
+
+    def key(self, *parts: Any) -> str:
+        return ":".join([self.namespace, *[str(p) for p in parts]])
+
+    async def get_json(self, name: str) -> Any:
+        """
+        Lê um documento pelo nome (L1 local primeiro, depois backend)
+
+        Returns:
+            Documento decodificado ou None se ausente/expirado
+        """
+        local = self._local.get(name)
+        if local and local[0] > time.monotonic():
+            record_cache("shared_local", True)
+            return local[1]
+
+        version = await self.backend.get(self.key(name, "version"))
+        raw = await self.backend.get(self.key(name, f"v{version}")) if version else None
+        record_cache("shared_local", False)
+        record_cache("shared", raw is not None)
+        if raw is None:
+            return None
+
+        value = json.loads(raw)
+        self._store_local(name, value)
+        return value
+
+    async def put_json(self, name: str, value: Any, ttl: float = None) -> int:
+        """
+        Grava uma nova versão do documento e invalida os demais workers
+
+        Args:
+            name: Nome lógico do documento
+            value: Valor serializável em JSON
+            ttl: Tempo de vida em segundos (None = sem expiração)
+
+        Returns:
+            Nova versão do documento
+        """
+        ttl_ms = int(ttl * 1000) if ttl else None
+        version = await self.backend.incr(self.key(name, "version"))
+        await self.backend.set(self.key(name, f"v{version}"), json.dumps(value, default=str), ttl_ms)
+        self._store_local(name, value)
+        await self._publish_invalidation(name, version)
+        return version
+
+    async def get_hash(self, name: str) -> Dict[str, Any]:
+        """
+        Lê todos os campos de um hash (sem cache local: usado em startup e invalidação)
+
+        Returns:
+            {campo: valor decodificado}, vazio se ausente/expirado
+        """
+        raw = await self.backend.hgetall(self.key(name, "hash"))
+        return {field: json.loads(value) for field, value in raw.items()}
+
+    async def set_hash_fields(self, name: str, fields: Dict[str, Any], ttl: float = None) -> None:
+        """
+        Grava campos de um hash e invalida os demais workers
+
+        Diferente de put_json, cada campo é escrito de forma atômica no backend
+        (HSET), sem reler e regravar o documento: escritas concorrentes de workers
+        diferentes em campos distintos não se sobrescrevem.
+
+        Args:
+            name: Nome lógico do hash
+            fields: {campo: valor serializável em JSON}
+            ttl: Tempo de vida do hash inteiro em segundos, renovado a cada escrita
+        """
+        ttl_ms = int(ttl * 1000) if ttl else None
+        mapping = {field: json.dumps(value, default=str) for field, value in fields.items()}
+        await self.backend.hset(self.key(name, "hash"), mapping, ttl_ms)
+        await self._publish_invalidation(name, None)
+
+    async def delete_hash_fields(self, name: str, fields: List[str]) -> None:
+        """Remove campos de um hash (HDEL) e invalida os demais workers"""
+        await self.backend.hdel(self.key(name, "hash"), list(fields))
+        await self._publish_invalidation(name, None)
+
+    def _store_local(self, name: str, value: Any) -> None:
+        now = time.monotonic()
+        if len(self._local) >= MAX_LOCAL_ENTRIES:
+            self._local = {k: v for k, v in self._local.items() if v[0] > now}
+        self._local[name] = (now + self.local_ttl, value)
+
+    async def invalidate(self, name: str) -> None:
+        """Descarta o documento em todos os workers"""
+        self._local.pop(name, None)
+        version = await self.backend.incr(self.key(name, "version"))
+        await self._publish_invalidation(name, version)
+
+    async def _publish_invalidation(self, name: str, version: Optional[int]) -> None:
+        message = json.dumps({"name": name, "version": version, "origin": self.instance_id})
+        await self.backend.publish(self.key(INVALIDATION_CHANNEL), message)
+
+    async def publish(self, channel: str, payload: Any) -> None:
+        """Publica uma mensagem JSON num canal do namespace"""
+        message = json.dumps({"origin": self.instance_id, "payload": payload}, default=str)
+        await self.backend.publish(self.key(channel), message)
+
+    def on_invalidate(self, prefix: str, handler: Callable[[str], Awaitable[None]]) -> None:
+        """Registra um handler para invalidações vindas de outros workers"""
+        self._invalidation_handlers.append((prefix, handler))
+
+    def on_message(self, channel: str, handler: Callable[[Any], Awaitable[None]]) -> None:
+        """Registra um handler para mensagens de outros workers num canal"""
+        self._channel_handlers.setdefault(channel, []).append(handler)
+
+    async def start(self) -> None:
+        """
+        Inicia a escuta de invalidações e canais em background
+        (os handlers de on_message devem ser registrados antes)
+        """
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        invalidation_channel = self.key(INVALIDATION_CHANNEL)
+        channels = [invalidation_channel] + [self.key(c) for c in self._channel_handlers]
+        while True:
+            try:
+                async for channel, raw in self.backend.listen(channels):
+                    message = json.loads(raw)
+                    if message.get("origin") == self.instance_id:
+                        continue
+                    if channel == invalidation_channel:
+                        await self._handle_invalidation(message["name"])
+                    else:
+                        for handler in self._channel_handlers.get(channel[len(self.namespace) + 1:], []):
+                            await handler(message["payload"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro na escuta do pub/sub do cache compartilhado: {e}")
+                await asyncio.sleep(1)
+
+    async def _handle_invalidation(self, name: str) -> None:
+        self._local.pop(name, None)
+        for prefix, handler in self._invalidation_handlers:
+            if name.startswith(prefix):
+                try:
+                    await handler(name)
+                except Exception as e:
+                    logger.error(f"Erro no handler de invalidação {name}: {e}")
+
+    async def close(self) -> None:
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        await self.backend.close()
+
+
+class LeaderElection:
+    """Eleição de líder via lock com expiração (SET NX PX + renovação pelo dono)"""
+
+    def __init__(self, cache: SharedCache, name: str, ttl: float):
+        self.cache = cache
+        self.key = cache.key("leader", name)
+        self.ttl_ms = int(ttl * 1000)
+        self.is_leader = False
+
+    async def ensure(self) -> bool:
+        """
+        Adquire ou renova a liderança
+
+        Returns:
+            True se este worker é o líder
+        """
+        backend = self.cache.backend
+        try:
+            if self.is_leader:
+                self.is_leader = await backend.extend_if_owner(self.key, self.cache.instance_id, self.ttl_ms)
+            if not self.is_leader:
+                self.is_leader = await backend.set_nx(self.key, self.cache.instance_id, self.ttl_ms)
+                if self.is_leader:
+                    logger.info(f"👑 Worker {self.cache.instance_id[:8]} assumiu a liderança de {self.key}")
+        except Exception as e:
+            logger.error(f"Erro na eleição de líder {self.key}: {e}")
+            self.is_leader = False
+        return self.is_leader
+
+    async def release(self) -> None:
+        if self.is_leader:
+            if await self.cache.backend.get(self.key) == self.cache.instance_id:
+                await self.cache.backend.delete(self.key)
+            self.is_leader = False
+
+
+def create_shared_cache() -> SharedCache:
+    """
+    Cria o cache compartilhado a partir de SHARED_CACHE_BACKEND/REDIS_URL
+
+    Returns:
+        SharedCache com backend Redis (se configurado) ou em memória
+    """
+    backend_name = os.getenv("SHARED_CACHE_BACKEND", "redis" if os.getenv("REDIS_URL") else "memory").lower()
+    if backend_name == "redis":
+        redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
+        logger.info(f"🗄️ Cache compartilhado usando Redis em {redis_url}")
+        return SharedCache(RedisCacheBackend(redis_url))
+    return SharedCache(InMemoryCacheBackend())
+
+
+# Singleton global para reutilização
+_shared_cache: Optional[SharedCache] = None
+
+def get_shared_cache() -> SharedCache:
+    """
+    Retorna uma instância singleton do cache compartilhado
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = create_shared_cache()
+    return _shared_cache
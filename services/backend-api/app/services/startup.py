@@ -0,0 +1,103 @@
+"""
+Startup Warm-up
+Aquecimento do worker após o deploy (pool de conexões do GenieACS e primeiro
+snapshot do inventário) e estado de prontidão exposto em /health/ready
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupWarmup:
+    """
+    Executa os passos de aquecimento em background e registra o resultado de cada um
+
+    O worker só se declara pronto depois que todos os passos terminam ou o tempo
+    limite estoura; um passo que falha (ex: GenieACS fora no deploy) não impede a
+    prontidão, já que as rotas têm fallback, mas fica registrado no status.
+    """
+
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout or float(os.getenv("STARTUP_WARMUP_TIMEOUT", "20"))
+        self.ready = False
+        self.draining = False
+        self.checks: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _check(self, name: str, step: Awaitable[Any]) -> None:
+        start = time.perf_counter()
+        self.checks[name] = {"ok": None}
+        try:
+            detail = await step
+            self.checks[name] = {"ok": True, "detail": detail}
+        except asyncio.CancelledError:
+            self.checks[name] = {"ok": False, "error": "tempo limite do aquecimento excedido"}
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Aquecimento '{name}' falhou: {e}")
+            self.checks[name] = {"ok": False, "error": str(e)}
+        finally:
+            self.checks[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def _run(self, steps: Dict[str, Awaitable[Any]]) -> None:
+        self.started_at = datetime.now()
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*[self._check(name, step) for name, step in steps.items()]),
+                self.timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Aquecimento incompleto após {self.timeout}s")
+        finally:
+            self.finished_at = datetime.now()
+            self.ready = True
+            elapsed = (self.finished_at - self.started_at).total_seconds()
+            logger.info(f"✅ Worker pronto (aquecimento em {elapsed:.1f}s)")
+
+    def start(self, steps: Dict[str, Awaitable[Any]]) -> None:
+        """
+        Inicia o aquecimento
+
+        Args:
+            steps: Passos por nome (ex: {"genieacs_pool": client.warm_up()})
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(steps))
+
+    async def stop(self) -> None:
+        """Marca o worker como indisponível (shutdown) e interrompe o aquecimento"""
+        self.draining = True
+        self.ready = False
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "draining": self.draining,
+            "checks": self.checks,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+# Singleton global para reutilização
+_startup_warmup: Optional[StartupWarmup] = None
+
+def get_startup_warmup() -> StartupWarmup:
+    """
+    Retorna uma instância singleton do aquecimento do worker
+    """
+    global _startup_warmup
+    if _startup_warmup is None:
+        _startup_warmup = StartupWarmup()
+    return _startup_warmup
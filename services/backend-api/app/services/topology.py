@@ -0,0 +1,324 @@
+"""
+Network Topology
+Grafo OLT → porta PON → ONU → CPE mantido de forma incremental a partir do inventário
+de ONUs, dos CPEs do sync e dos alertas ativos, com saúde agregada por nó e leitura
+por nível de detalhe (resumo das OLTs primeiro, subárvores sob demanda)
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.alert_store import get_alert_store
+from app.services.inventory_sync import get_inventory_sync
+from app.services.metrics import observe_transform
+from app.services.onu_inventory import get_onu_inventory
+
+logger = logging.getLogger(__name__)
+
+ROOT_ID = "network"
+
+# Tipos de nó
+NODE_NETWORK = "network"
+NODE_OLT = "olt"
+NODE_PON = "pon"
+NODE_ONU = "onu"
+NODE_CPE = "cpe"
+
+# Agregado de saúde: [dispositivos, online, alertas ativos, alertas críticos]
+Health = List[int]
+
+STATUS_RANK = {"critical": 2, "warning": 1, "ok": 0}
+
+
+def olt_node_id(olt_id: str) -> str:
+    return f"olt:{olt_id}"
+
+
+def pon_node_id(olt_id: str, pon_port: str) -> str:
+    return f"pon:{olt_id}:{pon_port}"
+
+
+def device_node_id(kind: str, device_id: str) -> str:
+    return f"{kind}:{device_id}"
+
+
+class TopologyGraph:
+    """
+    Árvore da rede com agregados de saúde por nó
+
+    Cada dispositivo (ONU ou CPE) tem a própria contribuição (1 dispositivo, online
+    ou não, alertas ativos); o agregado de um nó é a soma da subárvore. Uma mudança
+    em um dispositivo propaga só a diferença pelos ancestrais (no máximo 4 níveis),
+    e mover um dispositivo de porta move a subárvore inteira de uma vez. OLTs e
+    portas existem enquanto tiverem filhos.
+    """
+
+    def __init__(self, critical_ratio: float = None, warning_ratio: float = None):
+        self.critical_ratio = (
+            critical_ratio if critical_ratio is not None
+            else float(os.getenv("TOPOLOGY_CRITICAL_RATIO", "0.5"))
+        )
+        self.warning_ratio = (
+            warning_ratio if warning_ratio is not None
+            else float(os.getenv("TOPOLOGY_WARNING_RATIO", "0.9"))
+        )
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self._new_node(ROOT_ID, NODE_NETWORK, "Rede", None)
+
+        self._sources: Optional[Tuple[int, int]] = None
+        self._last_cpes: Optional[Dict[str, Any]] = None
+
+    # Estrutura
+
+    def _new_node(self, node_id: str, kind: str, label: str, parent: Optional[str]) -> Dict[str, Any]:
+        node = self.nodes[node_id] = {
+            "id": node_id,
+            "type": kind,
+            "label": label,
+            "parent": parent,
+            "children": set(),
+            "own": [0, 0, 0, 0],
+            "agg": [0, 0, 0, 0],
+            "attrs": {}
+        }
+        if parent is not None:
+            self.nodes[parent]["children"].add(node_id)
+        return node
+
+    def _propagate(self, node_id: Optional[str], delta: Health, sign: int = 1) -> None:
+        while node_id is not None:
+            node = self.nodes[node_id]
+            agg = node["agg"]
+            for i, value in enumerate(delta):
+                agg[i] += sign * value
+            node_id = node["parent"]
+
+    def _ensure_group(self, node_id: str, kind: str, label: str, parent: str) -> None:
+        if node_id not in self.nodes:
+            self._new_node(node_id, kind, label, parent)
+
+    def _detach(self, node_id: str) -> None:
+        node = self.nodes[node_id]
+        parent = node["parent"]
+        self._propagate(parent, node["agg"], -1)
+        self.nodes[parent]["children"].discard(node_id)
+        node["parent"] = None
+        self._prune(parent)
+
+    def _prune(self, node_id: str) -> None:
+        # OLTs e portas sem filhos deixam de existir
+        while node_id is not None and node_id != ROOT_ID:
+            node = self.nodes[node_id]
+            if node["children"] or node["type"] not in (NODE_OLT, NODE_PON):
+                return
+            parent = node["parent"]
+            self.nodes[parent]["children"].discard(node_id)
+            del self.nodes[node_id]
+            node_id = parent
+
+    def _upsert_device(self, node_id: str, kind: str, label: str, parent: str,
+                       own: Health, attrs: Dict[str, Any]) -> bool:
+        node = self.nodes.get(node_id)
+        changed = False
+        if node is None:
+            node = self._new_node(node_id, kind, label, parent)
+            changed = True
+        elif node["parent"] != parent:
+            self._detach(node_id)
+            node["parent"] = parent
+            self.nodes[parent]["children"].add(node_id)
+            self._propagate(parent, node["agg"])
+            changed = True
+
+        if node["own"] != own:
+            delta = [new - old for new, old in zip(own, node["own"])]
+            node["own"] = own
+            self._propagate(node_id, delta)
+            changed = True
+        node["label"] = label
+        node["attrs"] = attrs
+        return changed
+
+    def _remove_device(self, node_id: str) -> None:
+        node = self.nodes.get(node_id)
+        if node is None:
+            return
+        for child_id in list(node["children"]):
+            self._remove_device(child_id)
+        self._detach(node_id)
+        del self.nodes[node_id]
+
+    def apply(self, onus: Dict[str, Dict[str, Any]], cpes: Dict[str, Dict[str, Any]],
+              alert_counts: Dict[str, Tuple[int, int]]) -> int:
+        """
+        Sincroniza o grafo com o inventário atual
+
+        Args:
+            onus: ONUs indexadas por id (inventário de ONUs)
+            cpes: CPEs indexados por id (snapshot do sync)
+            alert_counts: {device_id: (alertas ativos, críticos)}
+
+        Returns:
+            Quantidade de dispositivos adicionados, alterados ou removidos
+        """
+        changed = 0
+        with observe_transform("topology_apply"):
+            wanted = set()
+            for onu in onus.values():
+                olt_id, pon_port = onu["olt_id"], onu["pon_port"]
+                olt_node, pon_node = olt_node_id(olt_id), pon_node_id(olt_id, pon_port)
+                self._ensure_group(olt_node, NODE_OLT, olt_id, ROOT_ID)
+                self._ensure_group(pon_node, NODE_PON, pon_port, olt_node)
+
+                alerts, critical = alert_counts.get(onu["id"], (0, 0))
+                node_id = device_node_id(NODE_ONU, onu["id"])
+                wanted.add(node_id)
+                # Todo dispositivo do GenieACS também está na lista de CPEs; a ONU faz
+                # papel de roteador do cliente quando tem WiFi
+                cpe = cpes.get(onu["id"])
+                wifi_ssid = cpe.get("wifi_ssid") if cpe else None
+                changed += self._upsert_device(
+                    node_id, NODE_ONU, onu["serial_number"], pon_node,
+                    [1, int(onu["status"] == "online"), alerts, critical],
+                    {
+                        "model": onu["model"],
+                        "status": onu["status"],
+                        "rx_power": onu["rx_power"],
+                        "integrated_cpe": wifi_ssid is not None,
+                        "wifi_ssid": wifi_ssid
+                    }
+                )
+
+            for cpe in cpes.values():
+                uplink = (cpe.get("_genieacs_metadata") or {}).get("uplink_onu_id")
+                parent = device_node_id(NODE_ONU, uplink) if uplink else None
+                if cpe["id"] in onus or parent not in wanted:
+                    continue
+                alerts, critical = alert_counts.get(cpe["id"], (0, 0))
+                node_id = device_node_id(NODE_CPE, cpe["id"])
+                wanted.add(node_id)
+                changed += self._upsert_device(
+                    node_id, NODE_CPE, cpe["serial_number"], parent,
+                    [1, int(cpe["status"] == "online"), alerts, critical],
+                    {
+                        "model": cpe["model"],
+                        "status": cpe["status"],
+                        "ip_address": cpe.get("ip_address"),
+                        "wifi_ssid": cpe.get("wifi_ssid")
+                    }
+                )
+
+            # CPEs antes das ONUs: a ONU removida já não tem filhos
+            stale = [n for n, node in self.nodes.items()
+                     if node["type"] in (NODE_ONU, NODE_CPE) and n not in wanted]
+            for node_id in sorted(stale, key=lambda n: self.nodes[n]["type"] != NODE_CPE):
+                self._remove_device(node_id)
+            changed += len(stale)
+        return changed
+
+    # Leitura
+
+    def _health(self, agg: Health) -> Dict[str, Any]:
+        devices, online, alerts, critical = agg
+        ratio = online / devices if devices else None
+        if critical or (ratio is not None and ratio < self.critical_ratio):
+            status = "critical"
+        elif alerts or (ratio is not None and ratio < self.warning_ratio):
+            status = "warning"
+        else:
+            status = "ok"
+        return {
+            "devices": devices,
+            "online": online,
+            "online_ratio": round(ratio, 4) if ratio is not None else None,
+            "alerts": alerts,
+            "critical_alerts": critical,
+            "status": status
+        }
+
+    def _severity_key(self, node_id: str) -> tuple:
+        # Nós com pior saúde primeiro
+        node = self.nodes[node_id]
+        health = self._health(node["agg"])
+        return (-STATUS_RANK[health["status"]], health["online_ratio"] or 0.0,
+                -health["alerts"], node["label"])
+
+    def render(self, node_id: str, depth: int = 1, limit: int = 200) -> Optional[Dict[str, Any]]:
+        """
+        Nó com a saúde agregada e filhos até a profundidade pedida
+
+        Args:
+            node_id: ID do nó ("network", "olt:<id>", "pon:<olt>:<porta>", "onu:<id>")
+            depth: Níveis de filhos incluídos (0 = só o nó)
+            limit: Máximo de filhos por nó (os de pior saúde primeiro)
+
+        Returns:
+            Nó serializado ou None se não existe
+        """
+        node = self.nodes.get(node_id)
+        if node is None:
+            return None
+        result = {
+            "id": node_id,
+            "type": node["type"],
+            "label": node["label"],
+            "parent": node["parent"],
+            "health": self._health(node["agg"]),
+            "children_count": len(node["children"]),
+            **node["attrs"]
+        }
+        if depth > 0 and node["children"]:
+            children = sorted(node["children"], key=self._severity_key)
+            result["children"] = [self.render(child, depth - 1, limit) for child in children[:limit]]
+            result["has_more"] = len(children) > limit
+        return result
+
+    # Fontes
+
+    async def refresh(self) -> None:
+        """
+        Atualiza o grafo se o inventário de ONUs, os CPEs ou os alertas mudaram
+
+        Raises:
+            Exception: Inventário de ONUs indisponível sem dados carregados
+        """
+        onu_inventory = get_onu_inventory()
+        alert_store = get_alert_store()
+        await onu_inventory.refresh()
+        try:
+            await alert_store.refresh()
+        except Exception as e:
+            logger.warning(f"⚠️ Topologia sem alertas atualizados: {e}")
+
+        snapshot = get_inventory_sync().get_snapshot(allow_stale=True)
+        cpes = snapshot["devices"] if snapshot is not None else {}
+        sources = (onu_inventory.version, alert_store.version)
+        if sources == self._sources and cpes is self._last_cpes:
+            return
+
+        changed = self.apply(onu_inventory.records(), cpes, alert_store.active_counts())
+        self._sources = sources
+        self._last_cpes = cpes
+        if changed:
+            logger.info(f"🗺️ Topologia: {changed} dispositivos atualizados, {len(self.nodes)} nós")
+
+    async def record_cycle(self, cycle: Dict[str, Any]) -> None:
+        """Listener do sync de inventário: mantém o grafo pronto após cada ciclo"""
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Erro ao atualizar topologia: {e}")
+
+
+# Singleton global para reutilização
+_topology: Optional[TopologyGraph] = None
+
+def get_topology() -> TopologyGraph:
+    """
+    Retorna uma instância singleton do grafo de topologia
+    """
+    global _topology
+    if _topology is None:
+        _topology = TopologyGraph()
+    return _topology
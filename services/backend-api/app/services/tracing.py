@@ -0,0 +1,159 @@
+"""
+Request Tracing
+Spans de tempo por requisição (chamadas ao GenieACS, transformações, serialização,
+esperas) expostos no header Server-Timing e em logs estruturados
+"""
+
+import contextvars
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Requisições mais lentas que isso são logadas em INFO; as demais em DEBUG
+SLOW_REQUEST_LOG_MS = float(os.getenv("SLOW_REQUEST_LOG_MS", "1000"))
+
+_current_trace: contextvars.ContextVar[Optional["RequestTrace"]] = contextvars.ContextVar(
+    "request_trace", default=None
+)
+
+
+class RequestTrace:
+    """Spans de uma requisição, agregados por nome (duração total e número de ocorrências)"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}
+        # Motivo e idade (segundos) quando a resposta foi servida de dados antigos
+        self.degraded: Optional[Dict[str, Any]] = None
+
+    def add(self, name: str, duration: float) -> None:
+        entry = self.spans.setdefault(name, [0.0, 0])
+        entry[0] += duration
+        entry[1] += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """
+        Valor do header Server-Timing (durações em ms)
+
+        Ex: genieacs.get_device_by_id;dur=12.4, sleep;dur=2001.2, total;dur=2020.8
+        """
+        parts = []
+        for name, (duration, count) in self.spans.items():
+            part = f"{name};dur={duration * 1000:.1f}"
+            if count > 1:
+                part += f';desc="{count}x"'
+            parts.append(part)
+        parts.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            name: {"ms": round(duration * 1000, 1), "count": count}
+            for name, (duration, count) in self.spans.items()
+        }
+
+
+def start_trace() -> contextvars.Token:
+    """
+    Abre o trace da requisição atual
+
+    Returns:
+        Token para end_trace
+    """
+    return _current_trace.set(RequestTrace())
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def end_trace(token: contextvars.Token) -> None:
+    _current_trace.reset(token)
+
+
+def record_span(name: str, duration: float) -> None:
+    """Registra um span já medido no trace atual (sem trace ativo, não faz nada)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, duration)
+
+
+def mark_degraded(reason: str, age: Optional[float] = None) -> None:
+    """
+    Marca a resposta da requisição atual como degradada (dados antigos ou mock)
+
+    Args:
+        reason: Motivo (ex: "genieacs_unavailable")
+        age: Idade dos dados em segundos, se conhecida
+    """
+    trace = _current_trace.get()
+    if trace is not None and trace.degraded is None:
+        trace.degraded = {"reason": reason, "age": age}
+
+
+def degraded_headers(trace: RequestTrace) -> Dict[str, str]:
+    """
+    Headers que sinalizam ao cliente uma resposta degradada
+    """
+    if trace.degraded is None:
+        return {}
+    headers = {
+        "X-Data-Stale": trace.degraded["reason"],
+        "Warning": '110 - "Response is Stale"'
+    }
+    if trace.degraded["age"] is not None:
+        headers["X-Data-Age"] = str(int(trace.degraded["age"]))
+    return headers
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Mede um trecho da requisição atual
+
+    Args:
+        name: Nome do span no Server-Timing (ex: "sleep", "genieacs.get_devices")
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def log_trace(trace: RequestTrace, method: str, route: str, status: int) -> None:
+    """
+    Emite uma linha JSON com o detalhamento de tempo da requisição
+    """
+    total_ms = trace.elapsed * 1000
+    level = logging.INFO if total_ms >= SLOW_REQUEST_LOG_MS else logging.DEBUG
+    if not logger.isEnabledFor(level):
+        return
+    logger.log(level, json.dumps({
+        "event": "request_timing",
+        "method": method,
+        "route": route,
+        "status": status,
+        "total_ms": round(total_ms, 1),
+        "degraded": trace.degraded,
+        "spans": trace.as_dict()
+    }))
+
+
+class TracedJSONResponse(JSONResponse):
+    """JSONResponse que registra a serialização como span"""
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return super().render(content)
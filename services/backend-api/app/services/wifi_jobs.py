@@ -0,0 +1,322 @@
+"""
+WiFi Jobs
+Fila de jobs de alteração de configuração WiFi executados por um pool de workers
+em background, com status consultável e evento de push ao concluir
+
+As alterações de um mesmo dispositivo são serializadas, e as que chegam dentro da
+janela de coalescência são mescladas em uma única task setParameterValues.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.services.admission import AdmissionRejected
+from app.services.event_stream import EventBroker, get_event_broker
+from app.services.genieacs_client import get_genieacs_client
+from app.services.genieacs_transformers import create_wifi_parameter_updates
+from app.services.shared_cache import SharedCache, get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Estados de um job
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+FINAL_STATUSES = {JOB_COMPLETED, JOB_FAILED}
+
+
+class QueueFullError(Exception):
+    """A fila de jobs atingiu o limite configurado"""
+
+
+class WiFiJob:
+    """Alteração de configuração WiFi de um dispositivo"""
+
+    def __init__(self, device_id: str, updates: Dict[str, Any], band: str, tasks: List[Dict[str, Any]]):
+        self.id = uuid.uuid4().hex
+        self.device_id = device_id
+        self.updates = updates
+        self.band = band
+        self.tasks = tasks
+        self.status = JOB_QUEUED
+        self.results: List[Dict[str, Any]] = []
+        self.coalesced_with: List[str] = []
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def parameter_values(self) -> List[List[Any]]:
+        return [
+            list(pair)
+            for task in self.tasks if task["name"] == "setParameterValues"
+            for pair in task["parameterValues"]
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        succeeded = sum(1 for r in self.results if r["success"])
+        return {
+            "id": self.id,
+            "device_id": self.device_id,
+            "band": self.band,
+            "status": self.status,
+            "applied_updates": self.updates,
+            "results": self.results,
+            "tasks_executed": succeeded,
+            "total_tasks": len(self.parameter_values),
+            "coalesced_with": self.coalesced_with,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+def merge_parameter_values(jobs: List[WiFiJob]) -> List[List[Any]]:
+    """
+    Mescla os parâmetros de jobs do mesmo dispositivo (o valor mais recente prevalece)
+
+    Args:
+        jobs: Jobs em ordem de chegada
+
+    Returns:
+        Lista de [parâmetro, valor] sem parâmetros repetidos
+    """
+    merged: Dict[str, Any] = {}
+    for job in jobs:
+        for parameter, value in job.parameter_values:
+            merged.pop(parameter, None)
+            merged[parameter] = value
+    return [[parameter, value] for parameter, value in merged.items()]
+
+
+class WiFiJobQueue:
+    """
+    Pool de workers que executa os jobs WiFi fora do ciclo da requisição HTTP
+
+    Cada dispositivo tem no máximo um lote pendente: jobs que chegam antes do lote
+    começar a executar (janela de coalescência + espera pelo lote anterior do mesmo
+    dispositivo) entram nele e são aplicados juntos em uma sessão CWMP.
+
+    O status de cada job fica em memória no worker que o executa e é replicado no
+    cache compartilhado, então qualquer worker do uvicorn responde a consulta.
+    """
+
+    def __init__(self, workers: int = None, max_queue: int = None, retention: int = None,
+                 coalesce_window: float = None, shared_cache: SharedCache = None,
+                 event_broker: EventBroker = None):
+        self.workers = workers or int(os.getenv("WIFI_JOB_WORKERS", "4"))
+        self.max_queue = max_queue or int(os.getenv("WIFI_JOB_QUEUE_SIZE", "1000"))
+        self.retention = retention or int(os.getenv("WIFI_JOB_RETENTION", "3600"))
+        self.coalesce_window = (
+            coalesce_window if coalesce_window is not None
+            else float(os.getenv("WIFI_JOB_COALESCE_WINDOW", "1.0"))
+        )
+        self.shared_cache = shared_cache
+        self.event_broker = event_broker
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._pending: Dict[str, List[WiFiJob]] = {}
+        self._device_locks: Dict[str, List[Any]] = {}
+        self._jobs: "OrderedDict[str, WiFiJob]" = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def pending(self) -> int:
+        return sum(len(jobs) for jobs in self._pending.values())
+
+    async def submit(self, device_id: str, updates: Dict[str, Any], band: str = "2.4GHz") -> WiFiJob:
+        """
+        Enfileira uma alteração de configuração WiFi
+
+        Args:
+            device_id: ID do dispositivo
+            updates: Campos alterados (sem valores None)
+            band: Banda WiFi ("2.4GHz" ou "5GHz")
+
+        Returns:
+            Job criado
+
+        Raises:
+            ValueError: Se nenhuma task válida for gerada
+            QueueFullError: Se a fila estiver cheia
+        """
+        tasks = create_wifi_parameter_updates(device_id, updates, band)
+        if not tasks:
+            raise ValueError("Nenhuma task válida gerada")
+        if self.pending >= self.max_queue:
+            raise QueueFullError(f"Fila de jobs WiFi cheia ({self.max_queue})")
+
+        job = WiFiJob(device_id, updates, band, tasks)
+        batch = self._pending.get(device_id)
+        if batch is not None:
+            batch.append(job)
+            logger.info(f"🧩 Job WiFi {job.id} mesclado ao lote pendente de {device_id} ({len(batch)} jobs)")
+        else:
+            self._pending[device_id] = [job]
+            asyncio.get_running_loop().call_later(self.coalesce_window, self._queue.put_nowait, device_id)
+            logger.info(f"📥 Job WiFi {job.id} enfileirado para {device_id} ({len(job.parameter_values)} parâmetros)")
+
+        self._remember(job)
+        await self._store(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Status de um job (local ou executado por outro worker)
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.shared_cache is not None:
+            return await self.shared_cache.get_json(f"wifi-job:{job_id}")
+        return None
+
+    def _remember(self, job: WiFiJob) -> None:
+        self._jobs[job.id] = job
+        # Remove os jobs finalizados mais antigos que a retenção
+        now = datetime.now()
+        while self._jobs:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status not in FINAL_STATUSES or (now - oldest.created_at).total_seconds() < self.retention:
+                break
+            self._jobs.popitem(last=False)
+
+    async def _store(self, job: WiFiJob) -> None:
+        if self.shared_cache is None:
+            return
+        try:
+            await self.shared_cache.put_json(f"wifi-job:{job.id}", job.to_dict(), ttl=self.retention)
+        except Exception as e:
+            logger.error(f"Erro ao gravar status do job WiFi {job.id}: {e}")
+
+    async def _execute(self, device_id: str, jobs: List[WiFiJob]) -> None:
+        job_ids = [job.id for job in jobs]
+        for job in jobs:
+            job.status = JOB_RUNNING
+            job.started_at = datetime.now()
+            job.coalesced_with = [job_id for job_id in job_ids if job_id != job.id]
+            await self._store(job)
+
+        parameter_values = merge_parameter_values(jobs)
+        client = await get_genieacs_client()
+        error = "Falha ao aplicar configurações"
+        try:
+            success = await client.set_parameters(device_id, parameter_values)
+        except AdmissionRejected as e:
+            logger.warning(f"Lote WiFi de {device_id} descartado pelo controle de admissão: {e.detail}")
+            success = False
+            error = e.detail
+        except Exception as e:
+            logger.error(f"Erro ao aplicar lote WiFi de {device_id}: {e}")
+            success = False
+
+        # Parâmetro sobrescrito por um job posterior do mesmo lote
+        last_writer = {parameter: job.id for job in jobs for parameter, _ in job.parameter_values}
+        for job in jobs:
+            job.results = [
+                {
+                    "parameter": parameter,
+                    "value": value,
+                    "success": success,
+                    "superseded_by": last_writer[parameter] if last_writer[parameter] != job.id else None
+                }
+                for parameter, value in job.parameter_values
+            ]
+            job.status = JOB_COMPLETED if success else JOB_FAILED
+            if not success:
+                job.error = error
+
+    async def _finish(self, job: WiFiJob) -> None:
+        job.finished_at = datetime.now()
+        await self._store(job)
+        logger.info(f"🏁 Job WiFi {job.id} ({job.device_id}): {job.status}")
+
+        if self.event_broker is not None:
+            event_type = "wifi_job.failed" if job.status == JOB_FAILED else "wifi_job.completed"
+            try:
+                await self.event_broker.emit(event_type, job.to_dict())
+            except Exception as e:
+                logger.error(f"Erro ao publicar evento do job WiFi {job.id}: {e}")
+
+    @asynccontextmanager
+    async def device_lock(self, device_id: str) -> AsyncIterator[None]:
+        """
+        Exclusão mútua das escritas em um dispositivo (usado também pelo push em massa)
+
+        Args:
+            device_id: ID do dispositivo
+        """
+        # [lock, usuários]: o lock é descartado quando ninguém mais o usa ou aguarda
+        entry = self._device_locks.get(device_id)
+        if entry is None:
+            entry = self._device_locks[device_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._device_locks.pop(device_id, None)
+
+    async def _worker(self) -> None:
+        while True:
+            device_id = await self._queue.get()
+            jobs: List[WiFiJob] = []
+            try:
+                async with self.device_lock(device_id):
+                    # O lote só é retirado com o lock: jobs que chegam enquanto o lote
+                    # anterior do dispositivo executa ainda são mesclados
+                    jobs = self._pending.pop(device_id, [])
+                    if jobs:
+                        await self._execute(device_id, jobs)
+            except asyncio.CancelledError:
+                for job in jobs:
+                    job.status = JOB_FAILED
+                    job.error = "Interrompido no desligamento do servidor"
+                raise
+            except Exception as e:
+                logger.error(f"Erro no lote WiFi de {device_id}: {e}")
+                for job in jobs:
+                    job.status = JOB_FAILED
+                    job.error = str(e)
+            finally:
+                self._queue.task_done()
+                for job in jobs:
+                    if job.status in FINAL_STATUSES:
+                        await self._finish(job)
+
+    def start(self) -> None:
+        """Inicia o pool de workers"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            logger.info(f"🧵 Pool de jobs WiFi iniciado ({self.workers} workers)")
+
+    async def stop(self) -> None:
+        """Interrompe o pool de workers (jobs em andamento são marcados como falhos)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+# Singleton global para reutilização
+_wifi_job_queue: Optional[WiFiJobQueue] = None
+
+def get_wifi_job_queue() -> WiFiJobQueue:
+    """
+    Retorna uma instância singleton da fila de jobs WiFi
+    """
+    global _wifi_job_queue
+    if _wifi_job_queue is None:
+        _wifi_job_queue = WiFiJobQueue(shared_cache=get_shared_cache(), event_broker=get_event_broker())
+    return _wifi_job_queue
@@ -0,0 +1,117 @@
+"""
+Benchmark de Startup
+Mede, em processos novos, o tempo de importação de app.main e de entrada no
+lifespan (até o worker aceitar requisições), e lista os módulos mais lentos de
+importar. Com --max-import-ms/--max-startup-ms, falha se a mediana passar do limite.
+
+Uso (a partir de services/backend-api):
+    python scripts/benchmark_startup.py --runs 5
+    python scripts/benchmark_startup.py --runs 5 --max-import-ms 1500 --max-startup-ms 2500
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executado em um processo novo: importa a aplicação e entra no lifespan sem
+# serviços externos (sync, histórico e Redis desligados)
+PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def run():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(run())
+print(json.dumps({"import_ms": (imported - start) * 1000, "startup_ms": (ready - start) * 1000}))
+"""
+
+PROBE_ENV = {
+    "INVENTORY_SYNC_ENABLED": "false",
+    "KPI_HISTORY_ENABLED": "false",
+    "SHARED_CACHE_BACKEND": "memory",
+    "GENIEACS_WARM_CONNECTIONS": "1",
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+
+
+def probe_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(PROBE_ENV)
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def run_probe() -> Dict[str, float]:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR, env=probe_env(), capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int) -> List[Tuple[str, float]]:
+    """
+    Pacotes com maior tempo cumulativo de importação (python -X importtime)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, env=probe_env(), capture_output=True, text=True, check=True
+    )
+    packages: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        # Módulos da aplicação aparecem separados; dependências agrupadas por pacote raiz
+        module = match.group(3)
+        name = module if module.startswith("app.") else module.split(".")[0]
+        packages[name] = max(packages.get(name, 0.0), int(match.group(2)) / 1000)
+    packages.pop("app", None)
+    packages.pop("app.main", None)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de startup do backend")
+    parser.add_argument("--runs", type=int, default=5, help="Processos medidos")
+    parser.add_argument("--top", type=int, default=10, help="Módulos mais lentos listados")
+    parser.add_argument("--max-import-ms", type=float, help="Falha se a mediana de importação passar disso")
+    parser.add_argument("--max-startup-ms", type=float, help="Falha se a mediana até o lifespan pronto passar disso")
+    args = parser.parse_args()
+
+    # Primeira execução só aquece o cache de bytecode
+    run_probe()
+    samples = [run_probe() for _ in range(args.runs)]
+    import_ms = statistics.median(s["import_ms"] for s in samples)
+    startup_ms = statistics.median(s["startup_ms"] for s in samples)
+
+    print(f"Importação de app.main: mediana {import_ms:.0f} ms ({args.runs} execuções)")
+    print(f"Até o lifespan pronto:  mediana {startup_ms:.0f} ms")
+    print("\nMódulos mais lentos de importar:")
+    for module, ms in slowest_imports(args.top):
+        print(f"  {ms:8.1f} ms  {module}")
+
+    failed = False
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"\n❌ Importação acima do limite ({args.max_import_ms:.0f} ms)")
+        failed = True
+    if args.max_startup_ms is not None and startup_ms > args.max_startup_ms:
+        print(f"\n❌ Startup acima do limite ({args.max_startup_ms:.0f} ms)")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
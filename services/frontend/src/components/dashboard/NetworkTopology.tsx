@@ -1,8 +1,57 @@
+import { useState } from "react";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
-import { Server, Cable, Radio } from "lucide-react";
+import { Server, Cable } from "lucide-react";
+import { useTopology, useTopologyNode } from "@/hooks/useApi";
+import type { TopologyHealth, TopologyNode } from "@/types";
+
+const STATUS_STYLES: Record<TopologyHealth["status"], { dot: string; text: string; bg: string; label: string }> = {
+  ok: { dot: "bg-success", text: "text-success", bg: "bg-success/20", label: "Active" },
+  warning: { dot: "bg-warning", text: "text-warning", bg: "bg-warning/20", label: "Warning" },
+  critical: { dot: "bg-error", text: "text-error", bg: "bg-error/20", label: "Critical" },
+};
+
+function uptime(health: TopologyHealth) {
+  return health.online_ratio === null ? "—" : `${Math.round(health.online_ratio * 100)}% Online`;
+}
+
+function PonPorts({ oltId }: { oltId: string }) {
+  // Portas PON da OLT só são buscadas quando ela é expandida
+  const { data, isLoading } = useTopologyNode(oltId);
+
+  if (isLoading) {
+    return <p className="ml-6 text-xs text-gray-400">Carregando portas PON...</p>;
+  }
+
+  return (
+    <div className="ml-6 space-y-2">
+      {(data?.children ?? []).map((pon: TopologyNode) => {
+        const style = STATUS_STYLES[pon.health.status];
+        return (
+          <div key={pon.id} className="flex items-center space-x-3 p-2 bg-gray-800/50 rounded-lg">
+            <div className={`w-6 h-6 ${style.bg} rounded flex items-center justify-center`}>
+              <Cable className={`${style.text} w-3 h-3`} />
+            </div>
+            <div className="flex-1">
+              <p className="text-sm text-white">PON {pon.label}</p>
+              <p className="text-xs text-gray-400">
+                {pon.children_count} ONUs • {uptime(pon.health)}
+                {pon.health.alerts > 0 && ` • ${pon.health.alerts} alertas`}
+              </p>
+            </div>
+            <span className={`text-xs ${style.text}`}>{style.label}</span>
+          </div>
+        );
+      })}
+      {data?.has_more && <p className="text-xs text-gray-400">Mais portas na visualização completa</p>}
+    </div>
+  );
+}
 
 export default function NetworkTopology() {
+  const { data: topology, isLoading } = useTopology();
+  const [expanded, setExpanded] = useState<string | null>(null);
+
   return (
     <Card className="bg-dark-card border-gray-700">
       <CardHeader>
@@ -15,55 +64,33 @@ export default function NetworkTopology() {
       </CardHeader>
       <CardContent>
         <div className="space-y-4">
-          {/* OLT */}
-          <div className="flex items-center space-x-3 p-3 bg-dark-bg rounded-lg">
-            <div className="w-10 h-10 bg-primary/20 rounded-lg flex items-center justify-center">
-              <Server className="text-primary w-5 h-5" />
-            </div>
-            <div className="flex-1">
-              <p className="text-white font-medium">OLT-001</p>
-              <p className="text-sm text-gray-400">16 PONs • 847 ONUs Ativas</p>
-            </div>
-            <div className="w-3 h-3 bg-success rounded-full"></div>
-          </div>
-
-          {/* PON Ports */}
-          <div className="ml-6 space-y-2">
-            <div className="flex items-center space-x-3 p-2 bg-gray-800/50 rounded-lg">
-              <div className="w-6 h-6 bg-success/20 rounded flex items-center justify-center">
-                <Cable className="text-success w-3 h-3" />
-              </div>
-              <div className="flex-1">
-                <p className="text-sm text-white">PON 1/1/1</p>
-                <p className="text-xs text-gray-400">52 ONUs • 98% Uptime</p>
-              </div>
-              <span className="text-xs text-success">Active</span>
-            </div>
-            
-            <div className="flex items-center space-x-3 p-2 bg-gray-800/50 rounded-lg">
-              <div className="w-6 h-6 bg-warning/20 rounded flex items-center justify-center">
-                <Cable className="text-warning w-3 h-3" />
-              </div>
-              <div className="flex-1">
-                <p className="text-sm text-white">PON 1/1/2</p>
-                <p className="text-xs text-gray-400">45 ONUs • 92% Uptime</p>
-              </div>
-              <span className="text-xs text-warning">Warning</span>
+          {isLoading && <p className="text-sm text-gray-400">Carregando topologia...</p>}
+          {!isLoading && !topology?.children?.length && (
+            <p className="text-sm text-gray-400">Nenhuma OLT encontrada</p>
+          )}
+          {(topology?.children ?? []).map((olt: TopologyNode) => (
+            <div key={olt.id} className="space-y-2">
+              <button
+                type="button"
+                className="w-full flex items-center space-x-3 p-3 bg-dark-bg rounded-lg text-left"
+                onClick={() => setExpanded(expanded === olt.id ? null : olt.id)}
+              >
+                <div className="w-10 h-10 bg-primary/20 rounded-lg flex items-center justify-center">
+                  <Server className="text-primary w-5 h-5" />
+                </div>
+                <div className="flex-1">
+                  <p className="text-white font-medium">{olt.label}</p>
+                  <p className="text-sm text-gray-400">
+                    {olt.children_count} PONs • {olt.health.online} ONUs Ativas
+                  </p>
+                </div>
+                <div className={`w-3 h-3 ${STATUS_STYLES[olt.health.status].dot} rounded-full`}></div>
+              </button>
+              {expanded === olt.id && <PonPorts oltId={olt.id} />}
             </div>
-
-            <div className="flex items-center space-x-3 p-2 bg-gray-800/50 rounded-lg">
-              <div className="w-6 h-6 bg-success/20 rounded flex items-center justify-center">
-                <Cable className="text-success w-3 h-3" />
-              </div>
-              <div className="flex-1">
-                <p className="text-sm text-white">PON 1/1/3</p>
-                <p className="text-xs text-gray-400">38 ONUs • 99% Uptime</p>
-              </div>
-              <span className="text-xs text-success">Active</span>
-            </div>
-          </div>
+          ))}
         </div>
       </CardContent>
     </Card>
   );
-}
\ No newline at end of file
+}
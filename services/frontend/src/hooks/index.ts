@@ -1,2 +1,2 @@
 export { useNotifications } from './useNotifications';
-export { useAuth, useDashboardMetrics, useCPEs, useONUs, useOLTs, useAlerts, useAcknowledgeAlert, useHealthCheck } from './useApi';
\ No newline at end of file
+export { useAuth, useDashboardMetrics, useCPEs, useONUs, useOLTs, useDeviceSearch, useTopology, useTopologyNode, useAnomalyInsights, useAlerts, useAcknowledgeAlert, useHealthCheck } from './useApi';
\ No newline at end of file
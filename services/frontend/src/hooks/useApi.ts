@@ -1,5 +1,6 @@
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { apiService } from '../services/api';
+import type { DeviceSearchResult } from '../types';
 
 // User hook
 export function useAuth() {
@@ -20,6 +21,15 @@ export function useDashboardMetrics() {
   });
 }
 
+// Dashboard bootstrap hook (métricas, dispositivos, alertas recentes e WiFi em uma requisição)
+export function useDashboardBootstrap() {
+  return useQuery({
+    queryKey: ['dashboard', 'bootstrap'],
+    queryFn: () => apiService.getDashboardBootstrap().then(res => res.data),
+    refetchInterval: 30000, // Refresh every 30 seconds
+  });
+}
+
 // Devices hooks
 export function useCPEs() {
   return useQuery({
@@ -45,6 +55,43 @@ export function useOLTs() {
   });
 }
 
+// Busca de dispositivos (typeahead)
+export function useDeviceSearch(query: string, limit = 20) {
+  return useQuery({
+    queryKey: ['devices', 'search', query, limit],
+    queryFn: () => apiService.searchDevices(query, limit).then(res => res.data.results as DeviceSearchResult[]),
+    enabled: query.trim().length > 0,
+    staleTime: 30000,
+  });
+}
+
+// Topology hooks
+export function useTopology() {
+  return useQuery({
+    queryKey: ['topology'],
+    queryFn: () => apiService.getTopology().then(res => res.data),
+    refetchInterval: 60000,
+  });
+}
+
+export function useTopologyNode(nodeId: string | null) {
+  return useQuery({
+    queryKey: ['topology', nodeId],
+    queryFn: () => apiService.getTopologyNode(nodeId as string).then(res => res.data),
+    enabled: !!nodeId,
+    refetchInterval: 60000,
+  });
+}
+
+// Insights hook (anomalias detectadas nos KPIs dos dispositivos)
+export function useAnomalyInsights() {
+  return useQuery({
+    queryKey: ['insights', 'anomalies'],
+    queryFn: () => apiService.getAnomalyInsights().then(res => res.data.insights),
+    refetchInterval: 30000,
+  });
+}
+
 // Alerts hooks
 export function useAlerts() {
   return useQuery({
@@ -17,7 +17,7 @@ import {
   Refresh,
 } from '@mui/icons-material';
 import { BerryCard, MetricCard, PageHeader } from '../components/common';
-import { useDashboardMetrics, useCPEs, useONUs, useOLTs, useAlerts } from '../hooks/useApi';
+import { useDashboardBootstrap, useONUs, useOLTs } from '../hooks/useApi';
 import {
   LineChart,
   Line,
@@ -39,11 +39,11 @@ const Dashboard: React.FC = () => {
   const [lastUpdate, setLastUpdate] = useState(new Date());
 
   // Buscar dados reais da API
-  const { data: metrics, isLoading: metricsLoading, error: metricsError, refetch: refetchMetrics } = useDashboardMetrics();
-  const { data: cpes, isLoading: cpesLoading } = useCPEs();
+  // Métricas, CPEs e alertas chegam juntos no bootstrap do dashboard
+  const { data: bootstrap, isLoading: metricsLoading, error: metricsError, refetch: refetchMetrics } = useDashboardBootstrap();
+  const metrics = bootstrap?.metrics;
   const { data: onus, isLoading: onusLoading } = useONUs();
   const { data: olts, isLoading: oltsLoading } = useOLTs();
-  const { data: alerts, isLoading: alertsLoading } = useAlerts();
 
   useEffect(() => {
     const interval = setInterval(() => {
@@ -60,9 +60,9 @@ const Dashboard: React.FC = () => {
 
   // Calcular dados para os gráficos baseado nos dados reais
   const deviceTypes = React.useMemo(() => {
-    if (cpesLoading || onusLoading || oltsLoading) return [];
+    if (metricsLoading || onusLoading || oltsLoading) return [];
     
-    const cpeCount = cpes?.length || 0;
+    const cpeCount = bootstrap?.devices.total || 0;
     const onuCount = onus?.length || 0;
     const oltCount = olts?.length || 0;
     
@@ -71,7 +71,7 @@ const Dashboard: React.FC = () => {
       { name: 'ONUs', value: onuCount, color: '#673ab7' },
       { name: 'OLTs', value: oltCount, color: '#4caf50' },
     ].filter(item => item.value > 0);
-  }, [cpes, onus, olts, cpesLoading, onusLoading, oltsLoading]);
+  }, [bootstrap, onus, olts, metricsLoading, onusLoading, oltsLoading]);
 
   // Gerar dados de chart baseados nos dados reais (para demonstração de tendências)
   const chartData = React.useMemo(() => {
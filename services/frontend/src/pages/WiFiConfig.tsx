@@ -346,7 +346,7 @@ export default function WiFiConfig() {
       
       setSnackbar({ 
         open: true, 
-        message: `Configuração atualizada com sucesso (${result.tasks_executed}/${result.total_tasks} parâmetros)`, 
+        message: `Atualização enviada ao dispositivo (job ${result.job_id.slice(0, 8)})`, 
         severity: 'success' 
       });
       setShowEditDevice(false);
@@ -44,11 +44,22 @@ export const apiService = {
   
   // Dashboard
   getDashboardMetrics: () => api.get('/dashboard/metrics'),
+  getDashboardBootstrap: (deviceLimit = 50, alertLimit = 10) =>
+    api.get('/dashboard/bootstrap', { params: { device_limit: deviceLimit, alert_limit: alertLimit } }),
   
   // Devices
   getCPEs: () => api.get('/devices/cpes'),
   getONUs: () => api.get('/devices/onus'),
   getOLTs: () => api.get('/devices/olts'),
+  searchDevices: (q: string, limit = 20) => api.get('/devices/search', { params: { q, limit } }),
+  
+  // Topology (resumo das OLTs; subárvores sob demanda)
+  getTopology: (depth = 1) => api.get('/topology', { params: { depth } }),
+  getTopologyNode: (nodeId: string, depth = 1) =>
+    api.get(`/topology/nodes/${encodeURIComponent(nodeId)}`, { params: { depth } }),
+  
+  // Insights (anomalias de KPIs)
+  getAnomalyInsights: (limit = 20) => api.get('/insights/anomalies', { params: { limit } }),
   
   // Alerts
   getAlerts: () => api.get('/alerts'),
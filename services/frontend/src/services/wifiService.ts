@@ -13,6 +13,7 @@ import type {
   WiFiStats,
   WiFiData,
   WiFiUpdateResponse,
+  WiFiJob,
 } from '@/types';
 
 // Re-export the types so other files that import from here still work
@@ -24,6 +25,7 @@ export type {
   WiFiStats,
   WiFiData,
   WiFiUpdateResponse,
+  WiFiJob,
 };
 
 /**
@@ -54,6 +56,42 @@ export const updateDeviceWiFiConfig = async (
   return response.data;
 };
 
+/**
+ * Get the status of a WiFi update job
+ */
+export const getWiFiJob = async (jobId: string): Promise<WiFiJob> => {
+  const response = await apiClient.get(`/wifi/jobs/${jobId}`);
+  return response.data;
+};
+
+/**
+ * Apply a WiFi profile to every device matching the selector (runs in background)
+ */
+export const applyWiFiProfileBulk = async (request: {
+  profile: WiFiConfigUpdate;
+  selector: {
+    device_ids?: string[];
+    profile_id?: string;
+    manufacturer?: string;
+    model?: string;
+    olt_id?: string;
+    online_only?: boolean;
+  };
+  band?: string;
+  dry_run?: boolean;
+}): Promise<{ success: boolean; operation_id: string; status: string; status_url: string }> => {
+  const response = await apiClient.post('/wifi/bulk', request);
+  return response.data;
+};
+
+/**
+ * Get the progress of a bulk WiFi profile push
+ */
+export const getWiFiBulkOperation = async (operationId: string, includeDevices: boolean = false) => {
+  const response = await apiClient.get(`/wifi/bulk/${operationId}?include_devices=${includeDevices}`);
+  return response.data;
+};
+
 /**
  * Refresh WiFi configuration for a specific device (force sync with device)
  */
@@ -88,6 +88,37 @@ export interface NetworkNode {
   };
 }
 
+export interface DeviceSearchResult {
+  id: string;
+  serial_number: string;
+  model: string;
+  status: string;
+  ip_address: string | null;
+  wifi_ssid: string | null;
+  customer_name: string | null;
+  match: 'serial_number' | 'id' | 'ip_address' | 'wifi_ssid' | 'customer_name' | 'model' | null;
+}
+
+export interface TopologyHealth {
+  devices: number;
+  online: number;
+  online_ratio: number | null;
+  alerts: number;
+  critical_alerts: number;
+  status: 'ok' | 'warning' | 'critical';
+}
+
+export interface TopologyNode {
+  id: string;
+  type: 'network' | 'olt' | 'pon' | 'onu' | 'cpe';
+  label: string;
+  parent: string | null;
+  health: TopologyHealth;
+  children_count: number;
+  children?: TopologyNode[];
+  has_more?: boolean;
+}
+
 export interface NetworkLink {
   id: string;
   source: string;
@@ -459,6 +490,26 @@ export interface WiFiData {
 export interface WiFiUpdateResponse {
   success: boolean;
   message: string;
-  tasksExecuted: number;
-  totalTasks: number;
+  job_id: string;
+  status: WiFiJobStatus;
+  status_url: string;
+  applied_updates: WiFiConfigUpdate;
+}
+
+export type WiFiJobStatus = 'queued' | 'running' | 'completed' | 'failed';
+
+export interface WiFiJob {
+  id: string;
+  device_id: string;
+  band: string;
+  status: WiFiJobStatus;
+  applied_updates: WiFiConfigUpdate;
+  results: { parameter: string; value: unknown; success: boolean; superseded_by: string | null }[];
+  tasks_executed: number;
+  total_tasks: number;
+  coalesced_with: string[];
+  error: string | null;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
 }
\ No newline at end of file